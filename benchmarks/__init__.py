@@ -0,0 +1 @@
+# Benchmarks module (热点路径性能基准)
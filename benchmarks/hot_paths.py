@@ -0,0 +1,245 @@
+"""
+热点路径性能基准
+- build_fixture: 在合成行情上构造与实盘一致的上下文 (Meta-Gate 状态、已建仓的 10 个 Tranche)
+- CASES: 被计时的热点路径 (get_ranking / get_market_regime / calculate_target_holdings /
+  Tranche.update_value+check_guard / on_bar / 完整 algo)
+- run_benchmarks: 按标的规模逐一计时，返回可序列化为 JSON 的结果
+- compare_results: 与基线 JSON 对比，超过阈值的用例判定为性能回退
+
+algo 与 on_bar 运行在模拟上下文中：下单函数被替换为空操作，状态文件写入临时目录，
+计时覆盖的是策略自身的计算开销，而非掘金接口或网络延迟。
+"""
+import os
+import sys
+import time
+import logging
+import platform
+import tempfile
+import subprocess
+from contextlib import contextmanager
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from config import config, logger
+from core.backtest import new_gate_state, build_price_map
+from core.logic import calculate_target_holdings
+from core.portfolio import Tranche, RollingPortfolioManager
+from core.signal import get_market_regime, get_ranking
+from sim.synthetic import make_synthetic_market
+
+DEFAULT_SIZES = [50, 500, 5000]
+
+# 回退阈值：当前中位耗时 / 基线中位耗时 超过该倍数即判定回退
+DEFAULT_THRESHOLD = 1.25
+CASE_THRESHOLDS = {
+    'algo': 1.30,
+    'on_bar': 1.30,
+}
+# 绝对差值低于该值 (毫秒) 的波动视为噪声
+MIN_DELTA_MS = 0.5
+
+
+@contextmanager
+def _silence_logger():
+    """计时期间关闭日志输出，避免 I/O 干扰"""
+    old_level = logger.level
+    logger.setLevel(logging.CRITICAL)
+    try:
+        yield
+    finally:
+        logger.setLevel(old_level)
+
+
+class _FakeAccount:
+    """algo 同步阶段使用的空账户 (无持仓)"""
+
+    def __init__(self, nav):
+        self.cash = SimpleNamespace(nav=nav, available=nav)
+
+    def positions(self):
+        return []
+
+
+def build_fixture(n_syms, n_days=400, seed=0, state_dir=None):
+    """
+    构造基准上下文
+
+    Returns:
+        SimpleNamespace: context (供 strategy / signal 函数使用) 附带 price_map、dt、bars
+    """
+    market = make_synthetic_market(n_syms, n_days=n_days, seed=seed)
+    dt = (market.prices_df.index[-1] + pd.Timedelta(config.EXEC_TIME)).to_pydatetime()
+
+    ctx = new_gate_state(market.whitelist, market.theme_map)
+    ctx.prices_df, ctx.benchmark_df = market.prices_df, market.benchmark_df
+    ctx.now = dt
+    ctx.mode = None
+    ctx.account_id = ''
+    ctx.wechat = SimpleNamespace(send_text=lambda *a, **k: None)
+    ctx.trace_recorder = None
+
+    # 已建仓的 10 个 Tranche：每份持有 TOP_N 只标的，入场价即当前价 (不触发止损)
+    price_map = build_price_map(market.prices_df, market.whitelist)
+    held = sorted(price_map)[:config.TOP_N * config.REBALANCE_PERIOD_T]
+    rpm = RollingPortfolioManager(state_path=os.path.join(state_dir or tempfile.gettempdir(), 'bench_state.json'))
+    rpm.tranches = [Tranche(i, 100000) for i in range(config.REBALANCE_PERIOD_T)]
+    for i, t in enumerate(rpm.tranches):
+        for sym in held[i::config.REBALANCE_PERIOD_T][:config.TOP_N]:
+            t.buy(sym, 20000, price_map[sym], dt - pd.Timedelta(days=30), 0.02)
+        t.update_value(price_map)
+    rpm.initialized = True
+    ctx.rpm = rpm
+    nav = sum(t.total_value for t in rpm.tranches)
+    ctx.account = lambda *a, **k: _FakeAccount(nav)
+
+    ctx.price_map = price_map
+    ctx.dt = dt
+    ctx.bars = [
+        SimpleNamespace(symbol=s, high=p, close=p, open=p, low=p, volume=0)
+        for s, p in price_map.items()
+    ]
+    return ctx
+
+
+def _case_get_ranking(ctx):
+    get_ranking(ctx, ctx.dt)
+
+
+def _case_get_market_regime(ctx):
+    get_market_regime(ctx, ctx.dt)
+
+
+def _case_calculate_target_holdings(ctx):
+    calculate_target_holdings(ctx, ctx.dt, ctx.rpm.tranches[0], ctx.price_map)
+
+
+def _case_tranche_guard(ctx):
+    for t in ctx.rpm.tranches:
+        t.update_value(ctx.price_map)
+        t.check_guard(ctx.price_map, ctx.dt)
+
+
+def _case_on_bar(ctx):
+    from gm.api import MODE_LIVE
+    from core import strategy
+    ctx.mode = MODE_LIVE
+    try:
+        with mock.patch.object(strategy, 'order_target_percent'), \
+                mock.patch.object(strategy, 'append_metrics'):
+            strategy.on_bar(ctx, ctx.bars)
+    finally:
+        ctx.mode = None
+
+
+def _case_algo(ctx):
+    from gm.api import MODE_BACKTEST
+    from core import strategy
+    ctx.mode = MODE_BACKTEST
+    with mock.patch.object(strategy, 'order_volume'):
+        strategy.algo(ctx)
+
+
+CASES = {
+    'get_ranking': _case_get_ranking,
+    'get_market_regime': _case_get_market_regime,
+    'calculate_target_holdings': _case_calculate_target_holdings,
+    'tranche_update_guard': _case_tranche_guard,
+    'on_bar': _case_on_bar,
+    'algo': _case_algo,
+}
+
+
+def time_call(fn, repeats=5, warmup=1):
+    """重复计时，返回毫秒统计"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples = np.asarray(samples)
+    return {
+        'median_ms': float(np.median(samples)),
+        'min_ms': float(samples.min()),
+        'max_ms': float(samples.max()),
+        'repeats': int(repeats),
+    }
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=config.BASE_DIR,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip()
+    except Exception:
+        return ''
+
+
+def run_benchmarks(sizes=None, n_days=400, repeats=5, cases=None, seed=0):
+    """
+    按规模运行全部用例
+
+    Returns:
+        dict: {'meta': {...}, 'results': {case: {str(n_syms): timing}}}
+    """
+    sizes = sizes or DEFAULT_SIZES
+    cases = cases or list(CASES)
+    results = {name: {} for name in cases}
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        for n_syms in sizes:
+            ctx = build_fixture(n_syms, n_days=n_days, seed=seed, state_dir=state_dir)
+            for name in cases:
+                # algo 会推进 days_count 并改写持仓，每个用例使用独立上下文
+                case_ctx = build_fixture(n_syms, n_days=n_days, seed=seed, state_dir=state_dir) \
+                    if name == 'algo' else ctx
+                with _silence_logger():
+                    results[name][str(n_syms)] = time_call(lambda: CASES[name](case_ctx), repeats)
+                logger.info(f"⏱️ {name:<26} N={n_syms:<5} {results[name][str(n_syms)]['median_ms']:9.2f} ms")
+
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'n_days': n_days,
+            'repeats': repeats,
+        },
+        'results': results,
+    }
+
+
+def compare_results(baseline, current, threshold=None, min_delta_ms=MIN_DELTA_MS):
+    """
+    与基线对比
+
+    Args:
+        baseline / current: run_benchmarks 返回的结果 (或其 JSON)
+        threshold: 统一阈值，缺省使用 CASE_THRESHOLDS / DEFAULT_THRESHOLD
+
+    Returns:
+        list of dict: 每个 (用例, 规模) 的 {'case', 'size', 'baseline_ms', 'current_ms', 'ratio', 'regressed'}
+    """
+    rows = []
+    for name, by_size in current['results'].items():
+        limit = threshold or CASE_THRESHOLDS.get(name, DEFAULT_THRESHOLD)
+        for size, timing in by_size.items():
+            base = baseline.get('results', {}).get(name, {}).get(size)
+            if not base:
+                continue
+            base_ms, cur_ms = base['median_ms'], timing['median_ms']
+            ratio = cur_ms / base_ms if base_ms > 0 else float('inf')
+            rows.append({
+                'case': name, 'size': int(size),
+                'baseline_ms': base_ms, 'current_ms': cur_ms, 'ratio': ratio,
+                'regressed': ratio > limit and (cur_ms - base_ms) > min_delta_ms,
+            })
+    return rows
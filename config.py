@@ -51,6 +51,8 @@ class Config:
     EXEC_TIME = os.environ.get('OPT_EXEC_TIME', '14:55:00')
     # 压测/验证：14:00 起每 10 分钟执行一次（设 OPT_EXEC_EVERY_10MIN=1 开启）
     EXEC_EVERY_10MIN = os.environ.get('OPT_EXEC_EVERY_10MIN', '').strip().lower() in ('1', 'true', 'yes')
+    # 收盘前预计算 (排名/仓位/目标权重)，EXEC_TIME 增量重算并在排名未变时沿用预案权重；设为空字符串关闭
+    PRECLOSE_TIME = os.environ.get('OPT_PRECLOSE_TIME', '14:45:00')
     
     # === 策略核心参数 ===
     TOP_N = 4                    # 选前N只
@@ -70,14 +72,32 @@ class Config:
     
     # === 权重方案 ===
     # CHAMPION = 3:1:1:1 (冠军加权), EQUAL = 1:1:1:1 (等权)
+    # INV_VOL = 反波动率, ERC = 风险平价, SCORE = 评分比例 (单只上限 MAX_WEIGHT)，见 core/weights.py
     WEIGHT_SCHEME = os.environ.get('WEIGHT_SCHEME', 'CHAMPION')
     VERSION_SUFFIX = os.environ.get('VERSION_SUFFIX', '')  # 用于区分不同版本的文件
-    VERSION_LABEL = '[等权]' if WEIGHT_SCHEME == 'EQUAL' else '[冠军]'  # 通知前缀
+    VERSION_LABEL = {
+        'EQUAL': '[等权]', 'INV_VOL': '[反波动]', 'ERC': '[风险平价]', 'SCORE': '[评分]',
+    }.get(WEIGHT_SCHEME, '[冠军]')  # 通知前缀
+    COV_WINDOW = 60              # 风险类方案的滚动协方差窗口 (交易日)
+    COV_MIN_PERIODS = 20         # 成对有效样本下限
+    MAX_WEIGHT = float(os.environ.get('OPT_MAX_WEIGHT', 0.4))   # SCORE 方案单只权重上限
+    # 相关性去重: 候选与已入选标的的滚动相关系数超过阈值则跳过 (补充 MAX_PER_THEME)
+    CORR_DEDUPE = os.environ.get('OPT_CORR_DEDUPE', '0') == '1'
+    CORR_THRESHOLD = float(os.environ.get('OPT_CORR_THRESHOLD', 0.95))
     
     # === 状态文件 ===
     MACRO_BENCHMARK = 'SZSE.159915'  # 创业板ETF作为宏观锚点
-    STATE_FILE = f"rolling_state_main{VERSION_SUFFIX}.json"
-    
+    # json (默认，可读) / binary (定宽数组紧凑编码，载入/保存更快，见 core/state_codec.py)
+    STATE_FORMAT = os.environ.get('OPT_STATE_FORMAT', 'json')
+    STATE_FILE = f"rolling_state_main{VERSION_SUFFIX}.{'bin' if STATE_FORMAT == 'binary' else 'json'}"
+    # 每日状态快照 (实盘 algo 保存状态后写入，按内容哈希去重，见 core/snapshots.py)
+    SNAPSHOT_ENABLED = os.environ.get('OPT_STATE_SNAPSHOTS', '1') == '1'
+    SNAPSHOT_DIR = os.path.join(BASE_DIR, f"state_snapshots{VERSION_SUFFIX}")
+
+    # === 决策轨迹 (黄金基准逐日比对) ===
+    TRACE_FILE = os.environ.get('OPT_TRACE_FILE', '')            # 非空则逐日记录决策轨迹
+    TRACE_GOLDEN_FILE = os.environ.get('OPT_TRACE_GOLDEN', '')   # 非空则与黄金轨迹逐日比对，首个分歧即失败
+
     # === 保护期与缓冲 ===
     PROTECTION_DAYS = int(os.environ.get('OPT_PROTECTION_DAYS', 0))
     TURNOVER_BUFFER = 2          # 缓冲区大小
@@ -97,7 +117,47 @@ class Config:
     MAX_DAILY_LOSS_PCT = 0.04    # 单日亏损熔断线
     MAX_ORDER_VAL_PCT = 0.25     # 单笔订单最大占比
     MAX_REJECT_COUNT = 5         # 单日废单容忍度
+    MAX_GROSS_EXPOSURE = float(os.environ.get('OPT_MAX_GROSS_EXPOSURE', 1.0))   # 成交后持仓市值 / NAV 上限
+    PRETRADE_PRICE_BAND = float(os.environ.get('OPT_PRICE_BAND', 0.11))   # 买入价相对昨收的最大偏离 (ETF 涨跌停 10%；卖出不检查)
+    PRETRADE_CASH_BUFFER = 0.002  # 买入现金检查预留 (佣金/滑点)
+
+    # === 持仓压力测试 (core/stress.py，结果进入日报) ===
+    STRESS_ENABLED = os.environ.get('OPT_STRESS', '1') == '1'
+    STRESS_WINDOW = int(os.environ.get('OPT_STRESS_WINDOW', 1000))   # 历史模拟情景数上限 (交易日)
+    STRESS_CONFIDENCE = 0.95
+    STRESS_WORST_DAYS = 20       # 危机回放：基准最差交易日数
+    STRESS_SHOCKS = (-0.05, -0.08, -0.10)   # 基准冲击幅度 (按 beta 传导)
     DATA_TIMEOUT_SEC = 180       # 数据延迟容忍(秒)
+    NAV_CACHE_MAX_AGE_SEC = float(os.environ.get('OPT_NAV_MAX_AGE_SEC', 600))   # NAV 缓存超过该时长无更新时回退查询账户
+    INTRADAY_MTM = os.environ.get('OPT_INTRADAY_MTM', '1') == '1'   # on_bar 实时盯市虚拟账本 (core/mtm.py)
+    INTRADAY_DD_ALERT_PCT = float(os.environ.get('OPT_INTRADAY_DD_ALERT', 0.03))   # 日内峰谷回撤告警线
+    INTRADAY_MAX_DRAWDOWN_PCT = float(os.environ.get('OPT_INTRADAY_MAX_DD', 0.05))   # 日内峰谷回撤熔断线
+    DATA_STALE_ACTION = os.environ.get('OPT_STALE_ACTION', 'drop')   # 过期 tick: drop 不注入今日行 / warn 仅告警
+    DATA_STALE_ALERT_FRAC = 0.2  # 过期占比超过该值时发送告警
+
+    # === 持仓对账 (core/reconcile.py) ===
+    ODD_LOT = 100                # 差异小于一手视为碎股
+    RECONCILE_POLICY = os.environ.get('OPT_RECONCILE_POLICY', 'age')   # age 最近买入优先 / pro_rata 按持仓比例
+    RECONCILE_APPLY = os.environ.get('OPT_RECONCILE_APPLY', '0') == '1'   # 收盘对账后修正虚拟账本 (默认仅告警)
+
+    # === 流动性 (ADV 门槛与参与率上限) ===
+    LIQUIDITY_FILTER = os.environ.get('OPT_LIQUIDITY', '0') == '1'   # 需要 volumes_df
+    ADV_WINDOW = 20              # 日均成交量/成交额窗口 (交易日)
+    MIN_ADV_AMOUNT = float(os.environ.get('OPT_MIN_ADV_AMOUNT', 5e6))   # 日均成交额下限 (元)
+    MAX_PARTICIPATION = float(os.environ.get('OPT_MAX_PARTICIPATION', 0.05))   # 单笔买入不超过 ADV 的比例
+
+    # === 时延监控 (分阶段计时) ===
+    # algo 于 EXEC_TIME 触发、15:00 收盘，整轮执行须在预算内完成
+    ALGO_BUDGET_SEC = float(os.environ.get('OPT_ALGO_BUDGET_SEC', 240))
+    ON_BAR_BUDGET_SEC = float(os.environ.get('OPT_ON_BAR_BUDGET_SEC', 10))
+    LATENCY_METRICS_FILE = f"latency{VERSION_SUFFIX}.jsonl"   # 位于 LOG_DIR 下
+    LATENCY_METRICS_MAX_BYTES = 1024 * 1024   # 滚动上限，超出后保留最近一半记录
+
+    # === 盘中 60s Bar 录制 (止损回放 / TRAILING_DROP 调参) ===
+    BAR_RECORD_ENABLED = os.environ.get('OPT_BAR_RECORD', '1') == '1'
+    BAR_ARCHIVE_DIR = os.path.join(DATA_CACHE_DIR, "bars")
+    # algo 注入"今日"价格行的来源: current (行情快照) / last (分钟缓冲最新价) / vwap (分钟缓冲当日均价)
+    INTRADAY_PRICE_SOURCE = os.environ.get('OPT_INTRADAY_PRICE', 'current')
     
     # === 邮件通知配置 ===
     EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.163.com')
@@ -0,0 +1,357 @@
+"""
+本地回测引擎 (Trade at Close, 纯虚拟持仓)
+- SignalCache: 逐日预计算与参数无关的信号 (排名表 / Z-Score / 趋势仓位 / 价格映射)，供多窗口、多参数复用
+- run_local_backtest: 按与 algo 相同的决策路径逐日回放 RollingPortfolioManager
+- load_universe / load_market_data: 白名单与行情加载 (带本地缓存)
+
+说明: 引擎不经过掘金撮合，成交价即当日决策价格，结果对应 RPM 视角 (get_performance_summary)。
+传入分钟数据源 (minute_bars) 时，另按 on_bar 规则在 EXEC_TIME 前后逐分钟执行止损 (见 core.intraday)。
+"""
+import os
+import pickle
+import logging
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pandas as pd
+
+from config import config, logger
+from .portfolio import Tranche, RollingPortfolioManager
+from .signal import get_market_regime, compute_signal_components, update_meta_gate, build_rank_df
+from .logic import select_target_weights, resolve_prices, price_map_from
+from .intraday import apply_bar_stops
+from .volatility import VolatilityCache, stop_volatility
+from .liquidity import LiquidityCache, cap_buy_value
+from .weights import RollingCovariance, needs_risk_model
+
+# 可优化参数 (环境变量名) -> config 属性
+PARAM_ATTRS = {
+    'OPT_STOP_LOSS': 'STOP_LOSS',
+    'OPT_TRAILING_TRIGGER': 'TRAILING_TRIGGER',
+    'OPT_TRAILING_DROP': 'TRAILING_DROP',
+    'OPT_PROTECTION_DAYS': 'PROTECTION_DAYS',
+}
+
+# Meta-Gate 阈值 (与 main.init 一致)
+META_GATE_THRESHOLDS = {
+    'BR_CAUTION_IN': 0.40, 'BR_CAUTION_OUT': 0.30,
+    'BR_DANGER_IN': 0.60, 'BR_DANGER_OUT': 0.50, 'BR_PRE_DANGER': 0.55,
+}
+
+
+def default_params():
+    """当前配置下的参数取值"""
+    return {
+        'OPT_STOP_LOSS': config.STOP_LOSS,
+        'OPT_TRAILING_TRIGGER': config.TRAILING_TRIGGER,
+        'OPT_TRAILING_DROP': config.TRAILING_DROP,
+        'OPT_PROTECTION_DAYS': config.PROTECTION_DAYS,
+        'OPT_K_CRASH': float(os.environ.get('OPT_K_CRASH', 2.5)),
+    }
+
+
+_MISSING = object()
+
+
+@contextmanager
+def override_params(params):
+    """临时覆盖 config 中的止损/保护期参数，退出时恢复"""
+    saved = {}
+    try:
+        for key, attr in PARAM_ATTRS.items():
+            if key in params:
+                saved[attr] = config.__dict__.get(attr, _MISSING)
+                value = params[key]
+                setattr(config, attr, int(value) if attr == 'PROTECTION_DAYS' else float(value))
+        yield
+    finally:
+        for attr, value in saved.items():
+            if value is _MISSING:
+                config.__dict__.pop(attr, None)
+            else:
+                setattr(config, attr, value)
+
+
+@contextmanager
+def _quiet_logger(enabled=True):
+    """批量回测时屏蔽 INFO 级日志 (状态切换等)"""
+    if not enabled:
+        yield
+        return
+    old_level = logger.level
+    logger.setLevel(logging.WARNING)
+    try:
+        yield
+    finally:
+        logger.setLevel(old_level)
+
+
+def new_gate_state(whitelist=(), theme_map=None):
+    """构造 Meta-Gate 状态机的初始上下文 (与 main.init 初始值一致)"""
+    return SimpleNamespace(
+        market_state='SAFE', risk_scaler=1.0, br_history=[],
+        whitelist=set(whitelist), theme_map=theme_map or {},
+        **META_GATE_THRESHOLDS
+    )
+
+
+def build_price_map(hist, whitelist):
+    """与 algo 相同的价格映射：当日价格无效时回退到昨日价格"""
+    cols = hist.columns[hist.columns.isin(list(whitelist))]
+    return price_map_from(*resolve_prices(hist, cols))
+
+
+class SignalCache:
+    """
+    逐日信号缓存
+
+    对每个交易日在 EXEC_TIME 决策时点预先计算：
+    - price_map: 估值/成交价
+    - rank_df: 过滤后的排名表 (与 get_ranking 返回值一致)
+    - universe_z: Meta-Gate 所需的白名单 Z-Score
+    - trend_scale: get_market_regime 趋势仓位
+    这些量与止损参数、K_CRASH 无关，因此可在所有窗口与参数组合间复用。
+    滚动波动率 (Z-Score 波动率尺 / 动态止损) 由 vol_cache 一次性整表计算；
+    风险类权重方案与相关性去重所用的协方差由 cov_model 在逐日回放时增量更新。
+    传入 volumes_df 且启用 LIQUIDITY_FILTER 时，排名表按日均成交额过滤，调仓买入按参与率截断。
+    """
+
+    def __init__(self, prices_df, benchmark_df, whitelist, theme_map, k_entry=None, volumes_df=None):
+        self.prices_df = prices_df
+        self.benchmark_df = benchmark_df
+        self.whitelist = set(whitelist)
+        self.theme_map = theme_map
+        self.k_entry = float(os.environ.get('OPT_R5_K', 1.6)) if k_entry is None else k_entry
+        self.days = []
+        self.vol_cache = VolatilityCache().sync(prices_df)
+        self.cov_model = RollingCovariance()
+        self.liquidity = (LiquidityCache().sync(prices_df, volumes_df)
+                          if volumes_df is not None and config.LIQUIDITY_FILTER else None)
+        self._build()
+
+    def _build(self):
+        exec_offset = pd.Timedelta(config.EXEC_TIME)
+        ctx = new_gate_state(self.whitelist, self.theme_map)
+        ctx.prices_df, ctx.benchmark_df = self.prices_df, self.benchmark_df
+        index = self.prices_df.index
+
+        with _quiet_logger():
+            for d in index.normalize().unique():
+                dt = (d + exec_offset).to_pydatetime()
+                hist = self.prices_df.iloc[:index.searchsorted(dt, side='right')]
+                if hist.empty:
+                    continue
+                day = {
+                    'dt': dt,
+                    'price_map': build_price_map(hist, self.whitelist),
+                    'trend_scale': get_market_regime(ctx, dt),
+                    'rank_df': None,
+                    'universe_z': None,
+                }
+                last = hist.iloc[-1]
+                if len(hist) >= 251 and (last.notna() & (last > 0)).any():
+                    scores, z_score, rets = compute_signal_components(hist, vol_ruler=self.vol_cache.ruler(dt))
+                    day['universe_z'] = z_score[z_score.index.isin(self.whitelist)].dropna()
+                    eligible = self.liquidity.liquid_mask(dt) if self.liquidity is not None else None
+                    day['rank_df'] = build_rank_df(ctx, scores, z_score, rets, self.k_entry, eligible)
+                self.days.append(day)
+        logger.info(f"🧮 SignalCache built: {len(self.days)} days x {len(self.whitelist)} symbols")
+
+    @property
+    def dates(self):
+        return [d['dt'] for d in self.days]
+
+    @property
+    def first_signal_dt(self):
+        """第一个可生成排名的交易日"""
+        return next((d['dt'] for d in self.days if d['universe_z'] is not None), None)
+
+    def slice_days(self, start=None, end=None):
+        """按决策日期截取 (闭区间，按日比较)"""
+        start = pd.Timestamp(start).normalize() if start is not None else None
+        end = pd.Timestamp(end).normalize() if end is not None else None
+        return [
+            d for d in self.days
+            if (start is None or pd.Timestamp(d['dt']).normalize() >= start)
+            and (end is None or pd.Timestamp(d['dt']).normalize() <= end)
+        ]
+
+
+def _run_day(cache, day, rpm, gate, k_crash, trades, bars=None):
+    """单日回放：[盘中止损] -> 估值与止损 -> 活跃份额调仓 -> [尾盘止损] -> 记录净值"""
+    dt, price_map = day['dt'], day['price_map']
+    rpm.days_count += 1
+
+    # 0. 盘中 on_bar 止损 (开盘 ~ EXEC_TIME)
+    if bars is not None:
+        apply_bar_stops(rpm, bars, until=dt, trades=trades, ref_prices=price_map)
+
+    # 1. 更新价值与止损
+    for t in rpm.tranches:
+        t.update_value(price_map)
+        to_sell = t.check_guard(price_map, dt)
+        if to_sell:
+            t.guard_triggered_today = True
+            for s in to_sell:
+                trades.append({'dt': dt, 'tranche': t.id, 'symbol': s, 'side': 'SELL',
+                               'qty': t.holdings.get(s, 0), 'price': price_map.get(s, 0), 'reason': 'guard'})
+                t.sell(s, price_map.get(s, 0))
+        else:
+            t.guard_triggered_today = False
+
+    # 2. 轮动调仓
+    active_idx = (rpm.days_count - 1) % config.REBALANCE_PERIOD_T
+    active_t = rpm.tranches[active_idx]
+
+    if not active_t.guard_triggered_today:
+        # calculate_target_holdings 内部的 get_ranking 推进一次状态机
+        if day['universe_z'] is not None:
+            update_meta_gate(gate, day['universe_z'], k_crash)
+        risk_model = cache.cov_model.sync(cache.prices_df, dt) if needs_risk_model() else None
+        weights_map = select_target_weights(day['rank_df'], active_t, risk_model) if day['rank_df'] is not None else {}
+
+        trend_scale = day['trend_scale'] if config.DYNAMIC_POSITION else 1.0
+        risk_scale = gate.risk_scaler if config.ENABLE_META_GATE else 1.0
+        scale = trend_scale * risk_scale
+
+        # algo 随后为日报再次调用 get_ranking，状态机随之再推进一次 (保持一致)
+        if day['universe_z'] is not None:
+            update_meta_gate(gate, day['universe_z'], k_crash)
+
+        total_w = sum(weights_map.values())
+        if total_w > 0:
+            unit_val = (active_t.total_value * 0.99 * scale) / total_w
+            for s, w in weights_map.items():
+                target_val = unit_val * w
+                current_val = active_t.holdings.get(s, 0) * price_map.get(s, 0)
+                diff_val = target_val - current_val
+
+                if diff_val > 0:
+                    diff_val = cap_buy_value(cache.liquidity, s, dt, price_map.get(s, 0), diff_val)
+                    vol = stop_volatility(cache.prices_df, dt, s, cache.vol_cache) if config.DYNAMIC_STOP_LOSS else None
+                    shares = active_t.buy(s, diff_val, price_map.get(s, 0), dt, vol)
+                    if shares:
+                        trades.append({'dt': dt, 'tranche': active_idx, 'symbol': s, 'side': 'BUY',
+                                       'qty': shares, 'price': price_map.get(s, 0), 'reason': 'rebalance'})
+                elif diff_val < -100:
+                    if abs(diff_val) > target_val * 0.2:
+                        qty = int(abs(diff_val) / price_map.get(s, 1) / 100) * 100
+                        if qty > 0:
+                            trades.append({'dt': dt, 'tranche': active_idx, 'symbol': s, 'side': 'SELL',
+                                           'qty': min(qty, active_t.holdings.get(s, 0)),
+                                           'price': price_map.get(s, 0), 'reason': 'rebalance'})
+                            active_t.sell_qty(s, qty, price_map.get(s, 0))
+    else:
+        for s in list(active_t.holdings.keys()):
+            trades.append({'dt': dt, 'tranche': active_idx, 'symbol': s, 'side': 'SELL',
+                           'qty': active_t.holdings[s], 'price': price_map.get(s, 0), 'reason': 'liquidate'})
+            active_t.sell(s, price_map.get(s, 0))
+
+    # 2.5 尾盘 on_bar 止损 (EXEC_TIME ~ 收盘)
+    if bars is not None:
+        apply_bar_stops(rpm, bars, after=dt, trades=trades, ref_prices=price_map)
+
+    # 3. 收盘估值
+    for t in rpm.tranches:
+        t.update_value(price_map)
+    rpm.record_nav(dt)
+
+
+def run_local_backtest(cache, start=None, end=None, params=None,
+                       initial_cash=1000000, day_offset=0, quiet=True, minute_bars=None):
+    """
+    本地逐日回测
+
+    Args:
+        cache: SignalCache
+        start / end: 回测区间 (按日闭区间)
+        params: 覆盖参数 {'OPT_STOP_LOSS', 'OPT_TRAILING_TRIGGER', 'OPT_TRAILING_DROP',
+                'OPT_PROTECTION_DAYS', 'OPT_K_CRASH'}，缺省取当前配置
+        initial_cash: 初始资金
+        day_offset: days_count 初始偏移 (改变首日对应的活跃 Tranche)
+        quiet: 屏蔽 INFO 级日志
+        minute_bars: 分钟数据源 (day_bars(day) 约定，见 core.intraday)，缺省仅按日止损
+
+    Returns:
+        dict: {'nav': pd.Series, 'summary': {'return', 'max_dd', 'sharpe'}, 'trades': list, 'params': dict,
+               'minute_days': 有分钟数据的交易日数}
+    """
+    params = {**default_params(), **(params or {})}
+    k_crash = float(params['OPT_K_CRASH'])
+
+    rpm = RollingPortfolioManager(state_path=os.devnull)
+    share = initial_cash / config.REBALANCE_PERIOD_T
+    rpm.tranches = [Tranche(i, share) for i in range(config.REBALANCE_PERIOD_T)]
+    rpm.initialized = True
+    rpm.days_count = day_offset
+
+    gate = new_gate_state(cache.whitelist, cache.theme_map)
+    trades = []
+    minute_days = 0
+
+    with override_params(params), _quiet_logger(quiet):
+        for day in cache.slice_days(start, end):
+            bars = minute_bars.day_bars(day['dt']) if minute_bars is not None else None
+            minute_days += bars is not None
+            _run_day(cache, day, rpm, gate, k_crash, trades, bars)
+
+    return {
+        'nav': rpm.nav_history.to_series(),
+        'summary': rpm.get_performance_summary(),
+        'trades': trades,
+        'params': params,
+        'minute_days': minute_days,
+    }
+
+
+def load_universe():
+    """加载 ETF 白名单，返回 (whitelist, theme_map, name_map)"""
+    df_excel = pd.read_excel(config.WHITELIST_FILE)
+    df_excel.columns = df_excel.columns.str.strip()
+    df_excel = df_excel.rename(columns={'symbol': 'etf_code', 'sec_name': 'etf_name', 'name_cleaned': 'theme'})
+    whitelist = set(df_excel['etf_code'])
+    theme_map = df_excel.set_index('etf_code')['theme'].to_dict()
+    name_map = df_excel.set_index('etf_code')['etf_name'].to_dict()
+    return whitelist, theme_map, name_map
+
+
+def load_market_data(whitelist, start, end, use_cache=True):
+    """
+    通过掘金 history 加载日线收盘价与基准 (前复权)，结果缓存到 DATA_CACHE_DIR
+
+    Returns:
+        (prices_df, benchmark_df)
+    """
+    start_s = pd.Timestamp(start).strftime('%Y%m%d')
+    end_s = pd.Timestamp(end).strftime('%Y%m%d')
+    cache_file = os.path.join(config.DATA_CACHE_DIR, f"market_{start_s}_{end_s}_{len(whitelist)}.pkl")
+    if use_cache and os.path.exists(cache_file):
+        with open(cache_file, 'rb') as f:
+            data = pickle.load(f)
+        logger.info(f"📦 Market data loaded from cache: {cache_file}")
+        return data['prices'], data['benchmark']
+
+    from gm.api import history, set_token, ADJUST_PREV
+    set_token(config.GM_TOKEN)
+    start_dt = pd.Timestamp(start).strftime('%Y-%m-%d %H:%M:%S')
+    end_dt = pd.Timestamp(end).strftime('%Y-%m-%d %H:%M:%S')
+
+    hd = history(
+        symbol=",".join(sorted(whitelist)), frequency='1d', start_time=start_dt, end_time=end_dt,
+        fields='symbol,close,eob', fill_missing='last', adjust=ADJUST_PREV, df=True
+    )
+    hd['eob'] = pd.to_datetime(hd['eob']).dt.tz_localize(None)
+    prices_df = hd.pivot(index='eob', columns='symbol', values='close').ffill()
+
+    bm_data = history(
+        symbol=config.MACRO_BENCHMARK, frequency='1d', start_time=start_dt, end_time=end_dt,
+        fields='close,eob', fill_missing='last', adjust=ADJUST_PREV, df=True
+    )
+    bm_data['eob'] = pd.to_datetime(bm_data['eob']).dt.tz_localize(None)
+    benchmark_df = bm_data.set_index('eob')['close']
+
+    os.makedirs(config.DATA_CACHE_DIR, exist_ok=True)
+    with open(cache_file, 'wb') as f:
+        pickle.dump({'prices': prices_df, 'benchmark': benchmark_df}, f)
+    logger.info(f"✅ Market data: {len(prices_df)} days x {prices_df.shape[1]} symbols (cached to {cache_file})")
+    return prices_df, benchmark_df
@@ -0,0 +1,168 @@
+"""
+盘中分钟 bar 环形缓冲
+- IntradayBarBuffer: on_bar 写入当日 60s bar，按标的保存 (标的 × 分钟) 连续 NumPy 数组
+- 提供最新价、VWAP、日内高低点、分钟收益率，供 algo 注入"今日"价格行与日内特征计算
+
+跨日时自动清空；同一批 bars 内同一标的出现多次时仅保留最后一根。
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+PRICE_SOURCES = ('current', 'last', 'vwap')
+
+
+class IntradayBarBuffer:
+    """
+    Args:
+        symbols: 标的列表 (行顺序固定)
+        capacity: 每个标的保留的分钟 bar 数 (默认 240 = 一个完整交易日)
+    """
+
+    def __init__(self, symbols, capacity=240):
+        self.symbols = sorted(symbols)
+        self.capacity = capacity
+        self._row = {s: i for i, s in enumerate(self.symbols)}
+        n = len(self.symbols)
+        self.close = np.full((n, capacity), np.nan)
+        self.high = np.full((n, capacity), np.nan)
+        self.low = np.full((n, capacity), np.nan)
+        self.volume = np.zeros((n, capacity))
+        self.counts = np.zeros(n, dtype=np.int64)
+        self.day = None
+        # 不受容量限制的全日累计量
+        self._day_high = np.full(n, np.nan)
+        self._day_low = np.full(n, np.nan)
+        self._cum_volume = np.zeros(n)
+        self._cum_amount = np.zeros(n)
+        self._last_eob = np.full(n, np.datetime64('NaT'), dtype='datetime64[s]')
+
+    def reset(self, day=None):
+        self.close.fill(np.nan)
+        self.high.fill(np.nan)
+        self.low.fill(np.nan)
+        self.volume.fill(0.0)
+        self.counts.fill(0)
+        self._day_high.fill(np.nan)
+        self._day_low.fill(np.nan)
+        self._cum_volume.fill(0.0)
+        self._cum_amount.fill(0.0)
+        self._last_eob.fill(np.datetime64('NaT'))
+        self.day = day
+
+    def update(self, bars):
+        """写入一批 bar (on_bar 调用)"""
+        rows, eobs, close, high, low, vol, amt = [], [], [], [], [], [], []
+        for bar in bars:
+            row = self._row.get(bar.symbol)
+            if row is None or bar.close is None or not bar.close > 0:
+                continue
+            rows.append(row)
+            eobs.append(bar.eob)
+            close.append(bar.close)
+            high.append(bar.high or bar.close)
+            low.append(bar.low or bar.close)
+            vol.append(bar.volume or 0.0)
+            amt.append(getattr(bar, 'amount', 0.0) or 0.0)
+        if not rows:
+            return 0
+
+        eob = pd.Timestamp(eobs[-1])
+        if eob.tzinfo is not None:
+            eob = eob.tz_convert('Asia/Shanghai').tz_localize(None)
+        if eob.normalize() != self.day:
+            self.reset(eob.normalize())
+
+        rows = np.asarray(rows)
+        close, high, low = np.asarray(close, float), np.asarray(high, float), np.asarray(low, float)
+        vol, amt = np.asarray(vol, float), np.asarray(amt, float)
+        amt = np.where(amt > 0, amt, close * vol)
+
+        pos = self.counts[rows] % self.capacity
+        self.close[rows, pos] = close
+        self.high[rows, pos] = high
+        self.low[rows, pos] = low
+        self.volume[rows, pos] = vol
+        self.counts[rows] += 1
+        self._day_high[rows] = np.fmax(self._day_high[rows], high)
+        self._day_low[rows] = np.fmin(self._day_low[rows], low)
+        self._cum_volume[rows] += vol
+        self._cum_amount[rows] += amt
+        self._last_eob[rows] = np.datetime64(eob, 's')
+        return len(rows)
+
+    # === 读取 ===
+    def _ordered(self, arr):
+        """按时间顺序展开环形数组 (标的 × min(bar 数, capacity))，不足处为 NaN"""
+        width = int(min(self.counts.max(initial=0), self.capacity))
+        if width == 0:
+            return arr[:, :0]
+        if self.counts.max() <= self.capacity:
+            return np.ascontiguousarray(arr[:, :width])
+        start = np.where(self.counts > self.capacity, self.counts % self.capacity, 0)
+        idx = (start[:, None] + np.arange(self.capacity)[None, :]) % self.capacity
+        return np.take_along_axis(arr, idx, axis=1)
+
+    def last(self):
+        """最新分钟收盘价 (无 bar 为 NaN)"""
+        out = np.full(len(self.symbols), np.nan)
+        has = self.counts > 0
+        rows = np.nonzero(has)[0]
+        out[rows] = self.close[rows, (self.counts[rows] - 1) % self.capacity]
+        return out
+
+    def vwap(self):
+        """当日成交量加权均价 (无成交量时退化为最新价)"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vwap = self._cum_amount / self._cum_volume
+        return np.where(self._cum_volume > 0, vwap, self.last())
+
+    def day_high(self):
+        return self._day_high.copy()
+
+    def day_low(self):
+        return self._day_low.copy()
+
+    def closes(self):
+        """分钟收盘价 (标的 × 分钟，时间顺序)"""
+        return self._ordered(self.close)
+
+    def minute_returns(self):
+        """分钟简单收益率 (标的 × 分钟-1)"""
+        closes = self.closes()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return closes[:, 1:] / closes[:, :-1] - 1
+
+    def coverage(self, since=None):
+        """有 bar 的标的占比 (可限定最后一根 bar 不早于 since)"""
+        if not self.symbols:
+            return 0.0
+        has = self.counts > 0
+        if since is not None:
+            has &= self._last_eob >= np.datetime64(pd.Timestamp(since), 's')
+        return float(has.mean())
+
+    def snapshot(self, source='last', since=None):
+        """{symbol: price} ('last' 最新价 / 'vwap' 当日均价)，仅含有效价格 (可限定最后一根 bar 不早于 since)"""
+        values = self.vwap() if source == 'vwap' else self.last()
+        ok = np.isfinite(values) & (values > 0)
+        if since is not None:
+            ok &= self._last_eob >= np.datetime64(pd.Timestamp(since), 's')
+        return dict(zip(np.asarray(self.symbols)[ok].tolist(), values[ok].tolist()))
+
+    def features(self):
+        """日内特征表: last / vwap / high / low / ret_day / vol_min / bars"""
+        last = self.last()
+        closes = self.closes()
+        first = closes[:, 0] if closes.shape[1] else np.full(len(self.symbols), np.nan)
+        with np.errstate(divide='ignore', invalid='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            ret_day = last / first - 1
+            rets = self.minute_returns()
+            vol_min = np.nanstd(rets, axis=1) if rets.shape[1] else np.full(len(self.symbols), np.nan)
+        return pd.DataFrame({
+            'last': last, 'vwap': self.vwap(),
+            'high': self._day_high, 'low': self._day_low,
+            'ret_day': ret_day, 'vol_min': vol_min, 'bars': self.counts,
+        }, index=self.symbols)
@@ -0,0 +1,261 @@
+"""
+盘中 60s Bar 录制
+- BarRecorder: on_bar 只入队 (无 I/O)，后台线程按日写入列式分块文件
+- archive_day / archive_pending: 将某日分块合并为压缩归档 (YYYYMMDD.npz)
+- load_day / load_day_frame / list_days: 读取录制数据 (分块以 mmap 方式打开)
+
+目录结构 (BAR_ARCHIVE_DIR):
+    20250630/chunk_00001/{symbol,eob,open,high,low,close,volume,amount}.npy   # 当日未归档分块
+    20250627.npz                                                              # 已归档交易日
+"""
+import os
+import queue
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import config, logger
+
+# 列定义 (固定 dtype)
+BAR_COLUMNS = {
+    'symbol': 'S16',
+    'eob': 'datetime64[s]',
+    'open': 'f8',
+    'high': 'f8',
+    'low': 'f8',
+    'close': 'f8',
+    'volume': 'f8',
+    'amount': 'f8',
+}
+_FIELDS = list(BAR_COLUMNS)
+_STOP = object()
+
+
+def _field(bar, name, default=0.0):
+    value = getattr(bar, name, None)
+    if value is None and isinstance(bar, dict):
+        value = bar.get(name)
+    return default if value is None else value
+
+
+def _local_naive(eob):
+    """eob -> 北京时间 naive Timestamp"""
+    ts = pd.Timestamp(eob)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert('Asia/Shanghai').tz_localize(None)
+    return ts
+
+
+class BarRecorder:
+    """
+    非阻塞 Bar 录制器
+
+    Args:
+        root: 归档目录，默认 config.BAR_ARCHIVE_DIR
+        flush_rows: 缓冲行数达到该值即写出一个分块
+        flush_interval: 距上次写出超过该秒数即写出一个分块
+        queue_size: 队列容量 (按 on_bar 批次计)，写满时丢弃并计数，绝不阻塞 on_bar
+        start: 是否立即启动后台写线程
+    """
+
+    def __init__(self, root=None, flush_rows=20000, flush_interval=300, queue_size=10000, start=True):
+        self.root = root or config.BAR_ARCHIVE_DIR
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.written = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._buffer = []
+        self._day = None
+        self._thread = None
+        os.makedirs(self.root, exist_ok=True)
+        if start:
+            self.start()
+
+    def start(self):
+        """归档遗留的历史交易日并启动写线程"""
+        archive_pending(self.root, before=pd.Timestamp.now().strftime('%Y%m%d'))
+        self._thread = threading.Thread(target=self._run, daemon=True, name="BarRecorder")
+        self._thread.start()
+
+    def record(self, bars):
+        """on_bar 调用：只做字段提取与入队"""
+        rows = [
+            (_field(b, 'symbol', ''), _field(b, 'eob', None),
+             _field(b, 'open'), _field(b, 'high'), _field(b, 'low'), _field(b, 'close'),
+             _field(b, 'volume'), _field(b, 'amount'))
+            for b in bars
+        ]
+        if not rows:
+            return
+        try:
+            self._queue.put_nowait(rows)
+        except queue.Full:
+            self.dropped += len(rows)
+
+    def close(self, timeout=10.0):
+        """写出剩余数据并归档当日 (收盘或退出时调用)"""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("⚠️ BarRecorder queue full on close, pending bars dropped")
+        self._thread.join(timeout)
+        self._thread = None
+        if self.dropped:
+            logger.warning(f"⚠️ BarRecorder dropped {self.dropped} bars (queue full)")
+
+    # === 后台线程 ===
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                break
+            try:
+                if item:
+                    self._append(item)
+                if self._buffer and (len(self._buffer) >= self.flush_rows or
+                                     time.monotonic() - last_flush >= self.flush_interval):
+                    self._flush()
+                    last_flush = time.monotonic()
+            except Exception as e:
+                logger.error(f"❌ BarRecorder write failed: {e}")
+
+        try:
+            self._flush()
+            if self._day:
+                archive_day(self.root, self._day)
+        except Exception as e:
+            logger.error(f"❌ BarRecorder final flush failed: {e}")
+
+    def _append(self, rows):
+        for sym, eob, o, h, l, c, v, amt in rows:
+            if eob is None:
+                continue
+            ts = _local_naive(eob)
+            day = ts.strftime('%Y%m%d')
+            if day != self._day:
+                # 跨日：写出并归档前一交易日
+                self._flush()
+                if self._day:
+                    archive_day(self.root, self._day)
+                self._day = day
+            self._buffer.append((sym, ts.to_datetime64(), o, h, l, c, v, amt))
+
+    def _flush(self):
+        if not self._buffer or not self._day:
+            return
+        rows = self._buffer
+        self._buffer = []
+        columns = list(zip(*rows))
+        arrays = {
+            name: np.asarray(col, dtype=BAR_COLUMNS[name])
+            for name, col in zip(_FIELDS, columns)
+        }
+        write_chunk(self.root, self._day, arrays)
+        self.written += len(rows)
+
+
+def _day_dir(root, day):
+    return os.path.join(root, day)
+
+
+def write_chunk(root, day, arrays):
+    """写入一个列式分块 (先写临时目录再原子重命名)"""
+    day_dir = _day_dir(root, day)
+    os.makedirs(day_dir, exist_ok=True)
+    n = len([d for d in os.listdir(day_dir) if d.startswith('chunk_')])
+    final = os.path.join(day_dir, f"chunk_{n + 1:05d}")
+    temp = final + '.tmp'
+    os.makedirs(temp, exist_ok=True)
+    for name in _FIELDS:
+        np.save(os.path.join(temp, f"{name}.npy"), arrays[name])
+    os.replace(temp, final)
+    return final
+
+
+def _chunk_dirs(root, day):
+    day_dir = _day_dir(root, day)
+    if not os.path.isdir(day_dir):
+        return []
+    return sorted(
+        os.path.join(day_dir, d) for d in os.listdir(day_dir)
+        if d.startswith('chunk_') and not d.endswith('.tmp')
+    )
+
+
+def archive_day(root, day):
+    """合并某日全部分块 (含已有归档) 为压缩 npz，并删除分块目录"""
+    parts = [load_chunk(d, mmap=False) for d in _chunk_dirs(root, day)]
+    if not parts:
+        return None
+    archive = os.path.join(root, f"{day}.npz")
+    if os.path.exists(archive):
+        with np.load(archive) as data:
+            parts.insert(0, {name: data[name] for name in _FIELDS})
+    merged = {name: np.concatenate([p[name] for p in parts]) for name in _FIELDS}
+    temp = archive + '.tmp.npz'
+    np.savez_compressed(temp, **merged)
+    os.replace(temp, archive)
+    shutil.rmtree(_day_dir(root, day), ignore_errors=True)
+    logger.info(f"🗜️ Bars archived: {archive} ({len(merged['close'])} rows)")
+    return archive
+
+
+def archive_pending(root, before=None):
+    """归档 before (YYYYMMDD) 之前所有未归档交易日"""
+    if not os.path.isdir(root):
+        return []
+    days = [d for d in os.listdir(root) if d.isdigit() and len(d) == 8 and os.path.isdir(_day_dir(root, d))]
+    return [archive_day(root, d) for d in sorted(days) if before is None or d < before]
+
+
+def load_chunk(chunk_dir, mmap=True):
+    mode = 'r' if mmap else None
+    return {name: np.load(os.path.join(chunk_dir, f"{name}.npy"), mmap_mode=mode) for name in _FIELDS}
+
+
+def list_days(root=None):
+    """已录制的交易日 (含未归档)"""
+    root = root or config.BAR_ARCHIVE_DIR
+    if not os.path.isdir(root):
+        return []
+    days = {d[:8] for d in os.listdir(root) if d[:8].isdigit() and (d.endswith('.npz') or len(d) == 8)}
+    return sorted(days)
+
+
+def load_day(day, root=None, mmap=True):
+    """
+    读取某日全部 bar (列 -> ndarray)
+
+    仅有单个未归档分块时直接返回 mmap 数组；否则拼接为内存数组。
+    """
+    root = root or config.BAR_ARCHIVE_DIR
+    day = pd.Timestamp(day).strftime('%Y%m%d')
+    parts = []
+    archive = os.path.join(root, f"{day}.npz")
+    if os.path.exists(archive):
+        with np.load(archive) as data:
+            parts.append({name: data[name] for name in _FIELDS})
+    parts.extend(load_chunk(d, mmap=mmap) for d in _chunk_dirs(root, day))
+    if not parts:
+        return {name: np.empty(0, dtype=dt) for name, dt in BAR_COLUMNS.items()}
+    if len(parts) == 1:
+        return parts[0]
+    return {name: np.concatenate([p[name] for p in parts]) for name in _FIELDS}
+
+
+def load_day_frame(day, root=None):
+    """读取某日 bar 为 DataFrame (symbol 解码为 str)"""
+    cols = load_day(day, root, mmap=False)
+    df = pd.DataFrame({name: np.asarray(arr) for name, arr in cols.items()})
+    df['symbol'] = df['symbol'].str.decode('ascii')
+    return df
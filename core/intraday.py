@@ -0,0 +1,165 @@
+"""
+分钟级止损回放
+- apply_bar_stops: 以与 on_bar 相同的规则 (固定止损 + 移动止盈回落 + 保护期) 对 RPM 全部持仓
+  一次性向量化评估一段分钟 bar，在首个触发 bar 的收盘价卖出
+- RecordedBars: 读取 BarRecorder 录制的归档，转换为 (时间 × 标的) 矩阵
+- stop_outcomes / summarize_stops: 止损成交的逐笔收益与汇总
+
+分钟数据源约定: 任意实现 day_bars(day) -> (times, symbols, high, close) 或 None 的对象，
+times 为 datetime64 数组 (北京时间 naive)，high/close 为 len(times) × len(symbols) 矩阵。
+sim.engine.SimMarket 与 RecordedBars 均满足该约定。
+"""
+import numpy as np
+import pandas as pd
+
+from config import config
+from .bar_recorder import load_day
+
+_EPOCH = np.datetime64('1970-01-01T00:00:00', 's')
+
+
+class RecordedBars:
+    """BarRecorder 录制数据的分钟数据源"""
+
+    def __init__(self, root=None):
+        self.root = root
+
+    def day_bars(self, day):
+        cols = load_day(day, self.root)
+        if len(cols['close']) == 0:
+            return None
+        codes, sym_idx = np.unique(cols['symbol'], return_inverse=True)
+        times, t_idx = np.unique(cols['eob'], return_inverse=True)
+        high = np.full((len(times), len(codes)), np.nan)
+        close = np.full((len(times), len(codes)), np.nan)
+        high[t_idx, sym_idx] = cols['high']
+        close[t_idx, sym_idx] = cols['close']
+        return times, [c.decode('ascii') for c in codes], high, close
+
+
+def _entry_times(records):
+    """entry_dt 列表 -> datetime64[s] (缺失视为远古，不受保护期限制)"""
+    out = np.full(len(records), _EPOCH)
+    for i, rec in enumerate(records):
+        entry_dt = rec.get('entry_dt')
+        if entry_dt is not None:
+            out[i] = np.datetime64(pd.Timestamp(entry_dt).tz_localize(None), 's')
+    return out
+
+
+def apply_bar_stops(rpm, day_bars, after=None, until=None, trades=None, ref_prices=None):
+    """
+    对 (after, until] 区间内的分钟 bar 执行 on_bar 止损逻辑
+
+    Args:
+        rpm: RollingPortfolioManager (原地修改持仓与 high_price)
+        day_bars: (times, symbols, high, close)
+        after / until: 时间窗口 (after 不含，until 含)，缺省不限
+        trades: 成交记录列表 (追加 reason='bar_stop')
+        ref_prices: 当日决策价 {symbol: price}，写入成交记录的 close_price 便于比较
+    Returns:
+        list: 本次触发的成交记录
+    """
+    times, symbols, high, close = day_bars
+    mask = np.ones(len(times), dtype=bool)
+    if after is not None:
+        mask &= times > np.datetime64(pd.Timestamp(after), 's')
+    if until is not None:
+        mask &= times <= np.datetime64(pd.Timestamp(until), 's')
+    if not mask.any():
+        return []
+    times, high, close = times[mask], high[mask], close[mask]
+
+    col = {s: i for i, s in enumerate(symbols)}
+    positions = [
+        (t, s, rec) for t in rpm.tranches for s, rec in t.pos_records.items()
+        if s in t.holdings and s in col
+    ]
+    if not positions:
+        return []
+
+    idx = np.array([col[s] for _, s, _ in positions])
+    records = [rec for _, _, rec in positions]
+    entry = np.array([rec['entry_price'] for rec in records], dtype=float)
+    high0 = np.array([rec['high_price'] for rec in records], dtype=float)
+    bar_high, bar_close = high[:, idx], close[:, idx]
+
+    # 保护期 (与 on_bar 一致: (bar_dt - entry_dt).days <= PROTECTION_DAYS 时跳过)
+    if config.PROTECTION_DAYS > 0:
+        held_days = (times[:, None] - _entry_times(records)[None, :]) // np.timedelta64(1, 'D')
+        active = held_days > config.PROTECTION_DAYS
+        bar_high = np.where(active, bar_high, np.nan)
+        bar_close = np.where(active, bar_close, np.nan)
+
+    # high_price 先以当根 bar 最高价更新，再判断收盘价
+    run_high = np.fmax.accumulate(np.vstack([high0[None, :], bar_high]), axis=0)[1:]
+    with np.errstate(invalid='ignore'):
+        stop = (
+            (bar_close < entry * (1 - config.STOP_LOSS)) |
+            ((run_high > entry * (1 + config.TRAILING_TRIGGER)) &
+             (bar_close < run_high * (1 - config.TRAILING_DROP)))
+        )
+    hit = stop.any(axis=0)
+    first = stop.argmax(axis=0)
+
+    fired = []
+    for p, (t, s, rec) in enumerate(positions):
+        if not hit[p]:
+            if not np.isnan(run_high[-1, p]):
+                rec['high_price'] = float(run_high[-1, p])
+            continue
+        k = first[p]
+        price = float(bar_close[k, p])
+        trade = {
+            'dt': pd.Timestamp(times[k]).to_pydatetime(), 'tranche': t.id, 'symbol': s, 'side': 'SELL',
+            'qty': t.holdings.get(s, 0), 'price': price, 'reason': 'bar_stop',
+            'close_price': (ref_prices or {}).get(s),
+        }
+        t.sell(s, price)
+        fired.append(trade)
+    if trades is not None:
+        trades.extend(fired)
+    return fired
+
+
+def stop_outcomes(trades):
+    """
+    止损卖出 (guard / bar_stop) 的逐笔收益 (相对 Tranche+标的 加权平均成本)
+
+    Returns:
+        DataFrame: dt, tranche, symbol, reason, price, cost, ret, close_price
+    """
+    books = {}
+    rows = []
+    for tr in trades:
+        key = (tr['tranche'], tr['symbol'])
+        qty, cost = books.get(key, (0, 0.0))
+        if tr['side'] == 'BUY':
+            books[key] = (qty + tr['qty'], cost + tr['qty'] * tr['price'])
+            continue
+        if qty <= 0 or tr['qty'] <= 0:
+            continue
+        avg = cost / qty
+        if tr.get('reason') in ('guard', 'bar_stop') and avg > 0:
+            rows.append({
+                'dt': tr['dt'], 'tranche': tr['tranche'], 'symbol': tr['symbol'], 'reason': tr['reason'],
+                'price': tr['price'], 'cost': avg, 'ret': tr['price'] / avg - 1,
+                'close_price': tr.get('close_price'),
+            })
+        sold = min(tr['qty'], qty)
+        books[key] = (qty - sold, cost - sold * avg)
+    return pd.DataFrame(rows, columns=['dt', 'tranche', 'symbol', 'reason', 'price', 'cost', 'ret', 'close_price'])
+
+
+def summarize_stops(outcomes):
+    """止损成交汇总: 笔数、平均收益、胜率、相对当日决策价的差异"""
+    if outcomes.empty:
+        return {'count': 0, 'avg_ret': 0.0, 'win_rate': 0.0, 'avg_vs_close': 0.0}
+    ref = pd.to_numeric(outcomes['close_price'], errors='coerce')
+    vs_close = (outcomes['price'] / ref - 1).dropna()
+    return {
+        'count': len(outcomes),
+        'avg_ret': float(outcomes['ret'].mean()),
+        'win_rate': float((outcomes['ret'] > 0).mean()),
+        'avg_vs_close': float(vs_close.mean()) if not vs_close.empty else 0.0,
+    }
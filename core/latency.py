@@ -0,0 +1,138 @@
+"""
+分阶段时延监控
+- StageTimer: 轻量分段计时器 (lap 记录自上一分段以来的耗时)，超出预算时回调告警 (每轮仅一次)
+- append_metrics: 将单轮分段耗时追加写入滚动 JSONL 指标文件
+- read_metrics: 读取指标文件 (供排查与统计)
+"""
+import os
+import json
+import time
+from datetime import datetime
+
+from config import config, logger
+
+
+class StageTimer:
+    """
+    分段计时器
+
+    用法:
+        timer = StageTimer('algo', budget_sec=240, alert=send_text)
+        ...                      # 阶段 A
+        timer.lap('inject_ticks')
+        if timer.would_exceed(30):  # 预判后续等待是否会超出预算
+            ...
+        record = timer.finish()
+    """
+
+    def __init__(self, name, budget_sec, alert=None, started_at=None):
+        self.name = name
+        self.budget_sec = budget_sec
+        self.alert = alert
+        self.started_at = started_at or datetime.now()
+        self.stages = {}
+        self.notes = {}
+        self.alerted = False
+        self._t0 = time.perf_counter()
+        self._mark = self._t0
+
+    def elapsed(self):
+        """自开始以来的耗时 (秒)"""
+        return time.perf_counter() - self._t0
+
+    def lap(self, stage):
+        """记录自上一分段以来的耗时，重复的阶段名累加"""
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._mark) * 1000
+        self._mark = now
+        if self.elapsed() > self.budget_sec:
+            self._raise_alert(f"阶段 {stage} 结束时已耗时 {self.elapsed():.1f}s")
+
+    def note(self, key, value):
+        """附加到本轮记录的指标 (如数据时延)，须可 JSON 序列化"""
+        self.notes[key] = value
+
+    def would_exceed(self, extra_sec, stage=None):
+        """预判再耗时 extra_sec 秒后是否超出预算；超出则告警"""
+        projected = self.elapsed() + extra_sec
+        if projected > self.budget_sec:
+            self._raise_alert(f"预计 {stage or '后续阶段'} 完成时耗时 {projected:.1f}s")
+            return True
+        return False
+
+    def _raise_alert(self, reason):
+        if self.alerted:
+            return
+        self.alerted = True
+        top = sorted(self.stages.items(), key=lambda kv: kv[1], reverse=True)[:3]
+        msg = (
+            f"⏱️ {self.name} 执行超预算\n"
+            f"{reason} > 预算 {self.budget_sec:.0f}s\n"
+            f"耗时最多: " + ", ".join(f"{k} {v / 1000:.1f}s" for k, v in top)
+        )
+        logger.warning(msg.replace("\n", " | "))
+        if self.alert:
+            try:
+                self.alert(msg)
+            except Exception as e:
+                logger.warning(f"⚠️ 时延告警发送失败: {e}")
+
+    def finish(self):
+        """结束计时，返回可序列化的单轮记录"""
+        total = self.elapsed()
+        if total > self.budget_sec:
+            self._raise_alert(f"总耗时 {total:.1f}s")
+        record = {
+            'run': self.name,
+            'start': self.started_at.isoformat(timespec='seconds'),
+            'total_ms': round(total * 1000, 3),
+            'budget_ms': round(self.budget_sec * 1000, 3),
+            'over_budget': total > self.budget_sec,
+            'stages': {k: round(v, 3) for k, v in self.stages.items()},
+        }
+        if self.notes:
+            record['notes'] = self.notes
+        return record
+
+
+def append_metrics(record, path=None, max_bytes=None):
+    """
+    追加一条记录到滚动指标文件；超过 max_bytes 时仅保留最近一半记录
+
+    异常只记录日志，不影响交易主流程
+    """
+    path = path or os.path.join(config.LOG_DIR, config.LATENCY_METRICS_FILE)
+    max_bytes = max_bytes or config.LATENCY_METRICS_MAX_BYTES
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if os.path.getsize(path) > max_bytes:
+            with open(path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+            temp_path = path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.writelines(lines[len(lines) // 2:])
+            os.replace(temp_path, path)
+    except Exception as e:
+        logger.warning(f"⚠️ 时延指标写入失败: {e}")
+
+
+def read_metrics(path=None, run=None):
+    """读取指标文件，返回记录列表 (可按 run 名过滤)"""
+    path = path or os.path.join(config.LOG_DIR, config.LATENCY_METRICS_FILE)
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if run is None or rec.get('run') == run:
+                records.append(rec)
+    return records
@@ -0,0 +1,110 @@
+"""
+流动性阶段 (ADV / 成交额)
+- LiquidityCache: 由 volumes_df (× prices_df) 一次向量化计算滚动日均成交量 (ADV) 与日均成交额矩阵，按数据版本缓存
+- liquid_mask: 日均成交额下限门槛 (MIN_ADV_AMOUNT)，供 get_ranking / SignalCache 过滤候选
+- order_cap: 单笔买入金额上限 = MAX_PARTICIPATION × ADV × 价格，供调仓下单
+
+决策日只使用此前已完成交易日的成交数据 (盘中当日成交量不完整，回测中也避免前视)。
+"""
+import numpy as np
+import pandas as pd
+
+from config import config
+from .volatility import first_changed_row
+
+
+class LiquidityCache:
+    """
+    Args:
+        window: 滚动窗口 (交易日)，默认 ADV_WINDOW
+    """
+
+    def __init__(self, window=None):
+        self.window = window or config.ADV_WINDOW
+        self.index = None
+        self.columns = None
+        self._values = None
+        self.adv = None        # 日均成交量 (股/份)
+        self.turnover = None   # 日均成交额 (元)
+        self.recomputed = 0
+
+    def sync(self, prices_df, volumes_df):
+        """使缓存与 (prices_df, volumes_df) 一致；只重算变化行及其窗口；返回 self"""
+        volumes = volumes_df.to_numpy(dtype=float)
+        prices = prices_df.reindex(index=volumes_df.index, columns=volumes_df.columns).to_numpy(dtype=float)
+        values = np.hstack([volumes, prices])
+        n = len(values)
+        m = first_changed_row(self.index, self.columns, self._values, volumes_df.index, volumes_df.columns, values)
+        if m == n and self._values is not None and n == len(self._values):
+            return self
+
+        start = max(0, m - self.window + 1)
+        vol_block = pd.DataFrame(volumes[start:])
+        amount_block = vol_block * prices[start:]
+        offset = m - start
+        adv = vol_block.rolling(self.window, min_periods=1).mean().to_numpy()[offset:]
+        turnover = amount_block.rolling(self.window, min_periods=1).mean().to_numpy()[offset:]
+        self.adv = np.vstack([self.adv[:m], adv]) if m > 0 else adv
+        self.turnover = np.vstack([self.turnover[:m], turnover]) if m > 0 else turnover
+
+        self.index, self.columns = volumes_df.index, volumes_df.columns
+        self._values = values.copy()
+        self.recomputed += n - m
+        return self
+
+    def row(self, dt):
+        """dt 所在交易日之前最后一个已完成交易日的行号"""
+        day = pd.Timestamp(dt).normalize()
+        return int(self.index.searchsorted(day, side='left')) - 1
+
+    def _at(self, matrix, dt):
+        pos = self.row(dt)
+        if pos < 0:
+            return pd.Series(np.nan, index=self.columns)
+        return pd.Series(matrix[pos], index=self.columns)
+
+    def adv_at(self, dt):
+        return self._at(self.adv, dt)
+
+    def turnover_at(self, dt):
+        return self._at(self.turnover, dt)
+
+    def liquid_mask(self, dt, min_amount=None):
+        """日均成交额达标的标的 (无成交数据视为不达标)"""
+        min_amount = config.MIN_ADV_AMOUNT if min_amount is None else min_amount
+        return self.turnover_at(dt).fillna(0) >= min_amount
+
+    def order_cap(self, symbol, dt, price, participation=None):
+        """单笔买入金额上限；无成交数据时返回 None (不设上限)"""
+        participation = config.MAX_PARTICIPATION if participation is None else participation
+        if symbol not in self.columns or not price or price <= 0:
+            return None
+        pos = self.row(dt)
+        if pos < 0:
+            return None
+        adv = self.adv[pos, self.columns.get_loc(symbol)]
+        if np.isnan(adv):
+            return None
+        return participation * adv * price
+
+
+def context_liquidity(context):
+    """
+    context 上已同步的流动性缓存
+    未启用 LIQUIDITY_FILTER、未配置缓存或无 volumes_df 时返回 None
+    """
+    if not config.LIQUIDITY_FILTER:
+        return None
+    cache = getattr(context, 'liquidity', None)
+    volumes_df = getattr(context, 'volumes_df', None)
+    if not isinstance(cache, LiquidityCache) or not isinstance(volumes_df, pd.DataFrame):
+        return None
+    return cache.sync(context.prices_df, volumes_df)
+
+
+def cap_buy_value(liquidity, symbol, dt, price, value):
+    """按参与率上限截断买入金额 (liquidity 为 None 时原样返回)"""
+    if liquidity is None:
+        return value
+    cap = liquidity.order_cap(symbol, dt, price)
+    return value if cap is None else min(value, cap)
@@ -2,9 +2,51 @@
 策略核心纯逻辑模块 (Pure Logic)
 用于实现像素级对齐：确保回测、实盘、模拟脚本使用完全同一套计算逻辑。
 """
+import numpy as np
 import pandas as pd
 from config import config, logger
 from .signal import get_ranking, get_market_regime
+from .weights import scheme_weights, context_risk_model
+
+# resolve_prices 返回的价格来源
+PRICE_TODAY, PRICE_PREV, PRICE_MISSING = 0, 1, -1
+
+
+def resolve_prices(hist, symbols):
+    """
+    向量化价格解析：取最后一行有效价格 (非 NaN 且 > 0)，否则回退到前一行，否则缺失
+
+    Args:
+        hist: 截至决策时点的价格矩阵 (行=日期, 列=标的)
+        symbols: 需要解析的标的 (可迭代)
+    Returns:
+        (symbols ndarray, prices ndarray, source ndarray): 按 symbols 顺序对齐，
+        source 取值 PRICE_TODAY / PRICE_PREV / PRICE_MISSING，缺失处价格为 NaN
+    """
+    symbols = np.asarray(list(symbols), dtype=object)
+    prices = np.full(len(symbols), np.nan)
+    source = np.full(len(symbols), PRICE_MISSING, dtype=np.int8)
+    if hist.empty or len(symbols) == 0:
+        return symbols, prices, source
+
+    cols = hist.columns.get_indexer(symbols)
+    present = cols >= 0
+    tail = hist.iloc[-2:].to_numpy(dtype=float)
+    with np.errstate(invalid='ignore'):
+        last = np.where(present, tail[-1, cols], np.nan)
+        ok = present & ~np.isnan(last) & (last > 0)
+        prices[ok], source[ok] = last[ok], PRICE_TODAY
+        if len(tail) > 1:
+            prev = np.where(present, tail[0, cols], np.nan)
+            fallback = ~ok & present & ~np.isnan(prev) & (prev > 0)
+            prices[fallback], source[fallback] = prev[fallback], PRICE_PREV
+    return symbols, prices, source
+
+
+def price_map_from(symbols, prices, source):
+    """resolve_prices 结果 -> {symbol: price} (不含缺失)"""
+    valid = source != PRICE_MISSING
+    return dict(zip(symbols[valid].tolist(), prices[valid].tolist()))
 
 def calculate_target_holdings(context, current_dt, active_t, price_map):
     """
@@ -18,7 +60,8 @@ def calculate_target_holdings(context, current_dt, active_t, price_map):
         
     Returns:
         dict: 目标持仓 {symbol: target_weight_score}
-              注意：这里返回的是权重的份数 (如 3, 1, 1)，不是百分比
+              注意：EQUAL / CHAMPION 返回的是权重的份数 (如 3, 1, 1)，不是百分比；
+              INV_VOL / ERC / SCORE 返回合计为 1 的比例
     """
     # 1. 获取排名
     rank_df, _ = get_ranking(context, current_dt)
@@ -27,51 +70,96 @@ def calculate_target_holdings(context, current_dt, active_t, price_map):
         logger.warning(f"⚠️ [Logic] Ranking failed for {current_dt}")
         return {}
 
+    return select_target_weights(rank_df, active_t, context_risk_model(context, current_dt))
+
+
+def theme_rank(themes):
+    """
+    组内序号 (group-cumcount): 每个标的在其主题内按排名顺序的位次 (0 起)
+    主题先整数编码 (NaN 归为同一组)，稳定排序后用段首索引相减，全程向量化
+    """
+    codes, _ = pd.factorize(np.asarray(themes, dtype=object))
+    n = len(codes)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    codes = np.where(codes < 0, codes.max() + 1, codes)
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    pos = np.arange(n)
+    head = np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]
+    ranks = np.empty(n, dtype=np.int64)
+    ranks[order] = pos - np.maximum.accumulate(np.where(head, pos, 0))
+    return ranks
+
+
+def dedupe_correlated(candidates, risk_model, threshold=None, limit=None):
+    """
+    相关性去重 (贪心): 按排名顺序入选，与任一已入选标的相关系数超过 threshold 的候选跳过
+    每入选一只只计算其与后续候选的一行相关系数并累积屏蔽掩码；入选 limit 只后停止
+    相关系数未知 (样本不足/不在模型中) 的不屏蔽
+    """
+    threshold = config.CORR_THRESHOLD if threshold is None else threshold
+    k = len(candidates)
+    if k < 2:
+        return list(candidates)
+    cols = risk_model.indexer(candidates)
+    blocked = np.zeros(k, dtype=bool)
+    keep = []
+    for i in range(k):
+        if blocked[i]:
+            continue
+        keep.append(i)
+        if limit is not None and len(keep) >= limit:
+            break
+        if cols[i] >= 0:
+            blocked[i + 1:] |= risk_model.corr_row(cols[i], cols[i + 1:]) > threshold
+    return [candidates[i] for i in keep]
+
+
+def candidate_lists(rank_df, risk_model=None):
+    """
+    主题约束 (+ 相关性去重) 后的候选名单
+    Returns:
+        (candidates, core_targets, buffer_targets): 全部候选 / 前 TOP_N / 前 TOP_N + TURNOVER_BUFFER
+        启用 CORR_DEDUPE 时 candidates 只保留到 TOP_N + TURNOVER_BUFFER 只
+    """
+    keep = theme_rank(rank_df['theme'].to_numpy()) < config.MAX_PER_THEME
+    candidates = rank_df.index[keep].tolist()
+    if config.CORR_DEDUPE and risk_model is not None:
+        candidates = dedupe_correlated(candidates, risk_model, limit=config.TOP_N + config.TURNOVER_BUFFER)
+    return candidates, candidates[:config.TOP_N], candidates[:config.TOP_N + config.TURNOVER_BUFFER]
+
+
+def select_target_weights(rank_df, active_t, risk_model=None):
+    """
+    由排名表生成目标权重份数 (主题约束 + Buffer 软轮动 + 权重方案)
+    供 calculate_target_holdings 与本地回测引擎共用
+    risk_model: 风险类方案 (INV_VOL / ERC) 与相关性去重所需的 RollingCovariance
+    """
     current_top_n = config.TOP_N
     
-    # 2. 生成候选名单
-    candidates = []
-    themes = {}
-    for code, row in rank_df.iterrows():
-        if themes.get(row['theme'], 0) < config.MAX_PER_THEME:
-            candidates.append(code)
-            themes[row['theme']] = themes.get(row['theme'], 0) + 1
+    # 2. 生成候选名单，截取核心和缓冲名单
+    candidates, core_targets, buffer_targets = candidate_lists(rank_df, risk_model)
     
-    # 截取核心和缓冲名单
-    core_targets = candidates[:current_top_n]
-    buffer_targets = candidates[:current_top_n + config.TURNOVER_BUFFER]
-    
-    # 3. 智能保留逻辑 (Soft Rotation)
-    existing_holdings = list(active_t.holdings.keys())
-    kept_holdings = []
-    current_slots_used = 0
-    
-    # A. 优先保留在 Buffer 中的老持仓
-    for s in existing_holdings:
-        if s in buffer_targets and current_slots_used < current_top_n:
-            kept_holdings.append(s)
-            current_slots_used += 1
-            # logger.info(f"🤝 [Logic] Kept in Buffer: {s}")
+    # 3. 智能保留逻辑 (Soft Rotation)，成员判断统一走集合
+    # A. 优先保留在 Buffer 中的老持仓 (按持仓顺序，最多 TOP_N 个)
+    buffer_set = set(buffer_targets)
+    kept_holdings = [s for s in active_t.holdings if s in buffer_set][:current_top_n]
+    kept_set = set(kept_holdings)
     
     # B. 填充新标的
-    targets_to_buy = []
-    for s in core_targets:
-        if current_slots_used >= current_top_n:
-            break
-        if s not in kept_holdings:
-            targets_to_buy.append(s)
-            current_slots_used += 1
-            
-    final_list = kept_holdings + targets_to_buy
+    targets_to_buy = [s for s in core_targets if s not in kept_set][:current_top_n - len(kept_holdings)]
+    final_set = kept_set.union(targets_to_buy)
     
     # 4. 权重计算 (核心对齐点)
     # 当前方案: 3:1:1:1 (Champion Heavy)
     # 逻辑: 只有 candidates 里的第一个才给 3 份，其他的给 1 份
     # 注意: s 在 candidates 中的索引 i 决定了它的地位
+    # 最终名单都在 buffer_targets 内，只需扫描候选名单前 TOP_N + TURNOVER_BUFFER 个
     
     weights = {}
-    for i, s in enumerate(candidates):
-        if s in final_list:
+    for i, s in enumerate(buffer_targets):
+        if s in final_set:
             # === 权重逻辑：根据配置选择方案 ===
             # EQUAL: 等权 (1:1:1:1)
             # CHAMPION: 冠军加权 (3:1:1:1)
@@ -80,8 +168,9 @@ def calculate_target_holdings(context, current_dt, active_t, price_map):
             else:
                 w = 3 if i == 0 else 1
             weights[s] = w
-            
-    return weights
+
+    # 5. 非份数方案 (INV_VOL / ERC / SCORE) 换算为比例权重
+    return scheme_weights(weights, rank_df, risk_model)
 
 def calculate_position_scale(context, current_dt):
     """
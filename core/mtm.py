@@ -0,0 +1,157 @@
+"""
+盘中实时盯市 (on_bar 驱动)
+- IntradayMarkToMarket: 以 (Tranche × 持仓标的) 持仓矩阵为基础，每批 60s bar 只按推送到的持仓标的
+  增量更新各 Tranche 市值与组合总值，单批代价 O(持仓标的数)
+- 跟踪日内峰值、峰谷回撤、相对开盘 (昨收估值) 收益；触达告警线 / 熔断线时返回事件，由 on_bar 告警并熔断
+
+账本 (持仓或现金) 变化时 (algo 调仓、盘中止损) 自动重建矩阵：已盯市的价格沿用，新标的取参考价，
+日内峰值与开盘估值保留 (卖出按成交价转为现金，总值连续)。跨日时重新以参考价估值开盘。
+"""
+import numpy as np
+
+from config import config
+from .reconcile import holdings_matrix
+
+
+def _book_key(tranches):
+    """账本签名：持仓或现金变化时改变"""
+    return tuple((t.cash, tuple(t.holdings.items())) for t in tranches)
+
+
+class IntradayMarkToMarket:
+    """
+    Args:
+        alert_pct: 峰谷回撤告警线，默认 INTRADAY_DD_ALERT_PCT
+        halt_pct: 峰谷回撤熔断线，默认 INTRADAY_MAX_DRAWDOWN_PCT (相对开盘亏损超过 MAX_DAILY_LOSS_PCT 同样熔断)
+    """
+
+    def __init__(self, alert_pct=None, halt_pct=None):
+        self.alert_pct = config.INTRADAY_DD_ALERT_PCT if alert_pct is None else alert_pct
+        self.halt_pct = config.INTRADAY_MAX_DRAWDOWN_PCT if halt_pct is None else halt_pct
+        self.day = None
+        self._key = None
+        self._col = {}
+        self.symbols = []
+        self.qty = np.zeros((0, 0))
+        self.cash = np.zeros(0)
+        self.prices = np.zeros(0)
+        self._qty_total = np.zeros(0)
+        self.values = np.zeros(0)
+        self.tranche_peak = np.zeros(0)
+        self.total = 0.0
+        self.open_value = 0.0
+        self.peak = 0.0
+        self.drawdown = 0.0
+        self.max_drawdown = 0.0
+        self._alerted = False
+        self._halted = False
+
+    # ------------------------------------------------------------------
+    # 账本
+    # ------------------------------------------------------------------
+    def rebuild(self, tranches, ref_prices=None, day=None):
+        """
+        按当前账本重建持仓矩阵；day 与当前不同视为新交易日 (重置峰值与事件)
+
+        Args:
+            ref_prices: 返回 {symbol: 参考价} 的函数，仅为尚未盯市的标的取价 (通常为昨收)
+        """
+        new_day = day is not None and day != self.day
+        last = {} if new_day else dict(zip(self.symbols, self.prices.tolist()))
+        symbols = sorted({s for t in tranches for s in t.holdings})
+        missing = [s for s in symbols if s not in last]
+        ref = (ref_prices() if ref_prices is not None and missing else None) or {}
+        prices = []
+        for s in symbols:
+            px = last.get(s)
+            if px is None:
+                px = ref.get(s)
+            if px is None or not px > 0:
+                px = next((t.pos_records.get(s, {}).get('entry_price') for t in tranches if s in t.pos_records), 0.0)
+            prices.append(float(px or 0.0))
+
+        self.symbols = symbols
+        self._col = {s: j for j, s in enumerate(symbols)}
+        self.qty = holdings_matrix(tranches, symbols).astype(float)
+        self.cash = np.array([t.cash for t in tranches], dtype=float)
+        self.prices = np.array(prices, dtype=float)
+        self._qty_total = self.qty.sum(axis=0)
+        self.values = self.cash + self.qty @ self.prices
+        self.total = float(self.values.sum())
+        self._key = _book_key(tranches)
+
+        if new_day or len(self.tranche_peak) != len(self.values):
+            self.tranche_peak = self.values.copy()
+        if new_day:
+            self.day = day
+            self.open_value = self.peak = self.total
+            self.drawdown = self.max_drawdown = 0.0
+            self._alerted = self._halted = False
+
+    # ------------------------------------------------------------------
+    # 盯市
+    # ------------------------------------------------------------------
+    def update(self, tranches, bars, now, ref_prices=None):
+        """
+        一批 bar 盯市 (on_bar 调用)
+
+        Returns:
+            list[dict]: 本批新触发的事件 [{'level': 'alert' / 'halt', 'reason', 'drawdown', 'day_return', 'value'}]，
+                        同一级别每日只触发一次
+        """
+        day = now.date()
+        if day != self.day or _book_key(tranches) != self._key:
+            self.rebuild(tranches, ref_prices, day)
+
+        col, qty, prices = self._col, self.qty, self.prices
+        for bar in bars:
+            j = col.get(bar.symbol)
+            if j is None or bar.close is None or not bar.close > 0:
+                continue
+            delta = bar.close - prices[j]
+            if delta:
+                self.values += qty[:, j] * delta
+                self.total += self._qty_total[j] * delta
+                prices[j] = bar.close
+
+        np.maximum(self.tranche_peak, self.values, out=self.tranche_peak)
+        self.peak = max(self.peak, self.total)
+        self.drawdown = 1 - self.total / self.peak if self.peak > 0 else 0.0
+        self.max_drawdown = max(self.max_drawdown, self.drawdown)
+        return self._events()
+
+    def _events(self):
+        events = []
+        day_return = self.day_return
+        loss_breach = -day_return > config.MAX_DAILY_LOSS_PCT
+        if not self._halted and (self.drawdown > self.halt_pct or loss_breach):
+            self._halted = self._alerted = True
+            reason = (f"日内亏损 {-day_return:.2%} > {config.MAX_DAILY_LOSS_PCT:.2%}" if loss_breach
+                      else f"峰谷回撤 {self.drawdown:.2%} > {self.halt_pct:.2%}")
+            events.append(self._event('halt', reason))
+        elif not self._alerted and self.drawdown > self.alert_pct:
+            self._alerted = True
+            events.append(self._event('alert', f"峰谷回撤 {self.drawdown:.2%} > {self.alert_pct:.2%}"))
+        return events
+
+    def _event(self, level, reason):
+        return {'level': level, 'reason': reason, 'drawdown': self.drawdown,
+                'day_return': self.day_return, 'value': self.total}
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+    @property
+    def day_return(self):
+        return self.total / self.open_value - 1 if self.open_value > 0 else 0.0
+
+    def tranche_drawdowns(self):
+        """各 Tranche 相对日内峰值的回撤"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dd = 1 - self.values / self.tranche_peak
+        return np.where(self.tranche_peak > 0, dd, 0.0)
+
+    def summary(self):
+        return {'day': self.day, 'value': self.total, 'open_value': self.open_value, 'peak': self.peak,
+                'day_return': self.day_return, 'drawdown': self.drawdown, 'max_drawdown': self.max_drawdown,
+                'tranche_values': self.values.tolist(), 'tranche_drawdowns': self.tranche_drawdowns().tolist()}
@@ -6,6 +6,8 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from config import config, logger
+from .weights import SCHEME_DESC
+from .stress import format_stress
 
 
 class EnterpriseWeChat:
@@ -38,10 +40,17 @@ class EnterpriseWeChat:
             total_val = sum(t.total_value for t in rpm.tranches)
             holdings_summary = ", ".join([f"{k}:{v}" for k, v in rpm.total_holdings.items()][:5])
             
+            perf = rpm.get_performance_summary()
+            perf_line = (f"累计: {perf['return']:+.2%} | 回撤: {perf['max_dd']:.2%} | 夏普: {perf['sharpe']:.2f}\n"
+                         if perf else "")
+            stress_lines = format_stress(getattr(context, 'today_stress', None))
+            stress_text = "".join(f"{line}\n" for line in stress_lines)
             msg = (
                 f"📊 每日汇报\n"
                 f"市场状态: {context.market_state}\n"
                 f"总资产: ¥{total_val:,.2f}\n"
+                f"{perf_line}"
+                f"{stress_text}"
                 f"当日: Day {rpm.days_count}\n"
                 f"持仓: {holdings_summary or '无'}"
             )
@@ -87,7 +96,7 @@ class EmailNotifier:
             now_str = context.now.strftime('%Y-%m-%d %H:%M:%S')
             
             # 1. 策略概况
-            weight_desc = "等权 (1:1:1:1)" if config.WEIGHT_SCHEME == 'EQUAL' else "冠军加权 (3:1:1:1)"
+            weight_desc = SCHEME_DESC.get(config.WEIGHT_SCHEME, SCHEME_DESC['CHAMPION'])
             active_idx = getattr(context, 'today_active_tranche_idx', '-')
             
             # 2. 优选目标表格
@@ -141,7 +150,19 @@ class EmailNotifier:
             else:
                 orders_html = "<p style='color: #666;'>😴 今日持仓未变 (或已达标)</p>"
 
-            # 5. 持仓详情
+            # 5. 绩效 (RPM 在线累加器，O(1))
+            perf = rpm.get_performance_summary()
+            perf_html = (
+                f"<p style='margin: 0 0 15px 0; font-size: 14px;'>累计收益: <b>{perf['return']:+.2%}</b> | "
+                f"最大回撤: <b>{perf['max_dd']:.2%}</b> | 夏普: <b>{perf['sharpe']:.2f}</b></p>"
+            ) if perf else ""
+            stress_lines = format_stress(getattr(context, 'today_stress', None))
+            stress_html = (
+                "<p style='margin: 0 0 15px 0; font-size: 13px; color: #555;'>🧯 压力测试<br>"
+                + "<br>".join(stress_lines) + "</p>"
+            ) if stress_lines else ""
+
+            # 6. 持仓详情
             pos_dict = rpm.total_holdings
             pos_html = ""
             if pos_dict:
@@ -192,6 +213,8 @@ class EmailNotifier:
                 <div style="background-color: #fdfdfd; padding: 15px; border: 1px solid #eee; border-radius: 5px;">
                     <h3 style="margin-top: 0; color: #34495e; font-size: 16px;">5️⃣ 组合概况</h3>
                     <p style="font-size: 18px; margin: 5px 0 15px 0;">总资产: <b style="color: #27ae60;">¥{total_val:,.2f}</b></p>
+                    {perf_html}
+                    {stress_html}
                     <p style="margin-bottom: 5px; color: #666; font-size: 14px;">当前持仓列表 ({len(pos_dict)} 只):</p>
                     {pos_html}
                 </div>
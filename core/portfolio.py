@@ -1,13 +1,17 @@
 """
 投资组合管理模块
 - Tranche: 份额类，管理单个调仓周期的持仓
-- RollingPortfolioManager: 滚动投资组合管理器
+- NavHistory: 净值序列 (预分配列式存储) + 在线绩效累加器，每次记录 O(1)
+- RollingPortfolioManager: 滚动投资组合管理器 (状态文件 JSON / 二进制，见 state_codec)
 """
 import os
-import json
+import math
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from config import config
+from .reconcile import reconcile
+from .state_codec import STATE_SCHEMA, dump_state, read_state, legacy_state_path
 
 
 class Tranche:
@@ -53,6 +57,21 @@ class Tranche:
             t.pos_records[sym] = deserialized_rec
         return t
 
+    @staticmethod
+    def from_record(d):
+        """从二进制状态解码出的新建字典直接构造 (entry_dt 已为 datetime，不再逐条复制)"""
+        t = Tranche(d["id"], d["cash"])
+        t.holdings = d["holdings"]
+        t.total_value = d["total_value"]
+        t.pos_records = d.get("pos_records", {})
+        for rec in t.pos_records.values():
+            if isinstance(rec.get('entry_dt'), str):   # 定宽字段无法表示的时间，按 from_dict 口径解析
+                try:
+                    rec['entry_dt'] = datetime.fromisoformat(rec['entry_dt'])
+                except ValueError:
+                    rec['entry_dt'] = None
+        return t
+
     def update_value(self, price_map):
         """
         更新份额净值
@@ -163,50 +182,205 @@ class Tranche:
         return 0
 
 
+class NavHistory:
+    """
+    净值序列 (列式、预分配、容量倍增) 与在线绩效统计
+
+    口径与原 DataFrame 实现一致:
+    - 日收益 = nav.pct_change().fillna(0) (首日计 0)，Welford 累计均值/方差 (ddof=1)
+    - 最大回撤 = 运行峰值下的最小 (nav - peak) / peak
+    - 总收益 = 末值 / 首值 - 1 (首值 <= 0 时为 0)
+    同一交易日重复记录时覆盖当日值 (撤销上一步累加后重算)。
+    兼容原 list-of-dict 接口: append({'dt', 'nav'})、len、迭代、下标访问。
+    """
+
+    _STATE = ('n', 'mean', 'm2', 'peak', 'max_dd', 'first', 'last', 'last_dt')
+
+    def __init__(self, capacity=256):
+        self._dt = np.empty(capacity, dtype=object)
+        self._nav = np.empty(capacity, dtype=np.float64)
+        self._size = 0
+        self.n = 0           # 已累计的收益个数 (含首日 0)
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.peak = -math.inf
+        self.max_dd = 0.0
+        self.first = None
+        self.last = None     # 最近一个有效 nav (pct_change 的前值，缺失时前向填充)
+        self.last_dt = None
+        self._prev = None    # 最近一次记录前的累加器 (同日覆盖用)
+        self._prev_size = 0
+
+    # ------------------------------------------------------------------
+    # 记录
+    # ------------------------------------------------------------------
+    def add(self, dt, nav):
+        nav = float(nav)
+        if self._prev is not None and _same_day(self.last_dt, dt):
+            self.restore(self._prev)
+            self._size = self._prev_size
+        self._prev, self._prev_size = self.snapshot(), self._size
+
+        if self._size == len(self._nav):
+            self._dt = np.concatenate([self._dt, np.empty(len(self._dt), dtype=object)])
+            self._nav = np.concatenate([self._nav, np.empty(len(self._nav))])
+        self._dt[self._size] = dt
+        self._nav[self._size] = nav
+        self._size += 1
+
+        if self.first is None:
+            self.first = nav
+            ret = 0.0
+        elif self.last is None or math.isnan(nav):
+            ret = 0.0
+        else:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ret = float(np.float64(nav) / np.float64(self.last) - 1)
+            if math.isnan(ret):
+                ret = 0.0
+        if not math.isnan(nav):
+            self.last = nav
+            if nav > self.peak:
+                self.peak = nav
+            if self.peak > 0:
+                self.max_dd = min(self.max_dd, (nav - self.peak) / self.peak)
+        self.last_dt = dt
+
+        self.n += 1
+        delta = ret - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (ret - self.mean)
+
+    def append(self, record):
+        self.add(record['dt'], record['nav'])
+
+    def snapshot(self):
+        """累加器状态 (可 JSON 序列化，dt 除外)"""
+        return {k: getattr(self, k) for k in self._STATE}
+
+    def restore(self, state):
+        for k in self._STATE:
+            setattr(self, k, state[k])
+
+    def to_state(self):
+        """持久化用: 当前与上一步累加器 (O(1) 大小，不含逐日序列)"""
+        def _dump(state):
+            if state is None:
+                return None
+            state = dict(state)
+            state['last_dt'] = state['last_dt'].isoformat() if state['last_dt'] is not None else None
+            return state
+        return {'current': _dump(self.snapshot()), 'prev': _dump(self._prev)}
+
+    def load_state(self, data):
+        """从 to_state 的结果恢复累加器 (逐日序列从空开始)"""
+        def _load(state):
+            if state is None:
+                return None
+            state = dict(state)
+            if state['last_dt'] is not None:
+                state['last_dt'] = pd.Timestamp(state['last_dt']).to_pydatetime()
+            return state
+        if data and data.get('current'):
+            self.restore(_load(data['current']))
+            self._prev, self._prev_size = _load(data.get('prev')), 0
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._size))]
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError(i)
+        return {'dt': self._dt[i], 'nav': float(self._nav[i])}
+
+    def __iter__(self):
+        return (self[i] for i in range(self._size))
+
+    @property
+    def navs(self):
+        return self._nav[:self._size]
+
+    def to_series(self):
+        return pd.Series(self._nav[:self._size].copy(), index=pd.Index(list(self._dt[:self._size]), name='dt'),
+                         name='nav')
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else float('nan')
+
+    def summary(self):
+        """{'return', 'max_dd', 'sharpe'} (O(1))"""
+        if not self.n:
+            return {}
+        total_ret = (self.last_nav / self.first) - 1 if self.first > 0 else 0
+        std = self.std
+        sharpe = (self.mean / std * (252 ** 0.5)) if std > 0 else 0
+        return {
+            'return': total_ret,
+            'max_dd': abs(self.max_dd),
+            'sharpe': sharpe,
+        }
+
+    @property
+    def last_nav(self):
+        return float(self._nav[self._size - 1]) if self._size else self.last
+
+
+def _same_day(a, b):
+    try:
+        return a is not None and a.date() == b.date()
+    except AttributeError:
+        return False
+
+
 class RollingPortfolioManager:
     """滚动投资组合管理器"""
     
-    def __init__(self, state_path=None):
+    def __init__(self, state_path=None, state_format=None):
         self.tranches = []
         self.initialized = False
         self.days_count = 0
         self.state_path = state_path or os.path.join(config.BASE_DIR, config.STATE_FILE)
-        self.nav_history = []  # List of {'dt': datetime, 'nav': float}
+        self.state_format = state_format or config.STATE_FORMAT
+        self.nav_history = NavHistory()
 
     def record_nav(self, current_dt):
-        """记录当前总净值"""
+        """记录当前总净值 (同日重复记录覆盖当日值)"""
         total = sum(t.total_value for t in self.tranches)
-        self.nav_history.append({
-            'dt': current_dt,
-            'nav': total
-        })
+        self.nav_history.add(current_dt, total)
 
     def get_performance_summary(self):
-        """计算基于 RPM 视角的策略表现 (Trade at Close)"""
-        if not self.nav_history:
-            return {}
-        
-        df = pd.DataFrame(self.nav_history).set_index('dt')
-        df['ret'] = df['nav'].pct_change().fillna(0)
-        
-        total_ret = (df['nav'].iloc[-1] / df['nav'].iloc[0]) - 1 if df['nav'].iloc[0] > 0 else 0
-        
-        # Max DD
-        cum_max = df['nav'].cummax()
-        drawdown = (df['nav'] - cum_max) / cum_max
-        max_dd = drawdown.min()
-        
-        # Sharpe (Simplified, assuming daily frequency)
-        mean_ret = df['ret'].mean()
-        std_ret = df['ret'].std()
-        sharpe = (mean_ret / std_ret * (252 ** 0.5)) if std_ret > 0 else 0
-        
+        """计算基于 RPM 视角的策略表现 (Trade at Close)，由在线累加器直接给出"""
+        return self.nav_history.summary()
+
+    def state_dict(self):
+        """当前状态 (Tranche 为 __dict__ 引用，供编码/快照使用，调用方不得修改)"""
         return {
-            'return': total_ret,
-            'max_dd': abs(max_dd),  # Return absolute value for consistency
-            'sharpe': sharpe
+            "schema": STATE_SCHEMA,
+            "days_count": self.days_count,
+            "tranches": [t.__dict__ for t in self.tranches],
+            "perf": self.nav_history.to_state(),
         }
 
+    def apply_state(self, data, binary=False):
+        """
+        以状态字典替换当前状态
+        binary=True 表示 data 由二进制解码而来 (entry_dt 已为 datetime 且字典可直接持有)
+        """
+        self.days_count = data.get("days_count", 0)
+        build = Tranche.from_record if binary else Tranche.from_dict
+        self.tranches = [build(d) for d in data.get("tranches", [])]
+        self.nav_history = NavHistory()
+        self.nav_history.load_state(data.get("perf"))
+        self.initialized = True
+
     def save_state(self):
         """
         保存状态 - 原子操作
@@ -217,11 +391,8 @@ class RollingPortfolioManager:
         """
         temp_path = self.state_path + '.tmp'
         try:
-            with open(temp_path, 'w', encoding='utf-8') as f:
-                json.dump({
-                    "days_count": self.days_count,
-                    "tranches": [t.to_dict() for t in self.tranches]
-                }, f, indent=2)
+            with open(temp_path, 'wb') as f:
+                dump_state(f, self.state_dict(), self.state_format)
                 f.flush()
                 # 显式刷盘（在 Windows 上确保安全）
                 os.fsync(f.fileno())
@@ -246,17 +417,22 @@ class RollingPortfolioManager:
             raise RuntimeError(f"状态保存失败: {e}") from e
 
     def load_state(self):
-        """加载状态"""
+        """
+        加载状态 (按文件头自动识别 JSON / 二进制)
+        二进制状态文件不存在时回退读取同名旧 JSON，下次保存即完成迁移
+        """
         from config import logger
-        if not os.path.exists(self.state_path):
-            return False
-            
+        path = self.state_path
+        if not os.path.exists(path):
+            legacy = legacy_state_path(path)
+            if self.state_format != 'binary' or not legacy or not os.path.exists(legacy):
+                return False
+            path = legacy
+            logger.info(f"🔁 Migrating legacy JSON state {legacy} -> {self.state_path}")
+
         try:
-            with open(self.state_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                self.days_count = data.get("days_count", 0)
-                self.tranches = [Tranche.from_dict(d) for d in data.get("tranches", [])]
-                self.initialized = True
+            data, fmt = read_state(path)
+            self.apply_state(data, binary=(fmt == 'binary'))
             logger.info(f"✅ Loaded State: Day {self.days_count}")
             return True
         except Exception as e:
@@ -279,20 +455,8 @@ class RollingPortfolioManager:
                 combined[sym] = combined.get(sym, 0) + shares
         return combined
 
-    def reconcile_with_broker(self, real_pos):
-        """与券商实际持仓对账"""
-        virtual_map = self.total_holdings
-        for sym, v_qty in virtual_map.items():
-            r_qty = real_pos.get(sym, 0)
-            diff = v_qty - r_qty
-            if diff > 0:
-                remaining = diff
-                for t in self.tranches:
-                    if sym in t.holdings:
-                        remove_qty = min(t.holdings[sym], remaining)
-                        t.holdings[sym] -= remove_qty
-                        if t.holdings[sym] == 0:
-                            t.holdings.pop(sym, None)
-                        remaining -= remove_qty
-                        if remaining <= 0:
-                            break
+    def reconcile_with_broker(self, real_pos, price_map=None, policy=None, apply=True, active_idx=None,
+                              current_dt=None):
+        """与券商实际持仓对账 (虚多/实多按 RECONCILE_POLICY 分摊到各 Tranche)，返回对账报告，见 core/reconcile.py"""
+        return reconcile(self.tranches, real_pos, price_map=price_map, policy=policy, apply=apply,
+                         active_idx=active_idx, current_dt=current_dt)
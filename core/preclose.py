@@ -0,0 +1,58 @@
+"""
+收盘前预计算 (Pre-close Plan)
+- snapshot_gate / restore_gate: Meta-Gate 状态快照与恢复 (预计算不得推进状态机)
+- plan_signature: 影响目标权重的排名要素 (核心名单顺序 + 缓冲名单顺序)
+- plan_delta: 预案与 EXEC_TIME 结果的差异 (未变化时 EXEC_TIME 直接沿用预案权重)
+"""
+from .logic import candidate_lists
+
+GATE_ATTRS = ('market_state', 'risk_scaler', 'br_history')
+
+
+def snapshot_gate(context):
+    """Meta-Gate 状态快照 (br_history 复制)"""
+    return {
+        'market_state': context.market_state,
+        'risk_scaler': context.risk_scaler,
+        'br_history': list(context.br_history),
+    }
+
+
+def restore_gate(context, snapshot):
+    for attr in GATE_ATTRS:
+        value = snapshot[attr]
+        setattr(context, attr, list(value) if attr == 'br_history' else value)
+
+
+def plan_signature(rank_df, risk_model=None):
+    """
+    (核心名单有序元组, 缓冲名单有序元组)
+    二者与老持仓一起完全决定 select_target_weights 的结果 (风险类权重另取决于协方差)
+    """
+    if rank_df is None:
+        return (), ()
+    _, core_targets, buffer_targets = candidate_lists(rank_df, risk_model)
+    return tuple(core_targets), tuple(buffer_targets)
+
+
+def plan_delta(plan, signature, scale):
+    """
+    预案与 EXEC_TIME 结果的差异
+
+    Returns:
+        dict: {'changed', 'entered', 'exited', 'reordered', 'scale_from', 'scale_to'}
+    """
+    old_core, old_buffer = plan['signature']
+    new_core, new_buffer = signature
+    entered = sorted(set(new_buffer) - set(old_buffer))
+    exited = sorted(set(old_buffer) - set(new_buffer))
+    reordered = (old_core != new_core or old_buffer != new_buffer) and not entered and not exited
+    scale_changed = abs(plan['scale'] - scale) > 1e-9
+    return {
+        'changed': bool(entered or exited or reordered or scale_changed),
+        'entered': entered,
+        'exited': exited,
+        'reordered': reordered,
+        'scale_from': plan['scale'],
+        'scale_to': scale,
+    }
@@ -0,0 +1,168 @@
+"""
+持仓对账引擎
+- holdings_matrix: 各 Tranche 持仓对齐为 (Tranche × 标的) 矩阵，与券商持仓向量一次相减得到全部差异
+- reconcile: 差异分类 (一致 / 碎股 / 虚多 / 实多) 并按确定性规则分摊到各 Tranche
+  - age:      虚多从最近买入的 Tranche 开始扣减 (未成交的多为当日买单)，实多补给最近买入的持有者
+  - pro_rata: 按各 Tranche 持仓比例分摊，整手优先，零股尾差给 (剩余) 持仓最多者 (同量取编号小者)
+  - 碎股 (|差异| < ODD_LOT): 虚多照常扣减 (虚拟持仓不得超过实际)，实多不分摊 (送股/红利零股)
+  - 提供 price_map 时按价格同步调整现金，保持 Tranche 净值与券商一致
+- format_reconciliation: 报告转为通知文本
+
+apply=False 时只计算报告 (algo 收盘对账默认如此，RECONCILE_APPLY 开启后才修正虚拟账本)。
+"""
+import numpy as np
+
+from config import config
+
+_STATUS_TEXT = {'short': '虚多', 'surplus': '实多', 'odd_lot': '碎股'}
+
+
+def holdings_matrix(tranches, symbols):
+    """(Tranche × 标的) 持仓矩阵 (int64)，symbols 之外的持仓忽略"""
+    col = {s: i for i, s in enumerate(symbols)}
+    matrix = np.zeros((len(tranches), len(symbols)), dtype=np.int64)
+    for i, t in enumerate(tranches):
+        items = [(col[s], q) for s, q in t.holdings.items() if s in col]
+        if items:
+            cols, qty = zip(*items)
+            matrix[i, list(cols)] = qty
+    return matrix
+
+
+def _fill(avail, qty, order):
+    """按 order 顺序依次取满 avail，合计 qty (不超过 avail 总量)"""
+    take = np.zeros_like(avail)
+    ordered = avail[order]
+    before = np.cumsum(ordered) - ordered
+    take[order] = np.clip(qty - before, 0, ordered)
+    return take
+
+
+def _pro_rata(held, qty, lot, capped=True):
+    """
+    按 held 比例分摊 qty，整手优先 (最大余数法，同余数取编号小者)
+    capped=True (扣减) 时每份不超过 held，零股尾差给剩余持仓最多者；否则 (补给) 尾差给持仓最多者
+    """
+    idx = np.arange(len(held))
+    exact = held * (qty / held.sum()) / lot
+    cap_lots = held // lot if capped else np.full(len(held), qty // lot + 1)
+    lots = np.minimum(np.floor(exact).astype(np.int64), cap_lots)
+    rem = min(qty // lot, int(cap_lots.sum())) - int(lots.sum())
+    if rem > 0:
+        order = np.lexsort((idx, -(exact - lots)))
+        lots[order[lots[order] < cap_lots[order]][:rem]] += 1
+    take = lots * lot
+    if not capped:
+        take[np.lexsort((idx, -held))[0]] += qty - int(take.sum())
+        return take
+    left = held - take
+    return take + _fill(left, qty - int(take.sum()), np.lexsort((idx, -left)))
+
+
+def _age_order(tranches, symbol, holders):
+    """持有者按该标的买入时间从新到旧排序 (无买入时间视为最旧，同时间取编号小者)"""
+    def stamp(i):
+        entry_dt = tranches[i].pos_records.get(symbol, {}).get('entry_dt')
+        try:
+            return -entry_dt.timestamp()
+        except AttributeError:
+            return np.inf
+    return np.array(sorted(holders, key=lambda i: (stamp(i), i)), dtype=np.int64)
+
+
+def reconcile(tranches, real_pos, price_map=None, policy=None, odd_lot=None, apply=True,
+              active_idx=None, current_dt=None):
+    """
+    对账并 (apply=True 时) 修正 tranches 的虚拟持仓
+
+    Args:
+        tranches: Tranche 列表
+        real_pos: {symbol: 券商持仓数量}
+        price_map: {symbol: 价格}，提供时同步调整现金 (虚多退回现金，实多扣减现金)
+        policy: 'age' / 'pro_rata'，默认 RECONCILE_POLICY
+        odd_lot: 碎股阈值，默认 ODD_LOT
+        active_idx: 实多且无 Tranche 持有时的接收者 (当日调仓的 Tranche)，None 则不分摊
+        current_dt: 为接收者新建持仓记录时的买入时间
+    Returns:
+        dict: {'balanced': 对账前无 >= 碎股阈值的差异, 'matched': 一致标的数, 'diffs': [{symbol, virtual, real,
+               diff, status, allocations: {tranche_id: 调整量}}], 'odd_lot': [symbol],
+               'unassigned': {symbol: 未分摊数量}, 'cash_adjust': 现金调整合计, 'applied': apply}
+    """
+    policy = policy or config.RECONCILE_POLICY
+    lot = config.ODD_LOT if odd_lot is None else odd_lot
+    price_map = price_map or {}
+
+    virtual_syms = {s for t in tranches for s in t.holdings}
+    symbols = sorted(virtual_syms | {s for s, q in real_pos.items() if q})
+    matrix = holdings_matrix(tranches, symbols)
+    virtual = matrix.sum(axis=0)
+    real = np.fromiter((int(real_pos.get(s, 0) or 0) for s in symbols), dtype=np.int64, count=len(symbols))
+    diff = real - virtual   # > 0 实多, < 0 虚多
+    odd = (diff != 0) & (np.abs(diff) < lot)
+
+    report = {'balanced': not ((diff != 0) & ~odd).any(), 'matched': int((diff == 0).sum()), 'diffs': [],
+              'odd_lot': [symbols[j] for j in np.flatnonzero(odd)], 'unassigned': {}, 'cash_adjust': 0.0,
+              'applied': apply}
+    for j in np.flatnonzero(diff).tolist():
+        sym, qty = symbols[j], int(diff[j])
+        held = matrix[:, j]
+        holders = np.flatnonzero(held)
+        order = _age_order(tranches, sym, holders.tolist())
+        if qty < 0:
+            if policy == 'pro_rata':
+                delta = -_pro_rata(held, -qty, lot)
+            else:
+                delta = -_fill(held, -qty, order)
+            status = 'odd_lot' if odd[j] else 'short'
+        elif odd[j]:
+            delta, status = np.zeros_like(held), 'odd_lot'
+        else:
+            status = 'surplus'
+            if len(holders) and policy == 'pro_rata':
+                delta = _pro_rata(held, qty, lot, capped=False)
+            elif len(holders):
+                delta = np.zeros_like(held)
+                delta[order[0]] = qty
+            elif active_idx is not None:
+                delta = np.zeros_like(held)
+                delta[active_idx] = qty
+            else:
+                delta = np.zeros_like(held)
+                report['unassigned'][sym] = qty
+
+        allocations = {tranches[i].id: int(delta[i]) for i in np.flatnonzero(delta).tolist()}
+        report['diffs'].append({'symbol': sym, 'virtual': int(virtual[j]), 'real': int(real[j]), 'diff': qty,
+                                'status': status, 'allocations': allocations})
+        price = price_map.get(sym)
+        if apply:
+            for i in np.flatnonzero(delta).tolist():
+                _adjust(tranches[i], sym, int(delta[i]), price, current_dt)
+        if price and price > 0:
+            report['cash_adjust'] -= float(delta.sum()) * price
+    return report
+
+
+def _adjust(tranche, symbol, qty, price, current_dt):
+    """Tranche 持仓调整 qty 股 (负为扣减)；有价格时现金反向调整"""
+    shares = tranche.holdings.get(symbol, 0) + qty
+    if shares > 0:
+        tranche.holdings[symbol] = shares
+        if symbol not in tranche.pos_records and price and price > 0:
+            tranche.pos_records[symbol] = {'entry_price': price, 'high_price': price, 'entry_dt': current_dt,
+                                           'volatility': 0.02}
+    else:
+        tranche.holdings.pop(symbol, None)
+        tranche.pos_records.pop(symbol, None)
+    if price and price > 0:
+        tranche.cash -= qty * price
+
+
+def format_reconciliation(report, limit=5):
+    """对账报告 -> 通知文本行 (仅 >= 碎股阈值的差异)"""
+    lines = []
+    for d in report['diffs']:
+        if d['status'] == 'odd_lot':
+            continue
+        alloc = ', '.join(f"T{k}{v:+d}" for k, v in d['allocations'].items()) or '未分摊'
+        lines.append(f"{d['symbol']}: 实{d['real']} vs 虚{d['virtual']} ({_STATUS_TEXT[d['status']]} | {alloc})")
+    return lines[:limit]
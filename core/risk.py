@@ -1,13 +1,109 @@
 """
 风控模块
 - RiskController: 硬风控（熔断、订单校验）
+- NavFeed: NAV 本地缓存 (账户同步 + 成交回报 + bar 盯市)，熔断检查不再逐次查询账户
+- pre_trade_check: 整批订单一次性事前风控 (单笔占比、总敞口、现金、废单预算、买入价格带)
 - DataGuard: 数据质检
 """
-from gm.api import MODE_LIVE
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from gm.api import MODE_LIVE, OrderSide_Buy
 from config import config, logger
 from .account import get_account
 
 
+class NavFeed:
+    """
+    NAV 本地缓存：现金 + 已知持仓 × 最新价
+
+    - sync: 从账户对象整体同步 (开盘、断线重连后、缓存过期时)
+    - apply_fill: 成交回报增量更新持仓与现金
+    - mark: bar 收盘价盯市，只更新推送到的持仓标的
+    """
+
+    def __init__(self):
+        self.cash = 0.0
+        self.qty = {}      # {symbol: 持仓数量}
+        self.price = {}    # {symbol: 最新价}
+        self.nav = None
+        self.updated_at = None
+        self.synced_at = None   # 最近一次从账户整体同步的时间
+        self.source = None
+
+    def sync(self, acc, now=None, source='account'):
+        """从账户对象同步；账户无 NAV 时返回 False 且缓存不变"""
+        nav = getattr(getattr(acc, 'cash', None), 'nav', None)
+        if not isinstance(nav, (int, float)) or isinstance(nav, bool):
+            return False
+        qty, price = {}, {}
+        try:
+            positions = list(acc.positions())
+        except Exception:
+            positions = []
+        for p in positions:
+            amount = getattr(p, 'amount', 0)
+            px = getattr(p, 'price', 0) or getattr(p, 'vwap', 0)
+            if isinstance(amount, (int, float)) and amount > 0 and isinstance(px, (int, float)) and px > 0:
+                qty[p.symbol] = amount
+                price[p.symbol] = float(px)
+        self.qty, self.price = qty, price
+        self.cash = float(nav) - sum(q * price[s] for s, q in qty.items())
+        self.nav = float(nav)
+        self._touch(now, source)
+        self.synced_at = self.updated_at
+        return True
+
+    def apply_fill(self, symbol, side, volume, price, commission=0.0, now=None):
+        """成交回报：买入增加持仓、扣减现金，卖出相反"""
+        if self.nav is None or not volume or not price or price <= 0:
+            return
+        sign = 1 if side == OrderSide_Buy else -1
+        held = self.qty.get(symbol, 0) + sign * volume
+        old_px = self.price.get(symbol, price)
+        self.cash -= sign * volume * price + (commission or 0.0)
+        if held > 0:
+            self.qty[symbol] = held
+            self.price[symbol] = float(price)
+        else:
+            self.qty.pop(symbol, None)
+            self.price.pop(symbol, None)
+        # 原有持仓按成交价重估
+        prev_held = held - sign * volume
+        self.nav += prev_held * (price - old_px) - (commission or 0.0)
+        self._touch(now, 'fill')
+
+    def mark(self, bars, now=None):
+        """bar 收盘价盯市；无持仓标的的 bar 忽略"""
+        if self.nav is None:
+            return
+        for bar in bars:
+            held = self.qty.get(bar.symbol)
+            if held and bar.close and bar.close > 0:
+                self.nav += held * (bar.close - self.price[bar.symbol])
+                self.price[bar.symbol] = float(bar.close)
+        self._touch(now, 'bar')
+
+    def invalidate(self):
+        """下次读取时强制从账户同步"""
+        self.updated_at = None
+
+    def age(self, now):
+        """距上次更新的秒数；未同步或已失效为 None"""
+        if self.nav is None or self.updated_at is None or now is None:
+            return None
+        return (_naive(now) - self.updated_at).total_seconds()
+
+    def _touch(self, now, source):
+        self.updated_at = _naive(now) if now is not None else self.updated_at
+        self.source = source
+
+
+def _naive(dt):
+    return dt.replace(tzinfo=None) if getattr(dt, 'tzinfo', None) is not None else dt
+
+
 class RiskController:
     """宪兵队：凌驾于策略之上的硬风控"""
     
@@ -16,20 +112,56 @@ class RiskController:
         self.reject_count = 0
         self.active = True
         self.last_day = None
+        self.nav_feed = NavFeed()
+
+    def refresh_nav(self, context, acc=None):
+        """从账户同步 NAV 缓存 (acc 为空时查询一次账户)；返回是否成功"""
+        try:
+            acc = acc if acc is not None else get_account(context)
+        except Exception as e:
+            logger.warning(f"⚠️ [RISK] Exception getting account: {e}")
+            return False
+        return bool(acc) and self.nav_feed.sync(acc, context.now)
+
+    def current_nav(self, context):
+        """
+        当前 NAV：优先读本地缓存；缓存为空、已失效或超过 NAV_CACHE_MAX_AGE_SEC 未更新时才查询账户
+        返回 None 表示无法获取
+        """
+        age = self.nav_feed.age(context.now)
+        if age is None or age > config.NAV_CACHE_MAX_AGE_SEC:
+            self.refresh_nav(context)
+        return self.nav_feed.nav
+
+    def on_account_status(self, context, account_status):
+        """账户状态推送 (连接/断线/重连)：缓存失效，下次检查时重新同步"""
+        self.nav_feed.invalidate()
+        logger.info(f"🛡️ [RISK] Account status changed, NAV cache invalidated")
+
+    def on_execution_report(self, context, execrpt):
+        """成交回报：增量更新 NAV 缓存"""
+        account_id = getattr(execrpt, 'account_id', None)
+        if account_id and getattr(context, 'account_id', None) and account_id != context.account_id:
+            return
+        self.nav_feed.apply_fill(execrpt.symbol, execrpt.side, getattr(execrpt, 'volume', 0),
+                                 getattr(execrpt, 'price', 0), getattr(execrpt, 'commission', 0.0), context.now)
+
+    def on_bar(self, context, bars):
+        """bar 盯市并检查熔断 (除每日首个 bar 锁定开盘 NAV 外均为本地计算)"""
+        self.on_day_start(context)
+        self.nav_feed.mark(bars, context.now)
+        return self.check_daily_loss(context)
 
     def on_day_start(self, context):
-        """每日开盘初始化"""
+        """每日开盘初始化 (当日已同步过的缓存直接使用)"""
         current_day = context.now.date()
         if self.last_day != current_day:
-            try:
-                acc = get_account(context)
-                if acc and hasattr(acc, 'cash') and hasattr(acc.cash, 'nav'):
-                    self.initial_nav_today = acc.cash.nav
-                else:
-                    logger.warning(f"⚠️ [RISK] Failed to get account NAV, using 0.0")
-                    self.initial_nav_today = 0.0
-            except Exception as e:
-                logger.error(f"❌ [RISK] Exception getting account: {e}")
+            feed = self.nav_feed
+            synced_today = feed.synced_at is not None and feed.synced_at.date() == current_day
+            if synced_today or self.refresh_nav(context):
+                self.initial_nav_today = feed.nav
+            else:
+                logger.warning(f"⚠️ [RISK] Failed to get account NAV, using 0.0")
                 self.initial_nav_today = 0.0
             
             self.reject_count = 0
@@ -37,48 +169,159 @@ class RiskController:
             self.last_day = current_day
             logger.info(f"🛡️ [RISK] Day Start: NAV Locked at {self.initial_nav_today:,.2f}")
 
+    def halt(self, reason):
+        """外部触发熔断 (如盘中盯市回撤)，当日不再放行订单"""
+        if self.active:
+            logger.error(f"🧨 [RISK MELTDOWN] {reason}. HALTING.")
+            self.active = False
+
     def check_daily_loss(self, context):
-        """检查单日亏损是否触达熔断线"""
-        try:
-            acc = get_account(context)
-            if not acc or self.initial_nav_today <= 0:
-                return True
-        except Exception as e:
-            logger.warning(f"⚠️ [RISK] Exception getting account in check_daily_loss: {e}")
+        """检查单日亏损是否触达熔断线 (读 NAV 缓存)；当日已熔断返回 False"""
+        if not self.active:
+            return False
+        if self.initial_nav_today <= 0:
+            return True
+        current_nav = self.current_nav(context)
+        if current_nav is None:
             return True
 
-        current_nav = acc.cash.nav
         dd_pct = 1 - (current_nav / self.initial_nav_today)
 
         if dd_pct > config.MAX_DAILY_LOSS_PCT:
             if self.active:
                 logger.error(f"🧨 [RISK MELTDOWN] Daily Loss {dd_pct:.2%} > Limit "
-                             f"{config.MAX_DAILY_LOSS_PCT:.2%}. NAV: {current_nav:,.2f}. HALTING.")
+                             f"{config.MAX_DAILY_LOSS_PCT:.2%}. NAV: {current_nav:,.2f} "
+                             f"({self.nav_feed.source}). HALTING.")
                 self.active = False
             return False
         return True
 
-    def validate_order(self, context, symbol, value, total_scan_val):
-        """检查单笔订单合规性"""
+    def check_orders(self, orders, prices, last_close, nav, cash, gross=0.0):
+        """
+        整批订单事前风控 (algo 下单前调用一次)：熔断中全部拒绝，其余见 pre_trade_check
+
+        Returns:
+            (approved, rejected): 通过的订单列表 (保持原顺序)；被拒订单附 'reason'
+        """
         if not self.active:
-            return False
+            return [], [dict(o, reason='halted') for o in orders]
+        approved, rejected = pre_trade_check(orders, prices, last_close, nav, cash, gross,
+                                             reject_count=self.reject_count)
+        for o in rejected:
+            logger.warning(f"🛡️ [RISK] Order Reject: {o['side']} {o['symbol']} {o['volume']} ({o['reason']})")
+        return approved, rejected
 
-        # 检查是否由于废单过多导致停止
-        if self.reject_count >= config.MAX_REJECT_COUNT:
-            logger.error(f"❌ [RISK] Too many rejected orders ({self.reject_count}). Blocking new orders.")
-            return False
+    def record_rejects(self, count):
+        """累计券商废单数 (用于废单预算)"""
+        if count > 0:
+            self.reject_count += count
+            logger.warning(f"🛡️ [RISK] Rejected orders today: {self.reject_count}/{config.MAX_REJECT_COUNT}")
 
-        if total_scan_val > 0 and (value / total_scan_val) > config.MAX_ORDER_VAL_PCT + 0.05:
-            logger.warning(f"🛡️ [RISK] Order Reject: {symbol} Val {value:.0f} > "
-                           f"Max {config.MAX_ORDER_VAL_PCT:.0%} of NAV")
-            return False
-        return True
+
+def pre_trade_check(orders, prices, last_close, nav, cash, gross=0.0, reject_count=0):
+    """
+    整批订单事前风控 (向量化)
+
+    卖出一律放行 (减仓不受价格带/敞口/现金/废单预算限制：创业板/科创板 ETF 涨跌幅 20%，
+    真实大跌日的止损与轮动卖出不能被当作脏报价拦下；无价格时同样放行，如已移出白名单的持仓)；买入依次检查:
+    - price:       无有效价格，或相对昨收偏离超过 PRETRADE_PRICE_BAND (脏报价)
+    - reject_budget: 当日废单数已达 MAX_REJECT_COUNT
+    - order_value: 单笔金额超过 NAV 的 MAX_ORDER_VAL_PCT (+5% 容差)
+    - cash:        按计划顺序累计买入金额 (含 PRETRADE_CASH_BUFFER) 超过可用现金 + 通过的卖出回款
+    - gross_exposure: 持仓市值 - 卖出 + 累计买入超过 NAV × MAX_GROSS_EXPOSURE
+
+    Args:
+        orders: [{'symbol', 'side': 'BUY' / 'SELL', 'volume'}]
+        prices: {symbol: 下单参考价}
+        last_close: {symbol: 昨收}，缺失时跳过买入价格带检查
+        nav / cash / gross: 账户净值 / 可用现金 / 当前持仓市值
+    Returns:
+        (approved, rejected): 通过的订单 (保持原顺序)；被拒订单为原订单附 'reason' 的新字典
+    """
+    if not orders:
+        return [], []
+    n = len(orders)
+    buy = np.fromiter((o['side'] == 'BUY' for o in orders), dtype=bool, count=n)
+    volume = np.fromiter((o['volume'] for o in orders), dtype=float, count=n)
+    px = np.fromiter((prices.get(o['symbol'], np.nan) for o in orders), dtype=float, count=n)
+    ref = np.fromiter((last_close.get(o['symbol'], np.nan) for o in orders), dtype=float, count=n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        value = np.where(np.isfinite(px), volume * px, 0.0)
+        band = np.abs(px / ref - 1)
+
+    reason = np.full(n, '', dtype=object)
+
+    def reject(mask, code):
+        reason[mask & (reason == '')] = code
+
+    reject(buy & ~(np.isfinite(px) & (px > 0)), 'price')
+    reject(buy & np.isfinite(band) & (band > config.PRETRADE_PRICE_BAND), 'price')
+    if reject_count >= config.MAX_REJECT_COUNT:
+        reject(buy, 'reject_budget')
+    if nav > 0:
+        reject(buy & (value / nav > config.MAX_ORDER_VAL_PCT + 0.05), 'order_value')
+
+    sells = (~buy) & (reason == '')
+    proceeds = float(value[sells].sum())
+    candidate = buy & (reason == '')
+    spend = np.cumsum(np.where(candidate, value * (1 + config.PRETRADE_CASH_BUFFER), 0.0))
+    reject(candidate & (spend > cash + proceeds + 1e-6), 'cash')
+    if nav > 0:
+        candidate = buy & (reason == '')
+        exposure = gross - proceeds + np.cumsum(np.where(candidate, value, 0.0))
+        reject(candidate & (exposure > nav * config.MAX_GROSS_EXPOSURE + 1e-6), 'gross_exposure')
+
+    approved = [o for o, r in zip(orders, reason) if not r]
+    rejected = [dict(o, reason=r) for o, r in zip(orders, reason) if r]
+    return approved, rejected
+
+
+_EPOCH_SH = datetime(1970, 1, 1, 8)   # naive 北京时间对应的 Unix 纪元
+
+
+def _epoch_sec(value):
+    """datetime -> Unix 秒 (naive 视为北京时间)，缺失为 NaN"""
+    if value is None:
+        return np.nan
+    if not isinstance(value, datetime):
+        value = pd.Timestamp(value)
+        if value is pd.NaT:
+            return np.nan
+    if value.tzinfo is None:
+        return (value - _EPOCH_SH).total_seconds()
+    return value.timestamp()
 
 
 class DataGuard:
     """数据质检员：防止脏数据和延迟数据"""
     
     @staticmethod
-    def check_freshness(ticks, current_dt):
-        """检查数据新鲜度（待实现）"""
-        return True
+    def check_freshness(ticks, current_dt, timeout_sec=None):
+        """
+        批量检查 tick 新鲜度 (向量化)：报价时间 created_at 与 current_dt 之差超过 timeout_sec 视为过期
+
+        Args:
+            ticks: current() 返回的 tick 列表
+            current_dt: 当前时间 (context.now)
+            timeout_sec: 默认 config.DATA_TIMEOUT_SEC
+        Returns:
+            dict: {'fresh': [symbol], 'stale': [symbol], 'ages': {symbol: 秒},
+                   'stale_frac', 'max_age', 'unknown': 无报价时间的数量 (按新鲜处理)}
+        """
+        timeout = config.DATA_TIMEOUT_SEC if timeout_sec is None else timeout_sec
+        if not ticks:
+            return {'fresh': [], 'stale': [], 'ages': {}, 'stale_frac': 0.0, 'max_age': 0.0, 'unknown': 0}
+
+        symbols = np.array([t['symbol'] for t in ticks], dtype=object)
+        stamps = np.fromiter((_epoch_sec(t.get('created_at')) for t in ticks), dtype=float, count=len(ticks))
+        ages = _epoch_sec(current_dt) - stamps
+        known = ~np.isnan(ages)
+        stale = known & (ages > timeout)
+        return {
+            'fresh': symbols[~stale].tolist(),
+            'stale': symbols[stale].tolist(),
+            'ages': dict(zip(symbols[known].tolist(), np.round(ages[known], 3).tolist())),
+            'stale_frac': float(stale.mean()),
+            'max_age': float(ages[known].max()) if known.any() else 0.0,
+            'unknown': int((~known).sum()),
+        }
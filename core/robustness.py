@@ -0,0 +1,204 @@
+"""
+稳健性分析模块 (Bootstrap / Monte Carlo)
+- bootstrap_returns: 日收益块状自助重采样 (向量化，多进程分块)
+- bootstrap_trades: 逐笔交易收益重采样
+- permutation_runs: 评估起始日期 × Tranche 相位偏移的全排列本地回测
+- summarize_distribution: 分布分位数汇总
+
+所有重采样均为 NumPy 整块索引运算，单进程即可在数秒内完成 1 万条路径。
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config import config, logger
+from .backtest import run_local_backtest
+
+PERCENTILES = [5, 25, 50, 75, 95]
+
+
+def block_bootstrap_indices(n_obs, n_paths, block_size, rng):
+    """循环块状自助法索引矩阵 (n_paths × n_obs)"""
+    block_size = max(1, min(block_size, n_obs))
+    n_blocks = -(-n_obs // block_size)
+    starts = rng.integers(0, n_obs, size=(n_paths, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block_size)) % n_obs
+    return idx.reshape(n_paths, -1)[:, :n_obs]
+
+
+def path_metrics(paths, periods_per_year=252):
+    """
+    批量计算路径指标 (口径与 RollingPortfolioManager.get_performance_summary 一致)
+    paths: 日收益矩阵 (n_paths × n_days)
+    """
+    growth = np.cumprod(1.0 + paths, axis=1)
+    equity = np.concatenate([np.ones((paths.shape[0], 1)), growth], axis=1)
+    peak = np.maximum.accumulate(equity, axis=1)
+    max_dd = -((equity - peak) / peak).min(axis=1)
+
+    mean = paths.mean(axis=1)
+    std = paths.std(axis=1, ddof=1) if paths.shape[1] > 1 else np.zeros(paths.shape[0])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std > 0, mean / std * np.sqrt(periods_per_year), 0.0)
+    return {'return': growth[:, -1] - 1, 'max_dd': max_dd, 'sharpe': sharpe}
+
+
+def _bootstrap_chunk(task):
+    returns, n_paths, block_size, seed = task
+    rng = np.random.default_rng(seed)
+    idx = block_bootstrap_indices(len(returns), n_paths, block_size, rng)
+    return path_metrics(returns[idx])
+
+
+def bootstrap_returns(returns, n_paths=10000, block_size=20, seed=42, workers=None, chunk_paths=2000):
+    """
+    日收益块状自助重采样
+
+    Args:
+        returns: 日收益序列 (Series 或数组，NaN 会被丢弃)
+        n_paths: 路径数
+        block_size: 块长度 (保留波动聚集与自相关)
+        seed: 随机种子；按块拆分子种子，结果与进程数无关
+        workers: 进程数，1 表示单进程
+        chunk_paths: 每个任务的路径数
+
+    Returns:
+        dict: {'return': ndarray, 'max_dd': ndarray, 'sharpe': ndarray}
+    """
+    returns = np.asarray(returns, dtype=float)
+    returns = returns[~np.isnan(returns)]
+    if len(returns) < 2:
+        raise ValueError(f"Need at least 2 daily returns, got {len(returns)}")
+
+    sizes = [chunk_paths] * (n_paths // chunk_paths)
+    if n_paths % chunk_paths:
+        sizes.append(n_paths % chunk_paths)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(returns, n, block_size, s) for n, s in zip(sizes, seeds)]
+
+    if workers == 1 or len(tasks) == 1:
+        chunks = [_bootstrap_chunk(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(_bootstrap_chunk, tasks))
+    return {k: np.concatenate([c[k] for c in chunks]) for k in ('return', 'max_dd', 'sharpe')}
+
+
+def round_trip_returns(trades):
+    """
+    由成交记录计算逐笔平仓收益 (按 Tranche+标的 加权平均成本)
+
+    Args:
+        trades: run_local_backtest 的 trades 列表 [{'tranche', 'symbol', 'side', 'qty', 'price'}, ...]
+    Returns:
+        ndarray: 每笔卖出相对持仓成本的收益率
+    """
+    books = {}
+    rets = []
+    for tr in trades:
+        key = (tr['tranche'], tr['symbol'])
+        qty, cost = books.get(key, (0, 0.0))
+        if tr['side'] == 'BUY':
+            books[key] = (qty + tr['qty'], cost + tr['qty'] * tr['price'])
+        elif qty > 0 and tr['qty'] > 0:
+            avg = cost / qty
+            if avg > 0 and tr['price'] > 0:
+                rets.append(tr['price'] / avg - 1)
+            sold = min(tr['qty'], qty)
+            books[key] = (qty - sold, cost - sold * avg)
+    return np.asarray(rets, dtype=float)
+
+
+def bootstrap_trades(trade_returns, n_paths=10000, seed=42):
+    """
+    逐笔交易收益有放回重采样
+
+    Returns:
+        dict: {'mean_trade': ndarray, 'win_rate': ndarray}
+    """
+    trade_returns = np.asarray(trade_returns, dtype=float)
+    if len(trade_returns) == 0:
+        return {'mean_trade': np.array([]), 'win_rate': np.array([])}
+    rng = np.random.default_rng(seed)
+    samples = trade_returns[rng.integers(0, len(trade_returns), size=(n_paths, len(trade_returns)))]
+    return {'mean_trade': samples.mean(axis=1), 'win_rate': (samples > 0).mean(axis=1)}
+
+
+# 子进程内共享的信号缓存
+_WORKER_CACHE = None
+
+
+def _init_worker(cache):
+    global _WORKER_CACHE
+    _WORKER_CACHE = cache
+
+
+def _nav_summary(nav):
+    """净值序列 -> {'return', 'max_dd', 'sharpe'} (口径同 get_performance_summary)"""
+    if len(nav) == 0:
+        return {}
+    rets = nav.pct_change().fillna(0).values[None, :]
+    return {k: float(v[0]) for k, v in path_metrics(rets).items()}
+
+
+def _permutation_task(task):
+    run_start, eval_start, end, offset, params, initial_cash = task
+    result = run_local_backtest(_WORKER_CACHE, run_start, end, params, initial_cash=initial_cash)
+    nav = result['nav'][result['nav'].index >= eval_start]
+    return eval_start, offset, _nav_summary(nav)
+
+
+def permutation_runs(cache, start_shifts=None, offsets=None, end=None, params=None,
+                     workers=None, initial_cash=1000000):
+    """
+    起始日期 × Tranche 偏移的本地回测全排列
+
+    全新账户下各 Tranche 完全对称，单纯改变 days_count 只是重新编号、结果不变；
+    因此 Tranche 偏移定义为在评估起点之前提前 offset 个交易日启动，
+    使评估起点时的建仓进度与轮动相位不同，指标只统计评估起点之后的净值。
+
+    Args:
+        cache: SignalCache
+        start_shifts: 评估起点相对首个可用日的偏移 (交易日)，默认 0..60 每 5 日
+        offsets: 提前启动的交易日数，默认 0..REBALANCE_PERIOD_T-1
+    Returns:
+        DataFrame: [start, offset, return, max_dd, sharpe]
+    """
+    first_dt = cache.first_signal_dt
+    dates = [d for d in cache.dates if first_dt is not None and d >= first_dt]
+    start_shifts = list(range(0, 61, 5)) if start_shifts is None else start_shifts
+    offsets = list(range(config.REBALANCE_PERIOD_T)) if offsets is None else offsets
+    base = max(offsets)
+    tasks = [
+        (dates[base + s - o], dates[base + s], end, o, params, initial_cash)
+        for s in start_shifts if base + s < len(dates) for o in offsets
+    ]
+    logger.info(f"🎲 Permutation runs: {len(tasks)} ({len(start_shifts)} starts x {len(offsets)} offsets)")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache,)) as pool:
+        rows = [
+            {'start': start, 'offset': offset, **summary}
+            for start, offset, summary in pool.map(_permutation_task, tasks)
+        ]
+    return pd.DataFrame(rows)
+
+
+def summarize_distribution(samples):
+    """
+    分布汇总
+
+    Args:
+        samples: {metric: ndarray}
+    Returns:
+        DataFrame: 行=指标，列=mean/std/p5..p95
+    """
+    rows = {}
+    for name, values in samples.items():
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            continue
+        row = {'mean': values.mean(), 'std': values.std()}
+        row.update({f'p{p}': v for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))})
+        rows[name] = row
+    return pd.DataFrame(rows).T
@@ -2,11 +2,18 @@
 信号生成模块
 - get_market_regime: 市场状态判断
 - get_ranking: ETF排名评分
+- compute_signal_components / update_meta_gate / build_rank_df: get_ranking 的可复用步骤
+- ranking_inputs / meta_gate_step / rank_from_inputs: get_ranking 按步骤拆分 (EXEC_TIME 沿用收盘前预案时使用)
+- prepare_signal_components: 预计算与今日价格无关的分量，EXEC_TIME 仅按最后一行增量重算
+- 波动率尺优先读 context.vol_cache (core.volatility.VolatilityCache)，未配置时按切片计算
+- 启用 LIQUIDITY_FILTER 时按日均成交额过滤候选 (core.liquidity)
 """
 import os
 import numpy as np
 import pandas as pd
 from config import config, logger
+from .volatility import VolatilityCache
+from .liquidity import context_liquidity
 
 
 def get_market_regime(context, current_dt):
@@ -48,28 +55,50 @@ def get_market_regime(context, current_dt):
     return base_pos * macro_mult
 
 
-def get_ranking(context, current_dt):
+def _prefix_key(hist):
+    """除最后一行 (今日) 以外历史的指纹"""
+    return (len(hist), hist.index[-2] if len(hist) > 1 else None, tuple(hist.columns),
+            float(np.nansum(hist.iloc[-66:-1].values)))
+
+
+def _vol_ruler(hist):
+    daily_rets = hist.pct_change()
+    # 鲁棒性：限制最小波动率，防止除零错误
+    return daily_rets.iloc[:-5].tail(60).std().replace(0, 0.01).clip(lower=0.005)
+
+
+def prepare_signal_components(hist, vol_ruler=None):
     """
-    Meta-Gate 核心选股逻辑
-    返回: (排名DataFrame, 评分Series)
+    预计算与今日价格无关的分量 (区间收益参考价、Z-Score 波动率尺)
+    对任何仅最后一行不同的 hist 均有效，供 compute_signal_components(prepared=...) 增量重算
+    """
+    return {
+        'key': _prefix_key(hist),
+        'ref': {p: hist.iloc[-(p+1)] for p in [1, 3, 5, 20]},
+        'vol_ruler': _vol_ruler(hist) if vol_ruler is None else vol_ruler,
+    }
+
+
+def compute_signal_components(hist, prepared=None, vol_ruler=None):
+    """
+    与参数无关的信号分量 (动量评分 / Z-Score / 区间收益)
+    hist: 截至决策时点的价格矩阵 (行=日期, 列=标的)
+    prepared: prepare_signal_components 的结果；历史指纹不一致时忽略
+    vol_ruler: 预先算好的波动率尺 (如 VolatilityCache.ruler)，未提供时按 hist 计算
+    返回: (scores, z_score, rets)
     """
-    hist = context.prices_df[context.prices_df.index <= current_dt]
-    if len(hist) < 251:
-        logger.warning(f"⚠️ Insufficient history for ranking: {len(hist)} days")
-        return None, None
-    
     last = hist.iloc[-1]
+    if prepared is not None and prepared['key'] != _prefix_key(hist):
+        prepared = None
 
     # 动量评分
     scores = pd.Series(0.0, index=hist.columns)
     periods = {1: 30, 3: -70, 20: 150}
-    
-    # 预先检查是否有全空列
-    valid_cols = last.notna() & (last > 0)
-    if not valid_cols.any():
-        return None, scores
 
-    rets = {f'r{p}': (last / hist.iloc[-(p+1)]) - 1 for p in [1, 3, 5, 20]}
+    if prepared is not None:
+        rets = {f'r{p}': (last / prepared['ref'][p]) - 1 for p in [1, 3, 5, 20]}
+    else:
+        rets = {f'r{p}': (last / hist.iloc[-(p+1)]) - 1 for p in [1, 3, 5, 20]}
 
     for p, pts in periods.items():
         # 处理全为相同值的情况
@@ -77,49 +106,69 @@ def get_ranking(context, current_dt):
         scores += ((30 - ranks) / 30).clip(lower=0) * pts
 
     # Z-Score 结构门控 (核心防御)
-    daily_rets = hist.pct_change()
-    # 鲁棒性：限制最小波动率，防止除零错误
-    vol_ruler = daily_rets.iloc[:-5].tail(60).std().replace(0, 0.01).clip(lower=0.005)
+    if prepared is not None:
+        vol_ruler = prepared['vol_ruler']
+    elif vol_ruler is None:
+        vol_ruler = _vol_ruler(hist)
     z_score = rets['r5'] / (vol_ruler * np.sqrt(5))
+    return scores, z_score, rets
 
-    # Meta-Gate 状态机维护
-    k_crash = float(os.environ.get('OPT_K_CRASH', 2.5))
-    universe_z = z_score[z_score.index.isin(context.whitelist)].dropna()
-    
-    if len(universe_z) >= 20:
-        current_br = (universe_z < -k_crash).mean()
-        context.br_history = (context.br_history + [current_br])[-3:]
-        br_smooth = np.mean(context.br_history)
-
-        # 状态机维护
-        danger_in = 0.5 if np.median(universe_z) < -2.3 else context.BR_DANGER_IN
-        
-        old_state = context.market_state
-        if context.market_state == 'SAFE' and br_smooth > context.BR_CAUTION_IN:
-            context.market_state = 'CAUTION'
-        elif context.market_state == 'CAUTION':
-            if br_smooth > danger_in:
-                context.market_state = 'DANGER'
-            elif br_smooth < context.BR_CAUTION_OUT:
-                context.market_state = 'SAFE'
-        elif context.market_state == 'DANGER' and br_smooth < context.BR_DANGER_OUT:
-            context.market_state = 'CAUTION'
-        
-        if old_state != context.market_state:
-            logger.info(f"🚦 [STATE CHANGE] {old_state} -> {context.market_state} (BR: {br_smooth:.2%})")
-
-        context.risk_scaler = (
-            0.0 if context.market_state == 'DANGER'
-            else (0.7 if br_smooth >= context.BR_PRE_DANGER else 1.0)
-        )
-
-    # 过滤弱势标的 (顺势而为)
-    k_entry = float(os.environ.get('OPT_R5_K', 1.6))
+
+def cached_vol_ruler(context, current_dt):
+    """context.vol_cache 中 current_dt 的波动率尺 (未配置缓存时返回 None)"""
+    cache = getattr(context, 'vol_cache', None)
+    if not isinstance(cache, VolatilityCache):
+        return None
+    return cache.sync(context.prices_df).ruler(current_dt)
+
+
+def update_meta_gate(context, universe_z, k_crash):
+    """
+    Meta-Gate 状态机维护
+    universe_z: 白名单内有效 Z-Score；根据崩溃广度 (BR) 更新 market_state 与 risk_scaler
+    """
+    if len(universe_z) < 20:
+        return
+
+    current_br = (universe_z < -k_crash).mean()
+    context.br_history = (context.br_history + [current_br])[-3:]
+    br_smooth = np.mean(context.br_history)
+
+    # 状态机维护
+    danger_in = 0.5 if np.median(universe_z) < -2.3 else context.BR_DANGER_IN
+
+    old_state = context.market_state
+    if context.market_state == 'SAFE' and br_smooth > context.BR_CAUTION_IN:
+        context.market_state = 'CAUTION'
+    elif context.market_state == 'CAUTION':
+        if br_smooth > danger_in:
+            context.market_state = 'DANGER'
+        elif br_smooth < context.BR_CAUTION_OUT:
+            context.market_state = 'SAFE'
+    elif context.market_state == 'DANGER' and br_smooth < context.BR_DANGER_OUT:
+        context.market_state = 'CAUTION'
+
+    if old_state != context.market_state:
+        logger.info(f"🚦 [STATE CHANGE] {old_state} -> {context.market_state} (BR: {br_smooth:.2%})")
+
+    context.risk_scaler = (
+        0.0 if context.market_state == 'DANGER'
+        else (0.7 if br_smooth >= context.BR_PRE_DANGER else 1.0)
+    )
+
+
+def build_rank_df(context, scores, z_score, rets, k_entry, eligible=None):
+    """
+    过滤弱势标的并生成排名表 (按 score, r1, r20 降序)
+    eligible: 额外的准入布尔 Series (如流动性门槛)，缺失视为不准入
+    """
     valid_mask = (z_score > -k_entry) & (scores >= config.MIN_SCORE)
+    if eligible is not None:
+        valid_mask &= eligible.reindex(valid_mask.index, fill_value=False)
     valid_syms = [s for s in list(context.whitelist) if s in valid_mask.index and valid_mask[s]]
-    
+
     if not valid_syms:
-        return None, scores
+        return None
 
     scores_subset = scores.loc[valid_syms]
     df = pd.DataFrame({
@@ -128,5 +177,60 @@ def get_ranking(context, current_dt):
     })
     for p in [1, 3, 5, 20]:
         df[f'r{p}'] = rets[f'r{p}'].loc[valid_syms]
+
+    return df.sort_values(by=['score', 'r1', 'r20'], ascending=False)
+
+
+def ranking_inputs(context, current_dt):
+    """
+    get_ranking 中推进 Meta-Gate 之前的部分
+    返回: (scores, z_score, rets, universe_z)；历史不足时返回 None，今日无有效价格时 z_score 等为 None
+    """
+    hist = context.prices_df[context.prices_df.index <= current_dt]
+    if len(hist) < 251:
+        logger.warning(f"⚠️ Insufficient history for ranking: {len(hist)} days")
+        return None
     
-    return df.sort_values(by=['score', 'r1', 'r20'], ascending=False), scores
+    last = hist.iloc[-1]
+
+    # 预先检查是否有全空列
+    valid_cols = last.notna() & (last > 0)
+    if not valid_cols.any():
+        return pd.Series(0.0, index=hist.columns), None, None, None
+
+    # 盘前预计算 (preclose) 的分量，历史未变时只重算今日一行
+    prepared = getattr(context, 'signal_prep', None)
+    scores, z_score, rets = compute_signal_components(
+        hist, prepared if isinstance(prepared, dict) else None, cached_vol_ruler(context, current_dt))
+    universe_z = z_score[z_score.index.isin(context.whitelist)].dropna()
+    return scores, z_score, rets, universe_z
+
+
+def meta_gate_step(context, universe_z):
+    """按 OPT_K_CRASH 推进一次 Meta-Gate (与 get_ranking 内部一致)"""
+    update_meta_gate(context, universe_z, float(os.environ.get('OPT_K_CRASH', 2.5)))
+
+
+def rank_from_inputs(context, current_dt, scores, z_score, rets):
+    """过滤弱势标的 (顺势而为) 与流动性门槛后的排名表"""
+    k_entry = float(os.environ.get('OPT_R5_K', 1.6))
+    liquidity = context_liquidity(context)
+    eligible = liquidity.liquid_mask(current_dt) if liquidity is not None else None
+    return build_rank_df(context, scores, z_score, rets, k_entry, eligible)
+
+
+def get_ranking(context, current_dt):
+    """
+    Meta-Gate 核心选股逻辑
+    返回: (排名DataFrame, 评分Series)
+    """
+    inputs = ranking_inputs(context, current_dt)
+    if inputs is None:
+        return None, None
+    scores, z_score, rets, universe_z = inputs
+    if z_score is None:
+        return None, scores
+
+    # Meta-Gate 状态机维护
+    meta_gate_step(context, universe_z)
+    return rank_from_inputs(context, current_dt, scores, z_score, rets), scores
@@ -0,0 +1,170 @@
+"""
+每日状态快照 (去重存储，按日回溯)
+- StateSnapshotStore: 每个交易日一份清单 (days/YYYY-MM-DD.json)，记录各 Tranche 的现金/净值等标量
+  与持仓块哈希；持仓块 (holdings + pos_records) 以二进制编码按内容哈希存放 (blocks/xx/<hash>.bin)，
+  未变化的 Tranche 复用同一块，存储只随调仓与最高价更新增长
+- state_as_of / restore: 回溯到某日 (含) 之前最近一份快照
+- diff_books: 两日 Tranche 账本逐项比对 (事故排查)
+"""
+import os
+import json
+import bisect
+import hashlib
+
+import pandas as pd
+
+from config import config
+from .state_codec import decode_state, encode_state, to_json_state
+
+_BOOK_KEYS = ('holdings', 'pos_records')
+_BLANK = {'id': 0, 'cash': 0.0, 'total_value': 0.0, 'guard_triggered_today': False}
+
+
+def _day_key(day):
+    return pd.Timestamp(day).strftime('%Y-%m-%d')
+
+
+def _atomic_write(path, data):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+class StateSnapshotStore:
+    """
+    Args:
+        root: 存储目录，默认 SNAPSHOT_DIR
+    """
+
+    def __init__(self, root=None):
+        self.root = root or config.SNAPSHOT_DIR
+        self.block_dir = os.path.join(self.root, 'blocks')
+        self.day_dir = os.path.join(self.root, 'days')
+        self._days = None
+        self._blocks = {}   # 哈希 -> 块字节 (已写入或已读取)
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    def _block_path(self, digest):
+        return os.path.join(self.block_dir, digest[:2], digest + '.bin')
+
+    def _put_block(self, tranche):
+        data = encode_state({'tranches': [{**_BLANK, **{k: tranche.get(k, {}) for k in _BOOK_KEYS}}]})
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        if digest in self._blocks:
+            return digest, False
+        path = self._block_path(digest)
+        new = not os.path.exists(path)
+        if new:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _atomic_write(path, data)
+        self._blocks[digest] = data
+        return digest, new
+
+    def put(self, state, day):
+        """
+        写入 day 的快照 (同日重复写入覆盖清单)
+
+        Returns:
+            dict: {'day', 'tranches', 'new_blocks'}
+        """
+        key = _day_key(day)
+        entries, new_blocks = [], 0
+        for t in state.get('tranches', []):
+            digest, new = self._put_block(t)
+            new_blocks += new
+            scalars = to_json_state({'tranches': [{k: v for k, v in t.items() if k not in _BOOK_KEYS}]})
+            entries.append({**scalars['tranches'][0], 'block': digest})
+        manifest = to_json_state({k: v for k, v in state.items() if k != 'tranches'})
+        manifest.update({'date': key, 'tranches': entries})
+
+        os.makedirs(self.day_dir, exist_ok=True)
+        _atomic_write(os.path.join(self.day_dir, key + '.json'), json.dumps(manifest, indent=1).encode('utf-8'))
+        if self._days is not None and key not in self._days:
+            bisect.insort(self._days, key)
+        return {'day': key, 'tranches': len(entries), 'new_blocks': new_blocks}
+
+    def save(self, rpm, current_dt):
+        """记录 RollingPortfolioManager 在 current_dt 当日的状态"""
+        return self.put(rpm.state_dict(), current_dt)
+
+    # ------------------------------------------------------------------
+    # 读取
+    # ------------------------------------------------------------------
+    def days(self):
+        """已有快照的交易日 (升序 'YYYY-MM-DD')"""
+        if self._days is None:
+            names = os.listdir(self.day_dir) if os.path.isdir(self.day_dir) else []
+            self._days = sorted(n[:-5] for n in names if n.endswith('.json'))
+        return list(self._days)
+
+    def resolve(self, day):
+        """day (含) 之前最近一份快照的日期，没有则返回 None"""
+        days = self._days if self._days is not None else self.days()
+        pos = bisect.bisect_right(days, _day_key(day)) - 1
+        return days[pos] if pos >= 0 else None
+
+    def _read_block(self, digest):
+        data = self._blocks.get(digest)
+        if data is None:
+            with open(self._block_path(digest), 'rb') as f:
+                data = f.read()
+            self._blocks[digest] = data
+        return decode_state(data)['tranches'][0]   # 每次解码出新字典，调用方可直接持有
+
+    def state_as_of(self, day):
+        """
+        day (含) 之前最近一份快照的状态 (entry_dt 为 datetime)，附 'date' 字段；没有则返回 None
+        """
+        key = self.resolve(day)
+        if key is None:
+            return None
+        with open(os.path.join(self.day_dir, key + '.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        tranches = []
+        for entry in manifest.pop('tranches'):
+            entry = dict(entry)
+            book = self._read_block(entry.pop('block'))
+            tranches.append({**entry, **{k: book[k] for k in _BOOK_KEYS}})
+        manifest['tranches'] = tranches
+        return manifest
+
+    def restore(self, rpm, day):
+        """将 rpm 恢复为 day (含) 之前最近一份快照；返回实际使用的快照日期 (没有快照时为 None，rpm 不变)"""
+        state = self.state_as_of(day)
+        if state is None:
+            return None
+        rpm.apply_state(state, binary=True)
+        return state['date']
+
+    def diff(self, day_a, day_b):
+        return diff_books(self.state_as_of(day_a), self.state_as_of(day_b))
+
+
+def diff_books(before, after):
+    """
+    两份状态的 Tranche 账本差异
+
+    Returns:
+        DataFrame: 列 [tranche, symbol, field, before, after]；symbol 为空表示 Tranche 标量 (cash 等)
+    """
+    rows = []
+    books_a = {t['id']: t for t in (before or {}).get('tranches', [])}
+    books_b = {t['id']: t for t in (after or {}).get('tranches', [])}
+    for tid in sorted(books_a.keys() | books_b.keys()):
+        a, b = books_a.get(tid, {}), books_b.get(tid, {})
+        for field in ('cash', 'total_value'):
+            if a.get(field) != b.get(field):
+                rows.append((tid, '', field, a.get(field), b.get(field)))
+        hold_a, hold_b = a.get('holdings', {}), b.get('holdings', {})
+        rec_a, rec_b = a.get('pos_records', {}), b.get('pos_records', {})
+        for sym in sorted(hold_a.keys() | hold_b.keys() | rec_a.keys() | rec_b.keys()):
+            if hold_a.get(sym) != hold_b.get(sym):
+                rows.append((tid, sym, 'shares', hold_a.get(sym), hold_b.get(sym)))
+            ra, rb = rec_a.get(sym, {}), rec_b.get(sym, {})
+            for field in sorted(ra.keys() | rb.keys()):
+                if ra.get(field) != rb.get(field):
+                    rows.append((tid, sym, field, ra.get(field), rb.get(field)))
+    return pd.DataFrame(rows, columns=['tranche', 'symbol', 'field', 'before', 'after'])
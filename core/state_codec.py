@@ -0,0 +1,339 @@
+"""
+状态文件编码
+- 二进制格式 (STATE_FORMAT=binary): 定长头 + 标的表 + 定宽数组 (Tranche / 持仓 / 持仓记录) + JSON 元数据
+  载入时由 NumPy 一次解出整列，无需逐字段解析 ISO 时间字符串
+- JSON 格式: 原 rolling_state_main*.json (默认)
+- read_state 按文件头自动识别格式并执行模式迁移 (register_migration)，两种格式可无损互转 (run_state_tool.py)
+
+二进制布局 (小端):
+    头      magic 'RPMS' | schema u16 | layout u16 | tranches u32 | holdings u32 | positions u32
+            | symbols 字节数 u32 | meta 字节数 u32 | crc32 u32 (头之后全部字节)
+    标的表  UTF-8，'\\n' 分隔
+    数组    TRANCHE_DTYPE × tranches, HOLDING_DTYPE × holdings, POSITION_DTYPE × positions
+    meta    JSON: days_count / perf / 定宽字段无法表示的值 (extras)
+"""
+import json
+import os
+import struct
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+
+MAGIC = b'RPMS'
+STATE_SCHEMA = 1      # 逻辑模式版本 (无 schema 字段的旧 JSON 视为 1)
+BINARY_LAYOUT = 1     # 二进制布局版本
+_HEADER = struct.Struct('<4sHHIIIIII')
+
+TRANCHE_DTYPE = np.dtype([('id', '<i8'), ('cash', '<f8'), ('total_value', '<f8'), ('guard', 'u1'),
+                          ('n_hold', '<u4'), ('n_pos', '<u4')])
+HOLDING_DTYPE = np.dtype([('sym', '<u4'), ('shares', '<i8')])
+POSITION_DTYPE = np.dtype([('sym', '<u4'), ('entry_price', '<f8'), ('high_price', '<f8'),
+                           ('entry_dt', '<M8[us]'), ('volatility', '<f8'), ('present', 'u1')])
+
+_TRANCHE_KEYS = ('id', 'cash', 'holdings', 'pos_records', 'total_value', 'guard_triggered_today')
+_TRANCHE_KEYS_SET = frozenset(_TRANCHE_KEYS)
+_POSITION_FIELDS = ('entry_price', 'high_price', 'entry_dt', 'volatility')   # present 位序
+_ALL_PRESENT = (1 << len(_POSITION_FIELDS)) - 1
+_EPOCH = datetime(1970, 1, 1)
+_NAT = np.iinfo(np.int64).min
+_ONE_US = timedelta(microseconds=1)
+
+_MIGRATIONS = {}
+
+
+# ----------------------------------------------------------------------
+# 模式迁移
+# ----------------------------------------------------------------------
+def register_migration(from_version):
+    """
+    注册 from_version -> from_version + 1 的迁移函数 (state -> state)
+    修改状态结构时递增 STATE_SCHEMA 并注册对应迁移，旧文件载入时依次升级
+    """
+    def decorator(fn):
+        _MIGRATIONS[from_version] = fn
+        return fn
+    return decorator
+
+
+def migrate(state, target=None):
+    target = STATE_SCHEMA if target is None else target
+    version = state.get('schema', 1)
+    if version > target:
+        raise ValueError(f"state schema {version} is newer than supported {target}")
+    while version < target:
+        if version not in _MIGRATIONS:
+            raise ValueError(f"no migration registered for state schema {version}")
+        state = _MIGRATIONS[version](state)
+        version += 1
+    state['schema'] = version
+    return state
+
+
+# ----------------------------------------------------------------------
+# 编码 / 解码
+# ----------------------------------------------------------------------
+_NUMBER_TYPES = frozenset({int, float, np.float64, np.int64, np.float32, np.int32})
+_INT_TYPES = frozenset({int, np.int64, np.int32})
+_DT_TYPES = frozenset({datetime, type(None)})
+
+
+def _is_number(v):
+    return type(v) in _NUMBER_TYPES or (
+        isinstance(v, (int, float, np.integer, np.floating)) and not isinstance(v, (bool, np.bool_)))
+
+
+def _as_datetime(v):
+    """entry_dt -> naive datetime (None 保持 None)；无法定宽表示时返回 False"""
+    if v is None:
+        return None
+    if isinstance(v, str):
+        try:
+            v = datetime.fromisoformat(v)
+        except ValueError:
+            return False
+    if isinstance(v, datetime) and v.tzinfo is None:
+        return v
+    return False
+
+
+def _json_value(v):
+    if isinstance(v, datetime):
+        return v.isoformat()
+    if isinstance(v, np.generic):
+        return v.item()
+    return v
+
+
+def _columns_fast(tranches):
+    """
+    常规持仓簿 (字段齐全、类型规整) 的整列提取，逐列做类型检查；
+    任一列不满足时返回 None，由 _columns_general 逐条处理
+    """
+    if any(t.keys() - _TRANCHE_KEYS_SET or len(t) != len(_TRANCHE_KEYS) for t in tranches):
+        return None
+    h_syms = [s for t in tranches for s in t['holdings']]
+    h_shares = [v for t in tranches for v in t['holdings'].values()]
+    recs = [r for t in tranches for r in t['pos_records'].values()]
+    if not set(map(type, h_shares)) <= _INT_TYPES or any(len(r) != len(_POSITION_FIELDS) for r in recs):
+        return None
+    try:
+        p_cols = [[r[f] for r in recs] for f in _POSITION_FIELDS]
+    except KeyError:
+        return None
+    entry_dts = p_cols[2]
+    if not (all(set(map(type, p_cols[i])) <= _NUMBER_TYPES for i in (0, 1, 3))
+            and set(map(type, entry_dts)) <= _DT_TYPES
+            and not any(d.tzinfo for d in entry_dts if d is not None)):
+        return None
+    t_cols = [[t[k] for t in tranches] for k in ('id', 'cash', 'total_value')]
+    guards = [t['guard_triggered_today'] for t in tranches]
+    if not (set(map(type, t_cols[0])) <= _INT_TYPES and set(map(type, t_cols[1] + t_cols[2])) <= _NUMBER_TYPES
+            and set(map(type, guards)) <= {bool}):
+        return None
+    t_rows = list(zip(*t_cols, guards, [len(t['holdings']) for t in tranches],
+                      [len(t['pos_records']) for t in tranches]))
+    p_syms = [s for t in tranches for s in t['pos_records']]
+    present = [_ALL_PRESENT] * len(recs)
+    return t_rows, h_syms, h_shares, p_syms, p_cols, present, {}
+
+
+def _columns_general(tranches):
+    """逐条提取：定宽字段无法表示的值 (字符串时间、非整数份额、额外字段等) 记入 extras"""
+    t_rows, h_syms, h_shares, p_syms, present_bits = [], [], [], [], []
+    p_cols = [[] for _ in _POSITION_FIELDS]
+    extras = {}
+    for ti, t in enumerate(tranches):
+        t_extra = {k: _json_value(v) for k, v in t.items() if k not in _TRANCHE_KEYS_SET}
+        for k in ('cash', 'total_value'):
+            if not _is_number(t.get(k)):
+                t_extra[k] = _json_value(t.get(k))
+        guard = t.get('guard_triggered_today', False)
+        if not isinstance(guard, bool):
+            t_extra['guard_triggered_today'] = _json_value(guard)
+
+        holdings = t.get('holdings', {})
+        for sym, shares in holdings.items():
+            h_syms.append(sym)
+            if _is_number(shares) and float(shares).is_integer():
+                h_shares.append(int(shares))
+            else:
+                h_shares.append(0)
+                t_extra.setdefault('holdings', {})[sym] = _json_value(shares)
+
+        pos_records = t.get('pos_records', {})
+        for sym, rec in pos_records.items():
+            present, p_extra = 0, {}
+            for bit, field in enumerate(_POSITION_FIELDS):
+                v = rec.get(field)
+                value = _as_datetime(v) if field == 'entry_dt' else (float(v) if _is_number(v) else False)
+                if field in rec and value is not False:
+                    present |= 1 << bit
+                    p_cols[bit].append(value)
+                else:
+                    p_cols[bit].append(None if field == 'entry_dt' else np.nan)
+                    if field in rec:
+                        p_extra[field] = _json_value(v)
+            p_extra.update({k: _json_value(v) for k, v in rec.items() if k not in _POSITION_FIELDS})
+            if p_extra:
+                t_extra.setdefault('pos_records', {})[sym] = p_extra
+            p_syms.append(sym)
+            present_bits.append(present)
+
+        t_id = t.get('id', ti)
+        if not (_is_number(t_id) and float(t_id).is_integer()):
+            t_extra['id'], t_id = _json_value(t_id), ti
+        t_rows.append((int(t_id), float(t['cash']) if _is_number(t.get('cash')) else np.nan,
+                       float(t['total_value']) if _is_number(t.get('total_value')) else np.nan,
+                       bool(guard), len(holdings), len(pos_records)))
+        if t_extra:
+            extras[str(ti)] = t_extra
+    return t_rows, h_syms, h_shares, p_syms, p_cols, present_bits, extras
+
+
+def _datetime_column(values):
+    """naive datetime / None 列 -> datetime64[us] (同一时点只换算一次，买入时点大量重复)"""
+    micros = {d: _NAT if d is None else (d - _EPOCH) // _ONE_US for d in dict.fromkeys(values)}
+    return np.array([micros[d] for d in values], dtype=np.int64).view('M8[us]')
+
+
+def encode_state(state):
+    """状态字典 (Tranche.__dict__ 或 to_dict 形式均可) -> bytes"""
+    tranches = state.get('tranches', [])
+    t_rows, h_syms, h_shares, p_syms, p_cols, present, extras = \
+        _columns_fast(tranches) or _columns_general(tranches)
+
+    symbols = list(dict.fromkeys(h_syms + p_syms))
+    sym_idx = {s: i for i, s in enumerate(symbols)}
+    holdings = np.empty(len(h_syms), dtype=HOLDING_DTYPE)
+    holdings['sym'] = [sym_idx[s] for s in h_syms]
+    holdings['shares'] = h_shares
+    positions = np.empty(len(p_syms), dtype=POSITION_DTYPE)
+    positions['sym'] = [sym_idx[s] for s in p_syms]
+    for field, col in zip(_POSITION_FIELDS, p_cols):
+        if field == 'entry_dt':
+            positions[field] = _datetime_column(col)
+        else:
+            positions[field] = col
+    positions['present'] = present
+
+    meta = {k: v for k, v in state.items() if k not in ('tranches', 'schema')}
+    if extras:
+        meta['extras'] = extras
+    sym_blob = '\n'.join(symbols).encode('utf-8')
+    meta_blob = json.dumps(meta, ensure_ascii=False, default=_json_value).encode('utf-8')
+    body = b''.join([
+        sym_blob,
+        np.array(t_rows, dtype=TRANCHE_DTYPE).tobytes(),
+        holdings.tobytes(),
+        positions.tobytes(),
+        meta_blob,
+    ])
+    header = _HEADER.pack(MAGIC, state.get('schema', STATE_SCHEMA), BINARY_LAYOUT, len(t_rows), len(h_syms),
+                          len(p_syms), len(sym_blob), len(meta_blob), zlib.crc32(body))
+    return header + body
+
+
+def decode_state(buf):
+    """bytes -> 状态字典 (entry_dt 为 datetime)；校验失败抛出 ValueError"""
+    if len(buf) < _HEADER.size:
+        raise ValueError("state file truncated")
+    magic, schema, layout, n_t, n_h, n_p, n_sym, n_meta, crc = _HEADER.unpack_from(buf)
+    if magic != MAGIC:
+        raise ValueError("not a binary state file")
+    if layout != BINARY_LAYOUT:
+        raise ValueError(f"unsupported binary state layout {layout}")
+    body = memoryview(buf)[_HEADER.size:]
+    expected = n_sym + n_t * TRANCHE_DTYPE.itemsize + n_h * HOLDING_DTYPE.itemsize \
+        + n_p * POSITION_DTYPE.itemsize + n_meta
+    if len(body) != expected or zlib.crc32(body) != crc:
+        raise ValueError("state file corrupted (size/crc mismatch)")
+
+    pos = 0
+    symbols = bytes(body[:n_sym]).decode('utf-8').split('\n') if n_sym else []
+    pos += n_sym
+    arrays = []
+    for dtype, count in ((TRANCHE_DTYPE, n_t), (HOLDING_DTYPE, n_h), (POSITION_DTYPE, n_p)):
+        arrays.append(np.frombuffer(body, dtype=dtype, count=count, offset=pos))
+        pos += count * dtype.itemsize
+    t_arr, h_arr, p_arr = arrays
+    meta = json.loads(bytes(body[pos:pos + n_meta]).decode('utf-8'))
+    extras = meta.pop('extras', {})
+
+    # 整列转换为 Python 对象 (datetime64[us] -> datetime / NaT -> None)
+    h_syms = [symbols[i] for i in h_arr['sym'].tolist()]
+    h_shares = h_arr['shares'].tolist()
+    p_syms = [symbols[i] for i in p_arr['sym'].tolist()]
+    p_cols = [p_arr['entry_price'].tolist(), p_arr['high_price'].tolist(),
+              p_arr['entry_dt'].astype(object).tolist(), p_arr['volatility'].tolist()]
+    recs = [{'entry_price': a, 'high_price': b, 'entry_dt': c, 'volatility': d} for a, b, c, d in zip(*p_cols)]
+    for j in np.flatnonzero(p_arr['present'] != _ALL_PRESENT).tolist():
+        present = int(p_arr['present'][j])
+        recs[j] = {f: p_cols[bit][j] for bit, f in enumerate(_POSITION_FIELDS) if present >> bit & 1}
+
+    tranches, h0, p0 = [], 0, 0
+    for ti, (t_id, cash, total_value, guard, n_hold, n_pos) in enumerate(t_arr.tolist()):
+        t_extra = extras.get(str(ti), {})
+        holdings = dict(zip(h_syms[h0:h0 + n_hold], h_shares[h0:h0 + n_hold]))
+        holdings.update(t_extra.get('holdings', {}))
+        pos_records = dict(zip(p_syms[p0:p0 + n_pos], recs[p0:p0 + n_pos]))
+        for sym, p_extra in t_extra.get('pos_records', {}).items():
+            rec = {**pos_records[sym], **p_extra}
+            pos_records[sym] = {k: rec[k] for k in _order(rec, p_extra)}
+        h0, p0 = h0 + n_hold, p0 + n_pos
+
+        t = {'id': t_id, 'cash': cash, 'holdings': holdings, 'pos_records': pos_records,
+             'total_value': total_value, 'guard_triggered_today': bool(guard)}
+        t.update({k: v for k, v in t_extra.items() if k not in ('holdings', 'pos_records')})
+        tranches.append(t)
+
+    state = dict(meta)
+    state['tranches'] = tranches
+    state['schema'] = schema
+    return state
+
+
+def _order(rec, extra):
+    """定宽字段在前 (原顺序)，extras 中的其余字段在后"""
+    fixed = [k for k in _POSITION_FIELDS if k in rec]
+    return fixed + [k for k in extra if k not in fixed]
+
+
+def to_json_state(state):
+    """状态字典 -> JSON 可序列化形式 (datetime 转为 ISO 字符串，与 Tranche.to_dict 一致)"""
+    def _tranche(t):
+        return {k: ({sym: {f: _json_value(v) for f, v in rec.items()} for sym, rec in val.items()}
+                    if k == 'pos_records' else _json_value(val))
+                for k, val in t.items()}
+    return {k: ([_tranche(t) for t in v] if k == 'tranches' else v) for k, v in state.items()}
+
+
+# ----------------------------------------------------------------------
+# 文件读写
+# ----------------------------------------------------------------------
+def detect_format(path):
+    with open(path, 'rb') as f:
+        return 'binary' if f.read(len(MAGIC)) == MAGIC else 'json'
+
+
+def read_state(path):
+    """按文件头识别格式读取状态并迁移至当前模式；返回 (state, fmt)"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if raw[:len(MAGIC)] == MAGIC:
+        return migrate(decode_state(raw)), 'binary'
+    return migrate(json.loads(raw.decode('utf-8'))), 'json'
+
+
+def dump_state(f, state, fmt):
+    """将状态写入已打开的二进制文件对象 (原子替换由调用方负责)"""
+    if fmt == 'binary':
+        f.write(encode_state(state))
+    else:
+        f.write(json.dumps(to_json_state(state), indent=2).encode('utf-8'))
+
+
+def legacy_state_path(path):
+    """二进制状态文件对应的旧 JSON 文件 (同名 .json)，用于首次切换格式时迁移"""
+    root, ext = os.path.splitext(path)
+    return root + '.json' if ext != '.json' else None
@@ -32,7 +32,19 @@ except ImportError:
 
 from config import config, logger
 from .account import get_account
-from .signal import get_market_regime, get_ranking
+from .risk import DataGuard, RiskController
+from .signal import (get_market_regime, get_ranking, prepare_signal_components, cached_vol_ruler,
+                     ranking_inputs, meta_gate_step, rank_from_inputs)
+from .latency import StageTimer, append_metrics
+from .bar_buffer import IntradayBarBuffer
+from .volatility import VolatilityCache, stop_volatility
+from .liquidity import context_liquidity, cap_buy_value
+from .weights import context_risk_model
+from .preclose import snapshot_gate, restore_gate, plan_signature, plan_delta
+from .snapshots import StateSnapshotStore
+from .reconcile import format_reconciliation
+from .mtm import IntradayMarkToMarket
+from .stress import stress_test, format_stress
 
 
 def verify_orders(context, submitted_orders, wait_seconds=30):
@@ -230,8 +242,214 @@ def verify_orders(context, submitted_orders, wait_seconds=30):
     }
 
 
+def _new_timer(context, name, budget_sec):
+    """分阶段计时器；仅实盘发送超预算告警"""
+    alert = context.wechat.send_text if context.mode == MODE_LIVE else None
+    return StageTimer(name, budget_sec, alert=alert, started_at=context.now.replace(tzinfo=None))
+
+
+def _finish_timer(context, timer, verbose=True):
+    """结束计时；仅实盘写入滚动指标文件"""
+    record = timer.finish()
+    if context.mode == MODE_LIVE:
+        append_metrics(record)
+        stages = " ".join(f"{k}={v:.0f}ms" for k, v in record['stages'].items())
+        log = logger.info if verbose else logger.debug
+        log(f"⏱️ {record['run']} finished in {record['total_ms'] / 1000:.2f}s | {stages}")
+
+
+def _today_prices(context, current_dt, timer=None):
+    """
+    "今日"价格行: INTRADAY_PRICE_SOURCE 为 last/vwap 时优先取分钟缓冲，
+    缓冲中缺失或超过 DATA_TIMEOUT_SEC 未更新的标的再以 current() 补齐；
+    current() 中报价过期的标的不注入 (DATA_STALE_ACTION=drop)，今日行缺失即不参与排名
+    """
+    td = {}
+    buffer = getattr(context, 'bar_buffer', None)
+    if config.INTRADAY_PRICE_SOURCE != 'current' and isinstance(buffer, IntradayBarBuffer):
+        since = current_dt - pd.Timedelta(seconds=config.DATA_TIMEOUT_SEC)
+        td = {s: p for s, p in buffer.snapshot(config.INTRADAY_PRICE_SOURCE, since).items()
+              if s in context.whitelist}
+    missing = [s for s in context.whitelist if s not in td]
+    if missing:
+        ticks = current(symbols=missing)
+        freshness = DataGuard.check_freshness(ticks, context.now)
+        _report_staleness(context, freshness, len(ticks), timer)
+        stale = set(freshness['stale']) if config.DATA_STALE_ACTION == 'drop' else ()
+        td.update({t['symbol']: t['price'] for t in ticks if t['price'] > 0 and t['symbol'] not in stale})
+    if len(missing) < len(context.whitelist):
+        logger.debug(f"💉 Today row from bar buffer ({config.INTRADAY_PRICE_SOURCE}): "
+                     f"{len(context.whitelist) - len(missing)} buffered, {len(missing)} via current()")
+    return td
+
+
+def _report_staleness(context, freshness, n_ticks, timer=None):
+    """记录 tick 时延指标，过期占比超过 DATA_STALE_ALERT_FRAC 时告警"""
+    if timer is not None:
+        timer.note('ticks', {
+            'count': n_ticks, 'stale': len(freshness['stale']), 'unknown': freshness['unknown'],
+            'stale_frac': round(freshness['stale_frac'], 4), 'max_age_sec': round(freshness['max_age'], 3),
+        })
+    if not freshness['stale']:
+        return
+    logger.warning(f"⚠️ [DATA] {len(freshness['stale'])}/{n_ticks} ticks older than {config.DATA_TIMEOUT_SEC}s "
+                   f"(max {freshness['max_age']:.0f}s, action={config.DATA_STALE_ACTION}): {freshness['stale'][:5]}")
+    if freshness['stale_frac'] > config.DATA_STALE_ALERT_FRAC:
+        try:
+            context.wechat.send_text(
+                f"⚠️ 行情数据过期警报\n"
+                f"过期标的: {len(freshness['stale'])}/{n_ticks} ({freshness['stale_frac']:.0%})\n"
+                f"最大时延: {freshness['max_age']:.0f}s > {config.DATA_TIMEOUT_SEC}s"
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ 微信通知失败: {e}")
+
+
+def _with_today_row(prices_df, td, current_dt):
+    """以 {symbol: price} 替换/追加 prices_df 中的今日行"""
+    rows = pd.DataFrame(
+        [td], 
+        index=[current_dt.replace(hour=0, minute=0, second=0, microsecond=0)]
+    )
+    return pd.concat([
+        prices_df[~prices_df.index.isin(rows.index)], 
+        rows
+    ]).sort_index()
+
+
+def preclose(context):
+    """
+    收盘前预计算 (PRECLOSE_TIME，仅实盘)
+    以当时最新价生成排名 / 仓位 / 目标权重预案，并缓存与今日价格无关的信号分量：
+    EXEC_TIME 信号只按注入的今日行增量重算，排名签名与仓位未变时直接沿用预案权重。
+    Meta-Gate 状态与 prices_df 不变。
+    """
+    if context.mode != MODE_LIVE:
+        return
+    timer = _new_timer(context, 'preclose', config.ALGO_BUDGET_SEC)
+    try:
+        _run_preclose(context, timer)
+    except Exception as e:
+        logger.error(f"❌ [PRECLOSE] 预计算失败，EXEC_TIME 将完整计算: {e}")
+        context.preclose_plan, context.signal_prep = None, None
+    finally:
+        _finish_timer(context, timer)
+
+
+def _run_preclose(context, timer):
+    from core.backtest import build_price_map
+    from core.logic import select_target_weights, calculate_position_scale
+
+    current_dt = context.now.replace(tzinfo=None)
+    context.preclose_plan, context.signal_prep = None, None
+    if not context.rpm.initialized or not context.rpm.tranches:
+        logger.info("📋 [PRECLOSE] Portfolio not initialized, skip")
+        return
+
+    td = _today_prices(context, current_dt, timer)
+    provisional = _with_today_row(context.prices_df, td, current_dt) if td else context.prices_df
+    hist = provisional[provisional.index <= current_dt]
+    if len(hist) < 251:
+        logger.warning(f"⚠️ [PRECLOSE] Insufficient history: {len(hist)} days")
+        return
+    price_map = build_price_map(hist, context.whitelist)
+    timer.lap('inject_ticks')
+
+    # algo 会先 days_count += 1
+    active_idx = context.rpm.days_count % config.REBALANCE_PERIOD_T
+    active_t = context.rpm.tranches[active_idx]
+    guard = active_t.check_guard(price_map, current_dt)
+
+    gate = snapshot_gate(context)
+    saved_prices = context.prices_df
+    try:
+        context.prices_df = provisional
+        context.signal_prep = prepare_signal_components(hist, cached_vol_ruler(context, current_dt))
+        rank_df, _ = get_ranking(context, current_dt)
+        risk_model = context_risk_model(context, current_dt)
+        weights = (select_target_weights(rank_df, active_t, risk_model)
+                   if rank_df is not None and not guard else {})
+        scale, _, _ = calculate_position_scale(context, current_dt)
+        market_state = context.market_state
+    finally:
+        context.prices_df = saved_prices
+        restore_gate(context, gate)
+    timer.lap('ranking')
+
+    context.preclose_plan = {
+        'day': current_dt.date(), 'dt': current_dt, 'active_idx': active_idx,
+        'signature': plan_signature(rank_df, risk_model), 'weights': weights, 'scale': scale,
+        'market_state': market_state, 'guard': guard, 'holdings': tuple(active_t.holdings),
+    }
+    logger.info(f"📋 [PRECLOSE] Tranche {active_idx} | {market_state} | Scale {scale:.0%} | "
+                f"Targets {list(weights)}")
+
+
+def _take_preclose_plan(context, current_dt, active_idx):
+    """取出当日收盘前预案 (预案当日有效，取出即作废)；与本次 Tranche 不符时返回 None"""
+    plan = getattr(context, 'preclose_plan', None)
+    if not isinstance(plan, dict) or plan.get('day') != current_dt.date():
+        return None
+    context.preclose_plan = None
+    if plan['active_idx'] != active_idx:
+        logger.warning(f"⚠️ [PRECLOSE] Plan was for Tranche {plan['active_idx']}, executing {active_idx}")
+        return None
+    return plan
+
+
+def _targets_from_plan(context, current_dt, active_t, plan):
+    """
+    有收盘前预案时的 EXEC_TIME 目标计算，结果与 calculate_target_holdings + get_ranking 完整流程一致：
+    信号分量只算一次，Meta-Gate 照常推进两次；排名签名、仓位与老持仓均与预案一致时直接沿用预案权重，
+    否则按当前排名重算
+
+    Returns:
+        (weights_map, rank_df, (scale, trend_scale, risk_scale))；排名无法计算时返回 None (走完整流程)
+    """
+    from core.logic import select_target_weights, calculate_position_scale
+
+    inputs = ranking_inputs(context, current_dt)
+    if inputs is None or inputs[1] is None:
+        return None
+    scores, z_score, rets, universe_z = inputs
+
+    # calculate_target_holdings 内部的 get_ranking 推进一次状态机
+    meta_gate_step(context, universe_z)
+    rank_df = rank_from_inputs(context, current_dt, scores, z_score, rets)
+    scale_info = calculate_position_scale(context, current_dt)
+    risk_model = context_risk_model(context, current_dt)
+    delta = plan_delta(plan, plan_signature(rank_df, risk_model), scale_info[0])
+    # SCORE 权重随今日评分变化；份数方案与风险类方案 (协方差不含今日行) 只取决于排名签名与老持仓
+    reusable = (not delta['changed'] and not plan['guard'] and config.WEIGHT_SCHEME != 'SCORE'
+                and plan['holdings'] == tuple(active_t.holdings))
+    if reusable:
+        logger.info("✅ [PRECLOSE] Plan confirmed at EXEC_TIME, reusing target weights")
+        weights_map = dict(plan['weights'])
+    else:
+        if delta['changed']:
+            logger.info(f"🔁 [PRECLOSE] Plan changed: +{delta['entered']} -{delta['exited']} "
+                        f"reordered={delta['reordered']} scale {delta['scale_from']:.0%}->{delta['scale_to']:.0%}")
+        if rank_df is None:
+            logger.warning(f"⚠️ [Logic] Ranking failed for {current_dt}")
+        weights_map = select_target_weights(rank_df, active_t, risk_model) if rank_df is not None else {}
+
+    # algo 随后为日报再次调用 get_ranking，状态机随之再推进一次 (保持一致)
+    meta_gate_step(context, universe_z)
+    return weights_map, rank_df, scale_info
+
+
 def algo(context):
-    """主调仓逻辑 - 每日定时执行"""
+    """主调仓逻辑 - 每日定时执行 (分阶段计时，超出 ALGO_BUDGET_SEC 时告警)"""
+    timer = _new_timer(context, 'algo', config.ALGO_BUDGET_SEC)
+    try:
+        _run_algo(context, timer)
+    finally:
+        context.signal_prep = None
+        _finish_timer(context, timer)
+
+
+def _run_algo(context, timer):
+    """algo 主体"""
     current_dt = context.now.replace(tzinfo=None)
     logger.info(f"--- 🏁 Algo Triggered at {current_dt} ---")
 
@@ -241,21 +459,15 @@ def algo(context):
         if not context.risk_controller.check_daily_loss(context):
             logger.warning(f"🧨 [ALGO] 触发每日亏损熔断，今日跳过交易")
             return
+        timer.lap('risk_check')
 
     # 注入实时行情 (Live)
     if context.mode == MODE_LIVE:
         logger.debug("💉 Injecting realtime ticks into prices_df...")
-        ticks = current(symbols=list(context.whitelist))
-        td = {t['symbol']: t['price'] for t in ticks if t['price'] > 0}
+        td = _today_prices(context, current_dt, timer)
         if td:
-            rows = pd.DataFrame(
-                [td], 
-                index=[current_dt.replace(hour=0, minute=0, second=0, microsecond=0)]
-            )
-            context.prices_df = pd.concat([
-                context.prices_df[~context.prices_df.index.isin(rows.index)], 
-                rows
-            ]).sort_index()
+            context.prices_df = _with_today_row(context.prices_df, td, current_dt)
+        timer.lap('inject_ticks')
 
     context.rpm.days_count += 1
     
@@ -338,6 +550,8 @@ def algo(context):
             else:
                 logger.error("❌ Cannot proceed: Exception and no state file")
                 return
+    timer.lap('account_init')
+
     # === 🛡️ 安全检查：确保价格数据切片正确 ===
     prices_slice = context.prices_df[context.prices_df.index <= current_dt]
 
@@ -346,29 +560,15 @@ def algo(context):
         logger.warning(f"⚠️ [ALGO] No price data available up to {current_dt}")
         return
 
-    # 生成价格映射，过滤NaN值
-    latest_prices = prices_slice.iloc[-1]
-    price_map = {}
-    missing_symbols = []
-
-    for sym in context.whitelist:
-        if sym in latest_prices.index:
-            price = latest_prices[sym]
-            if pd.notna(price) and price > 0:
-                price_map[sym] = price
-            else:
-                # 尝试使用前一日价格
-                if len(prices_slice) > 1:
-                    prev_price = prices_slice[sym].iloc[-2]
-                    if pd.notna(prev_price) and prev_price > 0:
-                        logger.warning(f"⚠️ {sym} 今日数据缺失，使用昨日价格 {prev_price:.3f}")
-                        price_map[sym] = prev_price
-                    else:
-                        missing_symbols.append(sym)
-                else:
-                    missing_symbols.append(sym)
-        else:
-            missing_symbols.append(sym)
+    # 生成价格映射 (向量化)：今日价格无效时回退昨日价格，否则计为缺失
+    from core.logic import resolve_prices, price_map_from, PRICE_PREV, PRICE_MISSING
+    symbols, prices, source = resolve_prices(prices_slice, context.whitelist)
+    price_map = price_map_from(symbols, prices, source)
+    fallback = source == PRICE_PREV
+    if fallback.any():
+        logger.warning(f"⚠️ {int(fallback.sum())} 个标的今日数据缺失，使用昨日价格: " + ", ".join(
+            f"{s} {p:.3f}" for s, p in zip(symbols[fallback][:10], prices[fallback][:10])))
+    missing_symbols = symbols[source == PRICE_MISSING].tolist()
 
     # 如果有缺失数据，发送警报
     if missing_symbols:
@@ -392,6 +592,7 @@ def algo(context):
                 t.sell(s, price_map.get(s, 0))
         else:
             t.guard_triggered_today = False
+    timer.lap('guard')
 
     # 2. 轮动调仓 (Soft Rotation) - logic delegated to core/logic.py
     active_idx = (context.rpm.days_count - 1) % config.REBALANCE_PERIOD_T
@@ -399,42 +600,57 @@ def algo(context):
     logger.info(f"🔄 Processing Tranche Index: {active_idx} (Day {context.rpm.days_count})")
 
     from core.logic import calculate_target_holdings, calculate_position_scale
-    
+
+    trace_ranking, trace_weights, trace_scale = [], {}, None
+    book_before = _tranche_book(active_t)   # 事前风控拦截时回滚用
+    plan = _take_preclose_plan(context, current_dt, active_idx)
     if not active_t.guard_triggered_today:
-        # A. 计算目标持仓权力重 (纯权重份数)
-        weights_map = calculate_target_holdings(context, current_dt, active_t, price_map)
-        
-        # B. 计算目标总仓位比例
-        scale, trend_scale, risk_scale = calculate_position_scale(context, current_dt)
+        targets = _targets_from_plan(context, current_dt, active_t, plan) if plan is not None else None
+        if targets is not None:
+            weights_map, rank_df, (scale, trend_scale, risk_scale) = targets
+        else:
+            # A. 计算目标持仓权力重 (纯权重份数)
+            weights_map = calculate_target_holdings(context, current_dt, active_t, price_map)
+
+            # B. 计算目标总仓位比例
+            scale, trend_scale, risk_scale = calculate_position_scale(context, current_dt)
         logger.info(f"🚦 Market State: {context.market_state} | Scale: {scale:.2%} (Trend:{trend_scale:.0%} * Risk:{risk_scale:.0%})")
         
         # C. 挂载给邮件报告使用
         context.today_weights = weights_map
         context.today_scale_info = {'scale': scale, 'trend_scale': trend_scale, 'risk_scale': risk_scale}
         try:
-            rank_df, _ = get_ranking(context, current_dt)
+            if targets is None:
+                rank_df, _ = get_ranking(context, current_dt)
             context.today_targets = rank_df.head(config.TOP_N + 2) if rank_df is not None else None
         except Exception:
             context.today_targets = None
+        if context.today_targets is not None:
+            trace_ranking = list(context.today_targets.index)
+        trace_weights, trace_scale = weights_map, scale
         
         final_list = list(weights_map.keys())
         total_w = sum(weights_map.values())
         
         if total_w > 0:
             unit_val = (active_t.total_value * 0.99 * scale) / total_w
+            liquidity = context_liquidity(context)
             for s, w in weights_map.items():
                 target_val = unit_val * w
                 current_val = active_t.holdings.get(s, 0) * price_map.get(s, 0)
                 diff_val = target_val - current_val
 
                 if diff_val > 0:
+                    capped = cap_buy_value(liquidity, s, current_dt, price_map.get(s, 0), diff_val)
+                    if capped < diff_val:
+                        logger.info(f"💧 [Tranche {active_idx}] {s} buy capped by ADV participation: "
+                                    f"{diff_val:,.0f} -> {capped:,.0f}")
+                        diff_val = capped
                     vol = None
                     if config.DYNAMIC_STOP_LOSS:
-                        hist = context.prices_df[context.prices_df.index <= current_dt]
-                        if s in hist.columns and len(hist) > config.ATR_LOOKBACK:
-                            daily_rets = hist[s].pct_change().dropna()
-                            if len(daily_rets) >= config.ATR_LOOKBACK:
-                                vol = daily_rets.tail(config.ATR_LOOKBACK).std()
+                        cache = getattr(context, 'vol_cache', None)
+                        vol = stop_volatility(context.prices_df, current_dt, s,
+                                              cache if isinstance(cache, VolatilityCache) else None)
                     active_t.buy(s, diff_val, price_map.get(s, 0), current_dt, vol)
                     logger.info(f"🛒 [Tranche {active_idx}] Buying {s} | W:{w} | Target Val: {target_val:,.0f}")
                 elif diff_val < -100:
@@ -446,6 +662,15 @@ def algo(context):
         logger.warning(f"⚠️ [ALGO] Ranking failed or guard triggered today. Tranche {active_idx} liquidation.")
         for s in list(active_t.holdings.keys()):
             active_t.sell(s, price_map.get(s, 0))
+    timer.lap('ranking')
+
+    # === 决策轨迹 (黄金基准逐日比对，未启用时跳过) ===
+    trace_recorder = getattr(context, 'trace_recorder', None)
+    if trace_recorder is not None:
+        trace_recorder.record(
+            current_dt, context.rpm.days_count, context.market_state, trace_scale,
+            trace_ranking, trace_weights, context.rpm.tranches
+        )
 
     # 3. 最终同步 (Order Execution)
     # === 仅同步当日活跃 Tranche 的持仓变动 ===
@@ -468,9 +693,11 @@ def algo(context):
 
     order_summary = []
     submitted_orders = []  # 记录提交的订单（用于验证）
+    planned_orders = []
+    positions = {p.symbol: p for p in acc.positions()}
 
     # A. 卖出多余持仓（仅卖出当日活跃 Tranche 需要卖出的标的）
-    for pos in acc.positions():
+    for pos in positions.values():
         target = tgt_qty.get(pos.symbol, 0)
         diff = pos.amount - target
         if diff > 0 and pos.available > 0:
@@ -486,22 +713,13 @@ def algo(context):
                 vol_to_sell = (int(min(diff, pos.available)) // 100) * 100
             
             if vol_to_sell > 0:
-                order = order_volume(
-                    symbol=pos.symbol,
-                    volume=vol_to_sell,
-                    side=OrderSide_Sell,
-                    order_type=OrderType_Market,
-                    position_effect=PositionEffect_Close,
-                    account=context.account_id if context.mode == MODE_LIVE else ""
-                )
-                order_summary.append(f"SELL {pos.symbol} {vol_to_sell}股")
-                submitted_orders.append({'order': order, 'symbol': pos.symbol, 'side': 'SELL'})
+                planned_orders.append({'symbol': pos.symbol, 'side': 'SELL', 'volume': vol_to_sell})
 
     # B. 买入目标仓位 — 仅限当日活跃 Tranche 的持仓 (禁用补仓)
     for sym, shares in active_tranche_holdings.items():
         if shares > 0:
             # 获取当前持仓
-            pos = next((p for p in acc.positions() if p.symbol == sym), None)
+            pos = positions.get(sym)
             current_amount = pos.amount if pos else 0
             
             # 计算该标的在所有 tranche 中的目标总量
@@ -513,37 +731,66 @@ def algo(context):
                 vol_to_buy = (int(diff) // 100) * 100
                 
                 if vol_to_buy > 0:
-                    order = order_volume(
-                        symbol=sym,
-                        volume=vol_to_buy,
-                        side=OrderSide_Buy,
-                        order_type=OrderType_Market,
-                        position_effect=PositionEffect_Open,
-                        account=context.account_id if context.mode == MODE_LIVE else ""
-                    )
-                    order_summary.append(f"BUY  {sym} {vol_to_buy}股")
-                    submitted_orders.append({'order': order, 'symbol': sym, 'side': 'BUY'})
+                    planned_orders.append({'symbol': sym, 'side': 'BUY', 'volume': vol_to_buy})
+
+    # 事前风控：整批订单一次检查，只提交通过的部分
+    risk = getattr(context, 'risk_controller', None)
+    if isinstance(risk, RiskController) and planned_orders:
+        gross = sum(p.amount * price_map.get(p.symbol, getattr(p, 'vwap', 0) or 0) for p in positions.values())
+        planned_orders, rejected_orders = risk.check_orders(
+            planned_orders, price_map, _last_close(prices_slice, current_dt),
+            nav=acc.cash.nav, cash=acc.cash.available, gross=gross)
+        if rejected_orders:
+            context.today_rejected_orders = rejected_orders
+            _undo_rejected(active_t, book_before, rejected_orders, price_map)
+            try:
+                context.wechat.send_text(f"🛡️ 事前风控拦截 {len(rejected_orders)} 笔订单\n" + "\n".join(
+                    f"- {o['side']} {o['symbol']} {o['volume']}股: {o['reason']}" for o in rejected_orders[:5]))
+            except Exception as e:
+                logger.warning(f"⚠️ 微信通知失败: {e}")
+    timer.lap('pre_trade')
+
+    for planned in planned_orders:
+        sym, side, volume = planned['symbol'], planned['side'], planned['volume']
+        order = order_volume(
+            symbol=sym,
+            volume=volume,
+            side=OrderSide_Sell if side == 'SELL' else OrderSide_Buy,
+            order_type=OrderType_Market,
+            position_effect=PositionEffect_Close if side == 'SELL' else PositionEffect_Open,
+            account=context.account_id if context.mode == MODE_LIVE else ""
+        )
+        order_summary.append(f"{side:<4} {sym} {volume}股")
+        submitted_orders.append({'order': order, 'symbol': sym, 'side': side})
     
     # C. 记录被跳过的补仓（仅日志，不执行）
     if context.mode == MODE_LIVE:
         skipped_symbols = set(tgt_qty.keys()) - set(active_tranche_holdings.keys())
         for sym in skipped_symbols:
             target_total = tgt_qty.get(sym, 0)
-            pos = next((p for p in acc.positions() if p.symbol == sym), None)
+            pos = positions.get(sym)
             current_amount = pos.amount if pos else 0
             gap = target_total - current_amount
             if gap > 0:
                 vol_gap = (int(gap) // 100) * 100
                 if vol_gap > 0:
                     logger.info(f"⏭️ [跳过补仓] {sym} | 虚拟目标: {target_total} | 实际: {current_amount} | 缺口: {vol_gap}")
+    timer.lap('orders')
 
     # === 订单成交验证（仅实盘） ===
     if context.mode == MODE_LIVE and submitted_orders:
         logger.info(f"📋 已提交 {len(submitted_orders)} 个订单，开始验证成交...")
+        timer.would_exceed(30, 'verify_orders')
         verification_result = verify_orders(context, submitted_orders, wait_seconds=30)
 
         if not verification_result['all_filled']:
             logger.warning(f"⚠️ 部分订单未成交，详见微信通知")
+        if isinstance(risk, RiskController):
+            risk.record_rejects(sum(1 for o in verification_result['failed_orders'] if o['status'] == '已拒绝'))
+        timer.lap('verify_orders')
+
+    # === 净值记录 (在线绩效累加，随状态一并保存) ===
+    context.rpm.record_nav(current_dt)
 
     # === 保存状态（关键步骤） ===
     try:
@@ -563,6 +810,17 @@ def algo(context):
             pass
         # 重新抛出异常，触发自动重启
         raise
+    timer.lap('save_state')
+
+    # === 每日状态快照 (失败不影响交易) ===
+    snapshot_store = getattr(context, 'snapshot_store', None)
+    if isinstance(snapshot_store, StateSnapshotStore):
+        try:
+            snap = snapshot_store.save(context.rpm, current_dt)
+            logger.info(f"🗂️ State snapshot {snap['day']}: {snap['new_blocks']}/{snap['tranches']} new blocks")
+        except Exception as e:
+            logger.warning(f"⚠️ State snapshot failed: {e}")
+        timer.lap('snapshot')
 
     # === 每日收盘汇报 (仅实盘) ===
     if context.mode == MODE_LIVE:
@@ -592,6 +850,18 @@ def algo(context):
                 context.today_scale_info = {'scale': s, 'trend_scale': ts, 'risk_scale': rs}
             except Exception:
                 context.today_scale_info = {'scale': 1.0, 'trend_scale': 1.0, 'risk_scale': 1.0}
+
+        # 持仓压力测试 (历史 VaR/ES、危机回放、基准冲击)
+        context.today_stress = None
+        if config.STRESS_ENABLED:
+            try:
+                context.today_stress = stress_test(context.rpm, prices_slice, getattr(context, 'benchmark_df', None),
+                                                   price_map=price_map)
+                for line in format_stress(context.today_stress):
+                    logger.info(f"🧯 [STRESS] {line}")
+            except Exception as e:
+                logger.warning(f"⚠️ 压力测试失败: {e}")
+            timer.lap('stress')
         
         # 实时微信简报
         if order_summary:
@@ -603,37 +873,127 @@ def algo(context):
         
         context.mailer.send_report(context)
         context.wechat.send_report(context)
+        timer.lap('notify')
 
         # === 持仓对账 (Reconciliation) ===
         try:
-            # 1. 获取双方持仓
             real_pos = {p.symbol: p.amount for p in context.account().positions()}
-            strat_pos = context.rpm.total_holdings
-            
-            # 2. 找差异 (忽略 <100 股的碎股差异)
-            diffs = []
-            all_syms = set(real_pos.keys()) | set(strat_pos.keys())
-            for s in all_syms:
-                r_qty = real_pos.get(s, 0)
-                s_qty = strat_pos.get(s, 0)
-                if abs(r_qty - s_qty) >= 100:
-                    diffs.append(f"{s}: 实{r_qty} vs 虚{s_qty}")
-            
-            # 3. 报警
-            if diffs:
-                logger.error(f"⚠️ 持仓对账不平: {diffs}")
-                context.wechat.send_text("⚠️ 持仓对账异常!\n" + "\n".join(diffs[:5]))
+            report = context.rpm.reconcile_with_broker(
+                real_pos, price_map=price_map, apply=config.RECONCILE_APPLY,
+                active_idx=active_idx, current_dt=current_dt)
+            lines = format_reconciliation(report)
+            if not report['balanced']:
+                action = "已修正虚拟账本" if report['applied'] else "仅告警"
+                logger.error(f"⚠️ 持仓对账不平 ({action}): {lines}")
+                context.wechat.send_text(f"⚠️ 持仓对账异常! ({action})\n" + "\n".join(lines))
+                if report['applied']:
+                    context.rpm.save_state()
             else:
-                logger.info("✅ 持仓对账平 ✅")
+                logger.info(f"✅ 持仓对账平 ✅ ({report['matched']} 只一致, 碎股 {len(report['odd_lot'])})")
         except Exception as e:
             logger.warning(f"对账检查出错: {e}")
+        timer.lap('reconcile')
 
 
 def on_bar(context, bars):
-    """盘中高频止损监控"""
+    """盘中高频止损监控 (计时，超出 ON_BAR_BUDGET_SEC 时告警)"""
     if context.mode == MODE_BACKTEST:
         return
-    
+
+    timer = _new_timer(context, 'on_bar', config.ON_BAR_BUDGET_SEC)
+    try:
+        recorder = getattr(context, 'bar_recorder', None)
+        if recorder is not None:
+            recorder.record(bars)   # 仅入队，落盘在后台线程
+            timer.lap('record')
+        buffer = getattr(context, 'bar_buffer', None)
+        if buffer is not None:
+            buffer.update(bars)
+            timer.lap('buffer')
+        risk = getattr(context, 'risk_controller', None)
+        if isinstance(risk, RiskController):
+            risk.on_bar(context, bars)   # NAV 缓存盯市 + 熔断检查，不查询账户
+            timer.lap('risk')
+        mtm = getattr(context, 'intraday_mtm', None)
+        if isinstance(mtm, IntradayMarkToMarket):
+            bar_dt = context.now.replace(tzinfo=None)
+            for event in mtm.update(context.rpm.tranches, bars, bar_dt, ref_prices=lambda: _ref_prices(context)):
+                _on_mtm_event(context, event)
+            timer.lap('mtm')
+        _check_bar_stops(context, bars)
+        timer.lap('scan')
+    finally:
+        _finish_timer(context, timer, verbose=False)
+
+
+def _tranche_book(tranche):
+    """Tranche 账本副本 (现金、持仓、持仓记录)"""
+    return {'cash': tranche.cash, 'holdings': dict(tranche.holdings),
+            'pos_records': {s: dict(r) for s, r in tranche.pos_records.items()}}
+
+
+def _undo_rejected(tranche, before, rejected, price_map):
+    """
+    事前风控拦截的标的回滚到调仓前：持仓与记录恢复，现金按调仓价反向调整
+    (当日调仓对同一标的的买卖均按 price_map 成交，回滚后与券商一致)
+    """
+    for sym in dict.fromkeys(o['symbol'] for o in rejected):
+        delta = tranche.holdings.get(sym, 0) - before['holdings'].get(sym, 0)
+        if not delta:
+            continue
+        tranche.cash += delta * price_map.get(sym, 0)
+        if sym in before['holdings']:
+            tranche.holdings[sym] = before['holdings'][sym]
+        else:
+            tranche.holdings.pop(sym, None)
+        if sym in before['pos_records']:
+            tranche.pos_records[sym] = dict(before['pos_records'][sym])
+        else:
+            tranche.pos_records.pop(sym, None)
+        logger.warning(f"↩️ [Tranche {tranche.id}] {sym} rejected by pre-trade check, reverted {delta:+d} shares")
+    tranche.update_value(price_map)
+
+
+def _last_close(prices_slice, current_dt):
+    """事前风控价格带基准：今日行之前最近一行收盘价"""
+    if prices_slice.index[-1].date() == current_dt.date() and len(prices_slice) > 1:
+        row = prices_slice.iloc[-2]
+    else:
+        row = prices_slice.iloc[-1]
+    return row.dropna().to_dict()
+
+
+def _ref_prices(context):
+    """盯市参考价：prices_df 最新一行 (昨收，algo 后为今日注入价)"""
+    prices_df = getattr(context, 'prices_df', None)
+    if prices_df is None or prices_df.empty:
+        return {}
+    return prices_df.iloc[-1].dropna().to_dict()
+
+
+def _on_mtm_event(context, event):
+    """盘中盯市告警 / 熔断"""
+    msg = (f"{event['reason']} | 组合 {event['value']:,.0f} "
+           f"(日内 {event['day_return']:+.2%}, 回撤 {event['drawdown']:.2%})")
+    if event['level'] == 'halt':
+        logger.error(f"🧨 [on_bar] 盘中熔断: {msg}")
+        risk = getattr(context, 'risk_controller', None)
+        if isinstance(risk, RiskController):
+            risk.halt(f"Intraday {event['reason']}")
+        text = f"🧨 盘中熔断，今日停止开仓\n{msg}"
+    else:
+        logger.warning(f"📉 [on_bar] 盘中回撤告警: {msg}")
+        text = f"📉 盘中回撤告警\n{msg}"
+    wechat = getattr(context, 'wechat', None)
+    if wechat is not None:
+        try:
+            wechat.send_text(text)
+        except Exception as e:
+            logger.warning(f"⚠️ 盘中告警发送失败: {e}")
+
+
+def _check_bar_stops(context, bars):
+    """逐 bar 检查持仓止损/移动止盈"""
     bar_dt = context.now.replace(tzinfo=None)
     for bar in bars:
         for t in context.rpm.tranches:
@@ -676,6 +1036,20 @@ def on_bar(context, bars):
                         # 因为订单已提交，下次启动会重新同步
 
 
+def on_account_status(context, account_status):
+    """账户状态推送：NAV 缓存失效，下次风控检查时重新同步"""
+    risk = getattr(context, 'risk_controller', None)
+    if isinstance(risk, RiskController):
+        risk.on_account_status(context, account_status)
+
+
+def on_execution_report(context, execrpt):
+    """成交回报：增量更新风控 NAV 缓存"""
+    risk = getattr(context, 'risk_controller', None)
+    if isinstance(risk, RiskController):
+        risk.on_execution_report(context, execrpt)
+
+
 def on_backtest_finished(context, indicator):
     """回测结束报告"""
     dsl_status = (
@@ -690,3 +1064,8 @@ def on_backtest_finished(context, indicator):
     logger.info(f"📉 MaxDD: {indicator.get('max_drawdown', 0)*100:.2f}%")
     logger.info(f"💎 Sharpe: {indicator.get('sharp_ratio', 0):.2f}")
     logger.info("=" * 60)
+
+    trace_recorder = getattr(context, 'trace_recorder', None)
+    if trace_recorder is not None:
+        trace_recorder.close()
+        logger.info(f"🧬 Decision trace saved: {trace_recorder.path} ({trace_recorder.days} days)")
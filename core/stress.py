@@ -0,0 +1,123 @@
+"""
+持仓压力测试 (情景矩阵一次相乘)
+- 历史模拟: 持仓标的最近 STRESS_WINDOW 日收益矩阵 R (情景 × 标的) 与持仓市值矩阵 H (Tranche × 标的)
+  相乘得到各情景下组合与各 Tranche 的盈亏，取 VaR / ES
+- 危机回放: MACRO_BENCHMARK 历史最差 STRESS_WORST_DAYS 日，当日全部标的收益作用于当前持仓
+- 基准冲击: 各标的对基准的 beta × 冲击幅度 (如创业板 -8%)
+
+情景数只影响矩阵行数，数千情景在毫秒级完成。
+"""
+import numpy as np
+import pandas as pd
+
+from config import config
+from .reconcile import holdings_matrix
+
+
+def _returns(prices):
+    """价格 -> 日收益矩阵 (首行丢弃，缺失或非正价格处收益记 0)"""
+    arr = np.asarray(prices, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ret = arr[1:] / arr[:-1] - 1
+    return np.where(np.isfinite(ret), ret, 0.0)
+
+
+def _var_es(pnl, confidence):
+    """各列盈亏 -> (VaR, ES)，均以正数表示损失"""
+    cutoff = np.quantile(pnl, 1 - confidence, axis=0)
+    tail = pnl <= cutoff
+    es = (pnl * tail).sum(axis=0) / np.maximum(tail.sum(axis=0), 1)
+    return np.maximum(-cutoff, 0.0), np.maximum(-es, 0.0)
+
+
+def stress_test(rpm, prices_df, benchmark=None, price_map=None, confidence=None, window=None,
+                worst_days=None, shocks=None):
+    """
+    当前持仓的压力测试
+
+    Args:
+        rpm: RollingPortfolioManager (读取各 Tranche 持仓)
+        prices_df: 日收盘价 (日期 × 标的)
+        benchmark: MACRO_BENCHMARK 收盘价 Series (缺失时跳过危机回放与基准冲击)
+        price_map: {symbol: 估值价}，默认 prices_df 最新一行
+        confidence / window / worst_days / shocks: 默认 STRESS_CONFIDENCE / STRESS_WINDOW /
+            STRESS_WORST_DAYS / STRESS_SHOCKS
+    Returns:
+        dict: {'value': 组合总值, 'exposure': 持仓市值, 'scenarios': 历史情景数,
+               'var', 'es', 'var_pct', 'es_pct', 'tranche_var': [各 Tranche VaR],
+               'crashes': DataFrame [benchmark_ret, pnl, pnl_pct] (按基准跌幅排序),
+               'shocks': DataFrame [shock, pnl, pnl_pct]}；无持仓或历史不足时返回 None
+    """
+    confidence = config.STRESS_CONFIDENCE if confidence is None else confidence
+    window = window or config.STRESS_WINDOW
+    worst_days = config.STRESS_WORST_DAYS if worst_days is None else worst_days
+    shocks = config.STRESS_SHOCKS if shocks is None else shocks
+
+    tranches = rpm.tranches
+    symbols = sorted({s for t in tranches for s in t.holdings} & set(prices_df.columns))
+    if not symbols or len(prices_df) < 3:
+        return None
+    hist = prices_df[symbols].iloc[-(window + 1):]
+    last = hist.ffill().iloc[-1]
+    prices = np.array([(price_map or {}).get(s, last[s]) for s in symbols], dtype=float)
+    prices = np.where(np.isfinite(prices), prices, 0.0)
+
+    held_value = holdings_matrix(tranches, symbols) * prices   # Tranche × 标的 市值
+    exposure = held_value.sum(axis=0)
+    value = float(sum(t.cash for t in tranches) + exposure.sum())
+
+    returns = _returns(hist.to_numpy())
+    pnl = returns @ held_value.T                     # 情景 × Tranche
+    total_pnl = pnl.sum(axis=1)
+    var, es = _var_es(total_pnl[:, None], confidence)
+    tranche_var, _ = _var_es(pnl, confidence)
+    result = {
+        'value': value, 'exposure': float(exposure.sum()), 'scenarios': len(returns),
+        'confidence': confidence, 'var': float(var[0]), 'es': float(es[0]),
+        'var_pct': float(var[0]) / value if value > 0 else 0.0,
+        'es_pct': float(es[0]) / value if value > 0 else 0.0,
+        'tranche_var': tranche_var.tolist(),
+        'crashes': pd.DataFrame(columns=['benchmark_ret', 'pnl', 'pnl_pct']),
+        'shocks': pd.DataFrame(columns=['shock', 'pnl', 'pnl_pct']),
+    }
+
+    if benchmark is None or len(benchmark) < 3:
+        return result
+    # 危机回放：全部历史 (不限窗口) 中基准最差的若干日
+    full = prices_df[symbols]
+    bm = benchmark.reindex(full.index).ffill()
+    bm_ret = _returns(bm.to_numpy())
+    all_ret = _returns(full.to_numpy())
+    worst = np.argsort(bm_ret, kind='stable')[:worst_days]
+    worst = worst[bm_ret[worst] < 0]
+    crash_pnl = all_ret[worst] @ exposure
+    result['crashes'] = pd.DataFrame(
+        {'benchmark_ret': bm_ret[worst], 'pnl': crash_pnl, 'pnl_pct': crash_pnl / value if value > 0 else 0.0},
+        index=full.index[1:][worst])
+
+    # 基准冲击：窗口内 beta
+    win_bm = bm_ret[-len(returns):]
+    var_bm = win_bm.var()
+    if var_bm > 0 and len(shocks):
+        beta = ((returns - returns.mean(axis=0)) * (win_bm - win_bm.mean())[:, None]).mean(axis=0) / var_bm
+        shock = np.asarray(shocks, dtype=float)
+        shock_pnl = np.outer(shock, beta) @ exposure
+        result['shocks'] = pd.DataFrame({'shock': shock, 'pnl': shock_pnl,
+                                         'pnl_pct': shock_pnl / value if value > 0 else 0.0})
+    return result
+
+
+def format_stress(result, crashes=3):
+    """压力测试结果 -> 日报文本行 (无结果时为空)"""
+    if not isinstance(result, dict):
+        return []
+    lines = [f"VaR{result['confidence']:.0%}: {result['var_pct']:.2%} (¥{result['var']:,.0f}) | "
+             f"ES: {result['es_pct']:.2%} | 情景 {result['scenarios']}"]
+    if len(result['shocks']):
+        lines.append("基准冲击: " + ", ".join(f"{r.shock:+.0%} -> {r.pnl_pct:+.2%}"
+                                              for r in result['shocks'].itertuples()))
+    if len(result['crashes']):
+        top = result['crashes'].head(crashes)
+        lines.append("危机回放: " + ", ".join(f"{d:%Y-%m-%d} ({r.benchmark_ret:+.1%}) -> {r.pnl_pct:+.2%}"
+                                              for d, r in zip(top.index, top.itertuples())))
+    return lines
@@ -0,0 +1,227 @@
+"""
+决策轨迹模块 (Golden Trace)
+- DecisionTraceWriter: 逐日记录排名/权重/仓位/状态/份额持仓到紧凑二进制文件
+- iter_trace: 流式读取轨迹文件
+- compare_traces: 流式比对两份轨迹，遇到首个分歧日即停止
+
+文件格式 (小端):
+    头部: magic(8s) | version(u2) | sym_width(u1)
+    记录: body_len(u4) | body
+    body: date(i4, YYYYMMDD) | days_count(u4) | market_state(u1) | scale(f8)
+          | n_rank(u2) | rank[S16 * n]
+          | n_weight(u2) | weights[(S16, f8) * n]
+          | n_hold(u2) | holdings[(u2, S16, i8) * n]
+"""
+import os
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+from config import logger
+
+TRACE_MAGIC = b'ETFTRACE'
+TRACE_VERSION = 2   # v2: 权重由 f4 改为 f8 (比例权重逐位可比)
+SYM_WIDTH = 16
+
+_HEADER = struct.Struct('<8sHB')
+_LEN = struct.Struct('<I')
+_DAY = struct.Struct('<iIBd')
+_COUNT = struct.Struct('<H')
+
+_RANK_DTYPE = np.dtype(f'S{SYM_WIDTH}')
+_WEIGHT_DTYPE = np.dtype([('sym', f'S{SYM_WIDTH}'), ('w', '<f8')])
+_HOLD_DTYPE = np.dtype([('tid', '<u2'), ('sym', f'S{SYM_WIDTH}'), ('qty', '<i8')])
+
+_STATE_CODES = {'SAFE': 0, 'CAUTION': 1, 'DANGER': 2}
+_STATE_NAMES = {v: k for k, v in _STATE_CODES.items()}
+
+TraceDay = namedtuple('TraceDay', ['date', 'days_count', 'market_state', 'scale',
+                                   'ranking', 'weights', 'holdings'])
+
+
+class TraceDivergence(Exception):
+    """与黄金轨迹出现分歧（用于回测中途快速失败）"""
+
+    def __init__(self, date, field, expected, actual):
+        self.date = date
+        self.field = field
+        self.expected = expected
+        self.actual = actual
+        super().__init__(f"Trace diverged at {date} on '{field}': expected={expected}, actual={actual}")
+
+
+def _encode_day(current_dt, days_count, market_state, scale, ranking, weights, tranches):
+    """将单日决策编码为二进制记录体"""
+    date_int = current_dt.year * 10000 + current_dt.month * 100 + current_dt.day
+    state_code = _STATE_CODES.get(market_state, 255)
+    scale = float('nan') if scale is None else float(scale)
+
+    rank_arr = np.array([s.encode('ascii') for s in ranking], dtype=_RANK_DTYPE)
+
+    w_items = sorted(weights.items())
+    w_arr = np.empty(len(w_items), dtype=_WEIGHT_DTYPE)
+    for i, (sym, w) in enumerate(w_items):
+        w_arr[i] = (sym.encode('ascii'), w)
+
+    h_items = sorted(
+        (t.id, sym, qty) for t in tranches for sym, qty in t.holdings.items()
+    )
+    h_arr = np.empty(len(h_items), dtype=_HOLD_DTYPE)
+    for i, (tid, sym, qty) in enumerate(h_items):
+        h_arr[i] = (tid, sym.encode('ascii'), int(qty))
+
+    return b''.join([
+        _DAY.pack(date_int, days_count, state_code, scale),
+        _COUNT.pack(len(rank_arr)), rank_arr.tobytes(),
+        _COUNT.pack(len(w_arr)), w_arr.tobytes(),
+        _COUNT.pack(len(h_arr)), h_arr.tobytes(),
+    ])
+
+
+def _decode_day(body):
+    """将二进制记录体解码为 TraceDay"""
+    date_int, days_count, state_code, scale = _DAY.unpack_from(body, 0)
+    offset = _DAY.size
+    arrays = []
+    for dtype in (_RANK_DTYPE, _WEIGHT_DTYPE, _HOLD_DTYPE):
+        (n,) = _COUNT.unpack_from(body, offset)
+        offset += _COUNT.size
+        arrays.append(np.frombuffer(body, dtype=dtype, count=n, offset=offset))
+        offset += n * dtype.itemsize
+    rank_arr, w_arr, h_arr = arrays
+    return TraceDay(
+        date=date_int,
+        days_count=days_count,
+        market_state=_STATE_NAMES.get(state_code, 'UNKNOWN'),
+        scale=scale,
+        ranking=[s.decode('ascii') for s in rank_arr],
+        weights={s.decode('ascii'): float(w) for s, w in zip(w_arr['sym'], w_arr['w'])},
+        holdings={(int(t), s.decode('ascii')): int(q)
+                  for t, s, q in zip(h_arr['tid'], h_arr['sym'], h_arr['qty'])},
+    )
+
+
+def _iter_bodies(path):
+    """流式读取原始记录体"""
+    with open(path, 'rb') as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return
+        magic, version, sym_width = _HEADER.unpack(header)
+        if magic != TRACE_MAGIC or version != TRACE_VERSION or sym_width != SYM_WIDTH:
+            raise ValueError(f"Unsupported trace file: {path} (magic={magic}, version={version})")
+        while True:
+            raw_len = f.read(_LEN.size)
+            if len(raw_len) < _LEN.size:
+                return
+            (n,) = _LEN.unpack(raw_len)
+            body = f.read(n)
+            if len(body) < n:
+                logger.warning(f"⚠️ Truncated trace record in {path}")
+                return
+            yield body
+
+
+def iter_trace(path):
+    """流式读取轨迹文件，逐日产出 TraceDay"""
+    for body in _iter_bodies(path):
+        yield _decode_day(body)
+
+
+def _first_diff(a, b):
+    """返回两条 TraceDay 中第一个不一致的字段"""
+    for field in TraceDay._fields:
+        va, vb = getattr(a, field), getattr(b, field)
+        if field == 'scale':
+            if np.isnan(va) and np.isnan(vb):
+                continue
+            if va != vb:
+                return field, va, vb
+        elif va != vb:
+            return field, va, vb
+    return None
+
+
+def compare_traces(path_a, path_b):
+    """
+    流式比对两份轨迹，在首个分歧日停止
+
+    Returns:
+        dict: {'identical': bool, 'days': 已比对天数, 'first_divergence': None 或
+               {'date', 'field', 'expected', 'actual'}}
+    """
+    days = 0
+    it_a, it_b = _iter_bodies(path_a), _iter_bodies(path_b)
+    while True:
+        body_a = next(it_a, None)
+        body_b = next(it_b, None)
+        if body_a is None and body_b is None:
+            return {'identical': True, 'days': days, 'first_divergence': None}
+        if body_a is None or body_b is None:
+            longer = _decode_day(body_a if body_b is None else body_b)
+            return {
+                'identical': False,
+                'days': days,
+                'first_divergence': {
+                    'date': longer.date, 'field': 'length',
+                    'expected': 'present' if body_a is not None else 'missing',
+                    'actual': 'present' if body_b is not None else 'missing',
+                },
+            }
+        days += 1
+        # 快速路径：字节完全一致则无需解码
+        if body_a == body_b:
+            continue
+        day_a, day_b = _decode_day(body_a), _decode_day(body_b)
+        diff = _first_diff(day_a, day_b) or ('raw', None, None)
+        return {
+            'identical': False,
+            'days': days,
+            'first_divergence': {
+                'date': day_a.date, 'field': diff[0],
+                'expected': diff[1], 'actual': diff[2],
+            },
+        }
+
+
+class DecisionTraceWriter:
+    """
+    决策轨迹记录器
+
+    若提供 golden_path，则每写入一天即与黄金轨迹同一天比对，
+    出现分歧立即抛出 TraceDivergence，实现回测快速失败。
+    """
+
+    def __init__(self, path, golden_path=None):
+        self.path = path
+        self.days = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._f = open(path, 'wb')
+        self._f.write(_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, SYM_WIDTH))
+        self._golden = _iter_bodies(golden_path) if golden_path else None
+
+    def record(self, current_dt, days_count, market_state, scale, ranking, weights, tranches):
+        """写入单日决策，并在启用黄金比对时校验"""
+        body = _encode_day(current_dt, days_count, market_state, scale, ranking, weights, tranches)
+        self._f.write(_LEN.pack(len(body)))
+        self._f.write(body)
+        self.days += 1
+
+        if self._golden is not None:
+            expected = next(self._golden, None)
+            if expected is None:
+                self._golden = None
+                logger.warning(f"⚠️ [TRACE] Golden trace ended before {current_dt.date()}, comparison stopped")
+            elif expected != body:
+                self.close()
+                day_e, day_a = _decode_day(expected), _decode_day(body)
+                field, v_e, v_a = _first_diff(day_e, day_a) or ('raw', None, None)
+                logger.error(f"🚨 [TRACE] Divergence at {day_a.date} on '{field}'")
+                raise TraceDivergence(day_a.date, field, v_e, v_a)
+
+    def close(self):
+        """刷盘并关闭文件"""
+        if not self._f.closed:
+            self._f.flush()
+            self._f.close()
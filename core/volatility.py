@@ -0,0 +1,138 @@
+"""
+滚动波动率缓存
+- VolatilityCache: 日收益率与滚动标准差矩阵 (行=日期, 列=标的)，按数据版本计算一次
+  - stop: ATR_LOOKBACK 日波动率 (动态止损，需满窗口)
+  - ruler: 60 日波动率 (get_ranking 的 Z-Score 波动率尺，滞后 5 日)
+- sync: prices_df 仅末尾若干行变化时 (实盘注入/替换今日行) 只重算受影响的行
+- stop_volatility: 动态止损波动率 (有缓存读缓存，否则按原逐标的切片计算)
+- true_range_atr: 基于最高/最低价的真实波幅 ATR (需 high/low 数据，当前加载器仅取收盘价)
+
+收益率与 hist.pct_change() 一致 (先前向填充再相除)，滚动标准差 ddof=1、跳过 NaN。
+"""
+import numpy as np
+import pandas as pd
+
+from config import config
+
+RULER_WINDOW = 60
+RULER_LAG = 5
+
+
+def first_changed_row(old_index, old_columns, old_values, index, columns, values):
+    """
+    新数据与已缓存数据相比第一处变化的行号 (数据版本比对)
+    完全相同时返回行数；列不同或无缓存时返回 0
+    """
+    if old_values is None or not columns.equals(old_columns):
+        return 0
+    k = min(len(values), len(old_values))
+    same = np.asarray(index[:k] == old_index[:k])
+    old, new = old_values[:k], values[:k]
+    same &= ((old == new) | (np.isnan(old) & np.isnan(new))).all(axis=1)
+    changed = np.flatnonzero(~same)
+    return int(changed[0]) if len(changed) else k
+
+
+class VolatilityCache:
+    """
+    Args:
+        windows: {名称: (窗口, 最少有效样本)}，默认 stop=(ATR_LOOKBACK, ATR_LOOKBACK)、ruler=(60, 2)
+    """
+
+    def __init__(self, windows=None):
+        self.windows = dict(windows) if windows else {
+            'stop': (config.ATR_LOOKBACK, config.ATR_LOOKBACK),
+            'ruler': (RULER_WINDOW, 2),
+        }
+        self._span = max(w for w, _ in self.windows.values())
+        self.index = None
+        self.columns = None
+        self._values = None
+        self._filled = None
+        self.vol = {}
+        self.recomputed = 0
+
+    # ------------------------------------------------------------------
+    # 数据版本同步
+    # ------------------------------------------------------------------
+    def sync(self, prices_df):
+        """使缓存与 prices_df 一致；返回 self 便于链式调用"""
+        values = prices_df.to_numpy(dtype=float)
+        n = len(values)
+        m = first_changed_row(self.index, self.columns, self._values, prices_df.index, prices_df.columns, values)
+        if m == n and self._values is not None and n == len(self._values):
+            return self
+
+        # 只需重算第 m 行及之后：窗口最早回溯到 m - span，前向填充以其前一行为种子
+        start = max(0, m - self._span)
+        block = values[start:]
+        if start > 0:
+            block = np.vstack([self._filled[start - 1:start], block])
+        filled = pd.DataFrame(block).ffill()
+        rets = filled.pct_change()
+        if start > 0:
+            filled, rets = filled.iloc[1:], rets.iloc[1:]
+        offset = m - start
+
+        self._filled = np.vstack([self._filled[:start], filled.to_numpy()]) if start > 0 else filled.to_numpy()
+        for name, (window, min_periods) in self.windows.items():
+            rolled = rets.rolling(window, min_periods=min_periods).std().to_numpy()[offset:]
+            self.vol[name] = np.vstack([self.vol[name][:m], rolled]) if m > 0 else rolled
+
+        self.index, self.columns = prices_df.index, prices_df.columns
+        self._values = values.copy()
+        self.recomputed += n - m
+        return self
+
+    # ------------------------------------------------------------------
+    # 查询 (dt 对应 index <= dt 的最后一行)
+    # ------------------------------------------------------------------
+    def row(self, dt):
+        return int(self.index.searchsorted(dt, side='right')) - 1
+
+    def at(self, name, dt, lag=0):
+        """dt 时点 (向前滞后 lag 行) 的滚动波动率 Series"""
+        pos = self.row(dt) - lag
+        if pos < 0:
+            return pd.Series(np.nan, index=self.columns)
+        return pd.Series(self.vol[name][pos], index=self.columns)
+
+    def ruler(self, dt):
+        """get_ranking 的波动率尺 (与 signal._vol_ruler 一致)"""
+        return self.at('ruler', dt, lag=RULER_LAG).replace(0, 0.01).clip(lower=0.005)
+
+    def stop_vol(self, symbol, dt):
+        """动态止损波动率，样本不足返回 None"""
+        if symbol not in self.columns:
+            return None
+        pos = self.row(dt)
+        if pos < 0:
+            return None
+        vol = self.vol['stop'][pos, self.columns.get_loc(symbol)]
+        return None if np.isnan(vol) else float(vol)
+
+
+def stop_volatility(prices_df, current_dt, symbol, cache=None):
+    """动态止损所需的 ATR_LOOKBACK 日波动率 (algo 与本地回测共用)"""
+    if cache is not None:
+        return cache.sync(prices_df).stop_vol(symbol, current_dt)
+    hist = prices_df[prices_df.index <= current_dt]
+    if symbol in hist.columns and len(hist) > config.ATR_LOOKBACK:
+        daily_rets = hist[symbol].pct_change().dropna()
+        if len(daily_rets) >= config.ATR_LOOKBACK:
+            return daily_rets.tail(config.ATR_LOOKBACK).std()
+    return None
+
+
+def true_range_atr(high, low, close, window=None):
+    """
+    真实波幅 ATR (相对收盘价的比例)
+    TR = max(高-低, |高-昨收|, |低-昨收|)，取 window 日简单均值后除以收盘价
+
+    Args:
+        high / low / close: 同形状的价格矩阵 (行=日期, 列=标的)
+    """
+    window = window or config.ATR_LOOKBACK
+    prev = close.shift(1)
+    tr = np.fmax(high - low, np.fmax((high - prev).abs(), (low - prev).abs()))
+    return tr.rolling(window, min_periods=window).mean() / close
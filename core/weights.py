@@ -0,0 +1,259 @@
+"""
+权重方案
+- EQUAL / CHAMPION: 整数份数 (1:1:1:1 / 3:1:1:1)，由 logic.select_target_weights 直接给出
+- INV_VOL: 反波动率加权 (w ∝ 1/σ)
+- ERC: 等风险贡献 (风险平价)，循环坐标下降求解，名单只有几只时为微秒级
+- SCORE: 按评分比例加权，单只上限 MAX_WEIGHT (超出部分按比例分给其余标的)
+
+风险类方案所需的协方差来自 RollingCovariance：白名单日收益率的滚动协方差/相关系数，
+逐日增量加入新收益行、移出窗口外旧行 (O(N²)/日)，每满一个窗口整表重算一次以消除累计误差。
+决策日只使用此前已完成交易日的收益 (与今日注入的盘中价格无关)。
+同一模型也供 logic.dedupe_correlated 做相关性去重 (CORR_DEDUPE)。
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+from config import config, logger
+from .volatility import first_changed_row
+
+UNIT_SCHEMES = ('EQUAL', 'CHAMPION')
+RISK_SCHEMES = ('INV_VOL', 'ERC')
+SCHEME_DESC = {
+    'EQUAL': '等权 (1:1:1:1)',
+    'CHAMPION': '冠军加权 (3:1:1:1)',
+    'INV_VOL': '反波动率加权',
+    'ERC': '风险平价 (等风险贡献)',
+    'SCORE': f'评分加权 (单只上限 {config.MAX_WEIGHT:.0%})',
+}
+
+
+class RollingCovariance:
+    """
+    白名单日收益率的滚动协方差 / 相关系数
+    (成对有效样本，与 DataFrame.cov(min_periods) / DataFrame.corr(min_periods) 一致)
+
+    Args:
+        window: 窗口 (交易日)，默认 COV_WINDOW
+        min_periods: 成对有效样本下限，默认 COV_MIN_PERIODS
+    """
+
+    def __init__(self, window=None, min_periods=None):
+        self.window = window or config.COV_WINDOW
+        self.min_periods = min_periods or config.COV_MIN_PERIODS
+        self.index = None
+        self.columns = None
+        self._values = None
+        self._col = {}
+        self.added = 0
+
+    # ------------------------------------------------------------------
+    # 累加量维护
+    # ------------------------------------------------------------------
+    def _reset(self, rets):
+        """以最近 window 行收益率整表重建累加量"""
+        n = rets.shape[1]
+        self._ring = np.full((self.window, n), np.nan)
+        tail = rets[-self.window:]
+        self._ring[:len(tail)] = tail
+        self._head = len(tail) % self.window
+        self._count = len(tail)
+        self._since_reset = 0
+        x = np.nan_to_num(tail)
+        m = (~np.isnan(tail)).astype(float)
+        self._xx = x.T @ x       # Σ x_i x_j
+        self._xm = x.T @ m       # Σ x_i (j 有效)
+        self._x2m = (x * x).T @ m   # Σ x_i² (j 有效)
+        self._mm = m.T @ m       # 成对有效样本数
+
+    def _push(self, ret):
+        if self._count == self.window:
+            old = self._ring[self._head]
+            x, m = np.nan_to_num(old), (~np.isnan(old)).astype(float)
+            self._xx -= np.outer(x, x)
+            self._xm -= np.outer(x, m)
+            self._x2m -= np.outer(x * x, m)
+            self._mm -= np.outer(m, m)
+        else:
+            self._count += 1
+        self._ring[self._head] = ret
+        self._head = (self._head + 1) % self.window
+        x, m = np.nan_to_num(ret), (~np.isnan(ret)).astype(float)
+        self._xx += np.outer(x, x)
+        self._xm += np.outer(x, m)
+        self._x2m += np.outer(x * x, m)
+        self._mm += np.outer(m, m)
+        self._since_reset += 1
+        self.added += 1
+        if self._since_reset >= self.window:
+            self._reset(self._ordered_ring())
+
+    def _ordered_ring(self):
+        if self._count < self.window:
+            return self._ring[:self._count]
+        return np.roll(self._ring, -self._head, axis=0)
+
+    # ------------------------------------------------------------------
+    # 数据版本同步
+    # ------------------------------------------------------------------
+    def sync(self, prices_df, dt):
+        """同步到 dt 所在交易日之前的已完成交易日；仅追加新行时增量更新；返回 self"""
+        stable = prices_df[prices_df.index < pd.Timestamp(dt).normalize()]
+        values = stable.to_numpy(dtype=float)
+        n = len(values)
+        m = first_changed_row(self.index, self.columns, self._values, stable.index, stable.columns, values)
+        old_n = len(self._values) if self._values is not None else -1
+        if m == n == old_n:
+            return self
+
+        if m == old_n and m > 0:
+            last = self._last_filled
+            for row in values[m:]:
+                filled = np.where(np.isnan(row), last, row)
+                self._push(filled / last - 1)
+                last = filled
+        else:
+            filled_df = pd.DataFrame(values).ffill()
+            rets = filled_df.pct_change().to_numpy()
+            self._reset(rets)
+            last = filled_df.to_numpy()[-1] if n else np.full(values.shape[1], np.nan)
+            self.added += len(rets)
+        self._last_filled = last
+
+        self.index, self.columns = stable.index, stable.columns
+        self._col = {s: i for i, s in enumerate(stable.columns)}
+        self._values = values.copy()
+        return self
+
+    def indexer(self, symbols):
+        """标的 -> 列号 (不在白名单为 -1)"""
+        return np.fromiter((self._col.get(s, -1) for s in symbols), dtype=np.int64, count=len(symbols))
+
+    def _pair_stats(self, ri, ci, corr=False):
+        """
+        行列号 (可广播) 对应的成对协方差或相关系数，样本不足或列号无效处为 NaN
+        corr=True 时方差同样按成对有效样本计算
+        """
+        valid = (ri >= 0) & (ci >= 0)
+        if self._values is None:
+            return np.full(valid.shape, np.nan)
+        r, c = np.clip(ri, 0, None), np.clip(ci, 0, None)
+        mm = self._mm[r, c]
+        xm_rc, xm_cr = self._xm[r, c], self._xm[c, r]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out = (self._xx[r, c] - xm_rc * xm_cr / mm) / (mm - 1)
+            if corr:
+                var_r = (self._x2m[r, c] - xm_rc * xm_rc / mm) / (mm - 1)
+                var_c = (self._x2m[c, r] - xm_cr * xm_cr / mm) / (mm - 1)
+                out = out / np.sqrt(var_r * var_c)
+        return np.where(valid & (mm >= self.min_periods), out, np.nan)
+
+    def cov(self, symbols):
+        """symbols 的协方差子矩阵 (ndarray)，样本不足的元素为 NaN"""
+        idx = self.indexer(symbols)
+        return self._pair_stats(idx[:, None], idx[None, :])
+
+    def corr(self, symbols, others=None):
+        """symbols × others 的相关系数矩阵 (ndarray)，others 默认同 symbols"""
+        rows = self.indexer(symbols)
+        cols = rows if others is None else self.indexer(others)
+        return self._pair_stats(rows[:, None], cols[None, :], corr=True)
+
+    def corr_row(self, i, cols):
+        """单个列号 i 与列号数组 cols 的相关系数 (去重热路径，免去标的查找)"""
+        return self._pair_stats(np.full(len(cols), i), cols, corr=True)
+
+
+# ----------------------------------------------------------------------
+# 权重求解
+# ----------------------------------------------------------------------
+def inverse_vol_weights(cov):
+    vol = np.sqrt(np.diag(cov))
+    w = 1.0 / vol
+    return w / w.sum()
+
+
+def erc_weights(cov, tol=1e-10, max_iter=500):
+    """
+    等风险贡献权重: x_i (Σx)_i 相等
+    循环坐标下降 (min ½x'Σx - Σ log x_i / n)，每个坐标闭式求解一元二次方程；
+    名单很短，用 Python 浮点运算避免 NumPy 小数组开销
+    """
+    s = [list(map(float, row)) for row in cov]
+    n = len(s)
+    b = 1.0 / n
+    x = [1.0 / math.sqrt(s[i][i]) for i in range(n)]
+    for _ in range(max_iter):
+        delta = 0.0
+        for i in range(n):
+            row = s[i]
+            c = sum(row[j] * x[j] for j in range(n) if j != i)
+            xi = (-c + math.sqrt(c * c + 4.0 * row[i] * b)) / (2.0 * row[i])
+            delta = max(delta, abs(xi - x[i]) / xi)
+            x[i] = xi
+        if delta < tol:
+            break
+    total = sum(x)
+    return np.asarray([v / total for v in x])
+
+
+def capped_score_weights(scores, cap=None):
+    """按评分比例加权，单只不超过 cap (超出部分按比例分给其余标的)；评分均非正或上限不可行时等权"""
+    cap = config.MAX_WEIGHT if cap is None else cap
+    raw = np.clip(np.asarray(scores, dtype=float), 0, None)
+    n = len(raw)
+    if n == 0 or not np.isfinite(raw).all() or raw.sum() <= 0 or cap * n < 1:
+        return np.full(n, 1.0 / n) if n else raw
+    w = raw / raw.sum()
+    fixed = np.zeros(n, dtype=bool)
+    while (w > cap + 1e-12).any():
+        fixed |= w > cap + 1e-12
+        rest = raw[~fixed]
+        remaining = 1.0 - cap * fixed.sum()
+        w = np.where(fixed, cap, 0.0)
+        if rest.sum() > 0:
+            w[~fixed] = rest / rest.sum() * remaining
+        else:
+            w[~fixed] = remaining / (~fixed).sum()
+    return w
+
+
+def scheme_weights(weights, rank_df, risk_model=None, scheme=None):
+    """
+    将 select_target_weights 的整数份数换算为指定方案的权重 (键顺序不变)
+    风险类方案缺少协方差 (未提供模型或样本不足) 时回退为等权份数
+    """
+    scheme = scheme or config.WEIGHT_SCHEME
+    symbols = list(weights)
+    if scheme in UNIT_SCHEMES or not symbols:
+        return weights
+    if scheme == 'SCORE':
+        w = capped_score_weights(rank_df['score'].reindex(symbols).to_numpy())
+        return dict(zip(symbols, w.tolist()))
+    if scheme not in RISK_SCHEMES:
+        logger.warning(f"⚠️ Unknown WEIGHT_SCHEME {scheme}, using unit weights")
+        return weights
+
+    cov = risk_model.cov(symbols) if risk_model is not None else None
+    if cov is None or not np.isfinite(np.diag(cov)).all() or (np.diag(cov) <= 0).any():
+        logger.warning(f"⚠️ [{scheme}] Covariance unavailable for {symbols}, falling back to equal weights")
+        return {s: 1 for s in symbols}
+    cov = np.where(np.isfinite(cov), cov, 0.0)   # 成对样本不足视为不相关
+    w = inverse_vol_weights(cov) if scheme == 'INV_VOL' else erc_weights(cov)
+    return dict(zip(symbols, w.tolist()))
+
+
+def needs_risk_model():
+    """风险类权重方案或相关性去重需要协方差模型"""
+    return config.WEIGHT_SCHEME in RISK_SCHEMES or config.CORR_DEDUPE
+
+
+def context_risk_model(context, current_dt):
+    """需要时 (needs_risk_model) 同步并返回 context.cov_model，否则返回 None"""
+    if not needs_risk_model():
+        return None
+    model = getattr(context, 'cov_model', None)
+    if not isinstance(model, RollingCovariance):
+        return None
+    return model.sync(context.prices_df, current_dt)
@@ -16,11 +16,19 @@ import msvcrt
 from datetime import datetime, timedelta
 from gm.api import run, set_token, set_account_id, MODE_LIVE, ADJUST_PREV, subscribe, schedule
 from config import config, logger, validate_env
-from core.strategy import algo, on_bar, on_backtest_finished
+from core.strategy import algo, preclose, on_bar, on_account_status, on_execution_report, on_backtest_finished
 from core.portfolio import RollingPortfolioManager
 from core.risk import RiskController
 from core.notify import EnterpriseWeChat, EmailNotifier
 from core.account import get_account
+from core.trace import DecisionTraceWriter
+from core.bar_recorder import BarRecorder
+from core.snapshots import StateSnapshotStore
+from core.bar_buffer import IntradayBarBuffer
+from core.volatility import VolatilityCache
+from core.liquidity import LiquidityCache
+from core.weights import RollingCovariance, SCHEME_DESC
+from core.mtm import IntradayMarkToMarket
 
 import pandas as pd
 
@@ -35,6 +43,7 @@ _heartbeat_stop_event = threading.Event()
 # 全局状态管理对象（用于信号处理器）
 _global_rpm = None
 _global_wechat = None
+_global_bar_recorder = None
 _shutdown_requested = False
 
 def _heartbeat_loop():
@@ -133,6 +142,13 @@ def _graceful_shutdown(signum, frame):
                 logger.error(f"❌ 状态保存失败: {save_err}")
                 logger.warning("⚠️ 退出时状态未保存，重启后将从上次成功保存的状态恢复")
 
+        # 2.5 写出盘中 bar 录制缓冲
+        if _global_bar_recorder:
+            try:
+                _global_bar_recorder.close()
+            except Exception as e:
+                logger.warning(f"⚠️ Bar 录制关闭失败: {e}")
+
         # 3. 发送通知（如果可用）
         if _global_wechat:
             try:
@@ -159,19 +175,21 @@ def _load_gateway_data(context):
     预加载行情数据 (实盘必备)
     """
     from gm.api import history
-    # 预加载 400 天数据以计算长周期均线/RSI
-    start_dt = (datetime.now() - timedelta(days=400)).strftime('%Y-%m-%d %H:%M:%S')
-    end_dt = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    # 预加载 400 天数据以计算长周期均线/RSI (以策略时钟为准，离线回放时为模拟时间)
+    now = context.now.replace(tzinfo=None)
+    start_dt = (now - timedelta(days=400)).strftime('%Y-%m-%d %H:%M:%S')
+    end_dt = now.strftime('%Y-%m-%d %H:%M:%S')
     sym_str = ",".join(context.whitelist)
     
     logger.info(f"⏳ Pre-loading market data for {len(context.whitelist)} symbols...")
     
     hd = history(
         symbol=sym_str, frequency='1d', start_time=start_dt, end_time=end_dt,
-        fields='symbol,close,eob', fill_missing='last', adjust=ADJUST_PREV, df=True
+        fields='symbol,close,volume,eob', fill_missing='last', adjust=ADJUST_PREV, df=True
     )
     hd['eob'] = pd.to_datetime(hd['eob']).dt.tz_localize(None)
     context.prices_df = hd.pivot(index='eob', columns='symbol', values='close').ffill()
+    context.volumes_df = hd.pivot(index='eob', columns='symbol', values='volume')
     
     # 加载基准数据用于 Regime 计算
     bm_data = history(
@@ -201,11 +219,24 @@ def init(context):
     context.risk_controller = RiskController()
     context.wechat = EnterpriseWeChat()
     context.mailer = EmailNotifier()
+    if config.TRACE_FILE:
+        context.trace_recorder = DecisionTraceWriter(config.TRACE_FILE, config.TRACE_GOLDEN_FILE or None)
+        logger.info(f"🧬 Decision trace enabled: {config.TRACE_FILE}")
+    context.bar_recorder = BarRecorder() if config.BAR_RECORD_ENABLED else None
+    context.snapshot_store = StateSnapshotStore() if config.SNAPSHOT_ENABLED else None
+    context.bar_buffer = IntradayBarBuffer(context.whitelist)
+    context.vol_cache = VolatilityCache()
+    context.liquidity = LiquidityCache()
+    context.cov_model = RollingCovariance()
+    context.intraday_mtm = IntradayMarkToMarket() if config.INTRADAY_MTM else None
+    if context.bar_recorder:
+        logger.info(f"📼 Bar recording enabled: {config.BAR_ARCHIVE_DIR}")
 
     # 2.5. 保存全局引用（用于信号处理器）
-    global _global_rpm, _global_wechat
+    global _global_rpm, _global_wechat, _global_bar_recorder
     _global_rpm = context.rpm
     _global_wechat = context.wechat
+    _global_bar_recorder = context.bar_recorder
     
     # 3. 初始参数
     context.mode = MODE_LIVE
@@ -222,6 +253,7 @@ def init(context):
         logger.info(f"🔍 Verifying account access: {context.account_id}")
         test_acc = get_account(context)
         if test_acc:
+            context.risk_controller.refresh_nav(context, test_acc)   # 预热 NAV 缓存
             nav = test_acc.cash.nav if hasattr(test_acc, 'cash') and hasattr(test_acc.cash, 'nav') else 0.0
             cash_available = test_acc.cash.available if hasattr(test_acc, 'cash') and hasattr(test_acc.cash, 'available') else 0.0
             logger.info(f"✅ Account verified: {context.account_id[-8:]} | NAV: {nav:,.2f} | Available: {cash_available:,.2f}")
@@ -256,6 +288,9 @@ def init(context):
     else:
         schedule(schedule_func=algo, date_rule='1d', time_rule=config.EXEC_TIME)
         logger.info(f"⏰ Scheduled execution at {config.EXEC_TIME}")
+        if config.PRECLOSE_TIME:
+            schedule(schedule_func=preclose, date_rule='1d', time_rule=config.PRECLOSE_TIME)
+            logger.info(f"⏰ Scheduled pre-close plan at {config.PRECLOSE_TIME}")
     
     # 7. 回测/实盘参数逻辑初始化
     
@@ -353,7 +388,7 @@ def run_strategy_safe():
                 pass
 
 if __name__ == '__main__':
-    weight_label = "等权 (1:1:1:1)" if config.WEIGHT_SCHEME == 'EQUAL' else "冠军加权 (3:1:1:1)"
+    weight_label = SCHEME_DESC.get(config.WEIGHT_SCHEME, SCHEME_DESC['CHAMPION'])
     print("=" * 50)
     print(f"  ETF 量化交易策略 - {weight_label}")
     print("=" * 50)
@@ -25,6 +25,9 @@ from config import config
 from core.portfolio import RollingPortfolioManager
 from core.risk import RiskController
 from core.strategy import algo
+from core.volatility import VolatilityCache
+from core.liquidity import LiquidityCache
+from core.weights import RollingCovariance
 from notifiers.email import EmailNotifier
 from notifiers.wechat import WechatNotifier
 
@@ -50,6 +53,9 @@ def init(context):
     context.risk_safe = RiskController()
     context.mailer = EmailNotifier()
     context.wechat = WechatNotifier()
+    context.vol_cache = VolatilityCache()
+    context.liquidity = LiquidityCache()   # 启用 OPT_LIQUIDITY=1 时基于 volumes_df 生效
+    context.cov_model = RollingCovariance()   # WEIGHT_SCHEME=INV_VOL/ERC 时使用
     
     # 风险状态机
     context.market_state = 'SAFE'
@@ -0,0 +1,76 @@
+"""
+热点路径性能基准入口
+在合成行情 (50 / 500 / 5000 个标的) 上计时 get_ranking、get_market_regime、
+calculate_target_holdings、Tranche 估值与止损、on_bar 与完整 algo，结果写入 JSON，
+可与基线 JSON 对比并在性能回退时以非零状态码退出 (便于 CI 使用)。
+
+用法:
+    python run_benchmarks.py                                   # 运行并与 baseline.json 对比 (如存在)
+    python run_benchmarks.py --sizes 50 500 --repeats 10
+    python run_benchmarks.py --update-baseline                 # 将本次结果设为基线
+    python run_benchmarks.py --baseline output/benchmarks/bench_abc123.json --threshold 1.2
+"""
+import os
+import sys
+import json
+import argparse
+
+from config import config, logger
+from benchmarks.hot_paths import CASES, DEFAULT_SIZES, run_benchmarks, compare_results
+
+OUTPUT_DIR = os.path.join(config.OUTPUT_DIR, "benchmarks")
+BASELINE_FILE = os.path.join(OUTPUT_DIR, "baseline.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark strategy hot paths on synthetic universes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Universe sizes')
+    parser.add_argument('--days', type=int, default=400, help='Trading days of synthetic history')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed repeats per case')
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=None, help='Subset of cases')
+    parser.add_argument('--out', type=str, default=None, help='Result JSON path')
+    parser.add_argument('--baseline', type=str, default=BASELINE_FILE, help='Baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=None, help='Override regression ratio for all cases')
+    parser.add_argument('--update-baseline', action='store_true', help='Save this run as the baseline')
+    args = parser.parse_args()
+
+    result = run_benchmarks(args.sizes, args.days, args.repeats, args.cases)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    out_path = args.out or os.path.join(OUTPUT_DIR, f"bench_{result['meta']['commit'] or 'local'}.json")
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    logger.info(f"📝 Benchmark results saved: {out_path}")
+
+    if args.update_baseline:
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        logger.info(f"📌 Baseline updated: {BASELINE_FILE}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        logger.info(f"ℹ️ No baseline at {args.baseline}, skipping comparison")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    rows = compare_results(baseline, result, args.threshold)
+
+    print("\n" + "=" * 80)
+    print(f"⏱️ 性能对比 (基线: {baseline['meta'].get('commit', '?')} -> 当前: {result['meta']['commit']})")
+    print("=" * 80)
+    for r in rows:
+        flag = "❌ REGRESSED" if r['regressed'] else "✅"
+        print(f"{r['case']:<26} N={r['size']:<5} {r['baseline_ms']:9.2f} -> {r['current_ms']:9.2f} ms "
+              f"(x{r['ratio']:.2f}) {flag}")
+
+    regressed = [r for r in rows if r['regressed']]
+    if regressed:
+        logger.error(f"❌ {len(regressed)} benchmark regression(s) detected")
+        return 1
+    logger.info("✅ No benchmark regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
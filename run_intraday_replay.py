@@ -0,0 +1,110 @@
+"""
+分钟级止损回放入口
+在本地回测引擎上对比两种止损口径 (同一信号缓存、同一参数)：
+1. daily    : 仅 algo 决策时点按日止损 (掘金回测口径，on_bar 在回测中直接返回)
+2. intraday : 另按 on_bar 规则逐分钟止损 (实盘口径)
+
+分钟数据来源:
+    recorded   BarRecorder 录制归档 (BAR_ARCHIVE_DIR)，缺失的交易日仅按日止损
+    simulated  由日线生成的对数布朗桥分钟路径 (sim.engine.SimMarket)
+
+用法:
+    python run_intraday_replay.py --start 2025-01-01 --end 2025-12-31 --minutes recorded
+    python run_intraday_replay.py --synthetic 120 --days 250 --trailing-drops 0.02,0.03,0.05
+"""
+import os
+import sys
+import time
+import argparse
+
+import pandas as pd
+
+from config import config, logger
+from core.backtest import SignalCache, run_local_backtest, load_universe, load_market_data
+from core.intraday import RecordedBars, stop_outcomes, summarize_stops
+from sim import make_synthetic_market
+from sim.engine import SimMarket
+
+OUTPUT_DIR = os.path.join(config.OUTPUT_DIR, "intraday_replay")
+
+
+def _scenario_row(mode, trailing_drop, result):
+    stops = summarize_stops(stop_outcomes(result['trades']))
+    return {
+        'mode': mode,
+        'trailing_drop': trailing_drop,
+        'return': result['summary']['return'],
+        'max_dd': result['summary']['max_dd'],
+        'sharpe': result['summary']['sharpe'],
+        'stops': stops['count'],
+        'stop_avg_ret': stops['avg_ret'],
+        'stop_win_rate': stops['win_rate'],
+        'stop_vs_close': stops['avg_vs_close'],
+        'minute_days': result['minute_days'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay on_bar stop logic on minute bars vs daily-close stops')
+    parser.add_argument('--start', type=str, default=config.START_DATE, help='Start Date')
+    parser.add_argument('--end', type=str, default=config.END_DATE, help='End Date')
+    parser.add_argument('--minutes', choices=['recorded', 'simulated'], default='recorded',
+                        help='Minute bar source')
+    parser.add_argument('--bars-dir', type=str, default=config.BAR_ARCHIVE_DIR, help='Recorded bar archive')
+    parser.add_argument('--synthetic', type=int, default=None, help='Use N synthetic symbols (simulated minutes)')
+    parser.add_argument('--days', type=int, default=250, help='Replay days for --synthetic')
+    parser.add_argument('--trailing-drops', type=str, default=str(config.TRAILING_DROP),
+                        help='Comma separated OPT_TRAILING_DROP values')
+    parser.add_argument('--seed', type=int, default=0, help='Synthetic data / minute path seed')
+    args = parser.parse_args()
+
+    if args.synthetic:
+        synthetic = make_synthetic_market(args.synthetic, n_days=args.days + 260, seed=args.seed)
+        prices_df, benchmark_df = synthetic.prices_df, synthetic.benchmark_df
+        whitelist, theme_map = synthetic.whitelist, synthetic.theme_map
+        start, end = prices_df.index[-args.days], prices_df.index[-1]
+        minute_bars = SimMarket.from_synthetic(synthetic, seed=args.seed)
+    else:
+        whitelist, theme_map, _ = load_universe()
+        data_start = pd.Timestamp(args.start) - pd.Timedelta(days=400)
+        prices_df, benchmark_df = load_market_data(whitelist, data_start, args.end)
+        start, end = args.start, args.end
+        if args.minutes == 'recorded':
+            minute_bars = RecordedBars(args.bars_dir)
+        else:
+            minute_bars = SimMarket(prices_df, benchmark_df, seed=args.seed)
+
+    cache = SignalCache(prices_df, benchmark_df, whitelist, theme_map)
+    start = max(pd.Timestamp(start), pd.Timestamp(cache.first_signal_dt))
+
+    rows, details = [], []
+    for drop in [float(x) for x in args.trailing_drops.split(',') if x.strip()]:
+        params = {'OPT_TRAILING_DROP': drop}
+        daily = run_local_backtest(cache, start=start, end=end, params=params)
+        t0 = time.perf_counter()
+        intraday = run_local_backtest(cache, start=start, end=end, params=params, minute_bars=minute_bars)
+        logger.info(f"⏱️ Intraday replay (TRAILING_DROP={drop}): {len(intraday['nav'])} days "
+                    f"in {time.perf_counter() - t0:.1f}s")
+        for mode, result in (('daily', daily), ('intraday', intraday)):
+            rows.append(_scenario_row(mode, drop, result))
+            outcomes = stop_outcomes(result['trades'])
+            outcomes.insert(0, 'mode', mode)
+            outcomes.insert(1, 'trailing_drop', drop)
+            details.append(outcomes)
+
+    report = pd.DataFrame(rows)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    report.to_csv(os.path.join(OUTPUT_DIR, "summary.csv"), index=False)
+    pd.concat(details, ignore_index=True).to_csv(os.path.join(OUTPUT_DIR, "stops.csv"), index=False)
+
+    print("\n" + "=" * 80)
+    print("⚡ 盘中止损 vs 按日止损")
+    print("=" * 80)
+    print(report.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    if not args.synthetic and args.minutes == 'recorded' and report['minute_days'].max() == 0:
+        print(f"\n⚠️ {args.bars_dir} 中没有区间内的录制数据，intraday 结果等同按日止损")
+    print(f"\n结果已保存: {OUTPUT_DIR}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+离线回放入口 (无需掘金终端)
+以 sim.gm_api 替身加载 main.py，按模拟时钟逐日回放 init -> on_bar -> algo，
+通知只记录不发送，状态文件与时延指标写入独立目录。
+
+数据来源:
+    --data <pkl>     core.backtest.load_market_data 写入的行情缓存 (真实录制数据)
+    --synthetic N    N 个标的的合成行情 (同时生成对应白名单)
+
+用法:
+    python run_offline.py --data data_cache/market_20210101_20260123_120.pkl --start 2025-12-01 --end 2025-12-31
+    python run_offline.py --synthetic 60 --days 10
+"""
+import os
+import sys
+import argparse
+
+import pandas as pd
+
+from config import config, logger
+from sim import gm_api, make_synthetic_market
+from sim.engine import GMSimulator, SimMarket
+
+OUTPUT_DIR = os.path.join(config.OUTPUT_DIR, "offline")
+
+
+def _write_whitelist(market, path):
+    """为合成行情生成与 ETF合并筛选结果.xlsx 同列名的白名单"""
+    df = pd.DataFrame({
+        'symbol': sorted(market.whitelist),
+        'sec_name': sorted(market.whitelist),
+        'name_cleaned': [market.theme_map[s] for s in sorted(market.whitelist)],
+    })
+    df.to_excel(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay main.py offline against a simulated GM API')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--data', type=str, help='Market data cache (.pkl) from load_market_data')
+    source.add_argument('--synthetic', type=int, help='Number of synthetic symbols')
+    parser.add_argument('--start', type=str, default=None, help='First replay day')
+    parser.add_argument('--end', type=str, default=None, help='Last replay day')
+    parser.add_argument('--days', type=int, default=5, help='Replay the last N days when --start is omitted')
+    parser.add_argument('--cash', type=float, default=1000000, help='Initial Cash')
+    parser.add_argument('--seed', type=int, default=0, help='Synthetic data / minute path seed')
+    parser.add_argument('--workdir', type=str, default=OUTPUT_DIR, help='State / metrics directory')
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    if args.data:
+        market = SimMarket.from_cache(args.data, seed=args.seed)
+    else:
+        synthetic = make_synthetic_market(args.synthetic, n_days=320, seed=args.seed)
+        config.WHITELIST_FILE = os.path.join(args.workdir, 'synthetic_whitelist.xlsx')
+        _write_whitelist(synthetic, config.WHITELIST_FILE)
+        market = SimMarket.from_synthetic(synthetic, seed=args.seed)
+
+    days = market.trading_days
+    start = args.start or days[-min(args.days, len(days))]
+    end = args.end or days[-1]
+
+    sim = GMSimulator(market, cash=args.cash, account_id=config.ACCOUNT_ID)
+    gm_api.install(sim)
+    try:
+        import main as strategy_main
+        context = sim.run(strategy_main, start, end, workdir=args.workdir)
+    finally:
+        gm_api.uninstall()
+
+    nav = pd.DataFrame(sim.nav_history).set_index('dt')['nav']
+    nav.to_csv(os.path.join(args.workdir, "nav.csv"))
+    pd.DataFrame(sim.broker.orders).to_csv(os.path.join(args.workdir, "orders.csv"), index=False)
+
+    print("\n" + "=" * 80)
+    print(f"🧪 离线回放完成: {len(nav)} 天 | 订单 {len(sim.broker.orders)} 笔 | 通知 {len(sim.messages)} 条")
+    print(f"期末净值: {nav.iloc[-1]:,.2f} | 策略 Day {context.rpm.days_count}")
+    print(f"结果已保存: {args.workdir}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
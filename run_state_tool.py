@@ -0,0 +1,103 @@
+"""
+状态文件工具 (JSON <-> 二进制，无损互转；每日快照回溯与比对)
+读取时按文件头自动识别格式并执行模式迁移 (core/state_codec.py)，快照见 core/snapshots.py。
+
+用法:
+    python run_state_tool.py info rolling_state_main.bin
+    python run_state_tool.py export rolling_state_main.bin rolling_state_main.json     # 二进制 -> JSON
+    python run_state_tool.py import rolling_state_main.json rolling_state_main.bin     # JSON -> 二进制
+    python run_state_tool.py import rolling_state_main_champion.json --in-place        # 同名 .bin
+    python run_state_tool.py snapshots                                                 # 列出快照日期
+    python run_state_tool.py restore 2026-01-20 restored_state.json                     # 回溯到某日
+    python run_state_tool.py diff 2026-01-19 2026-01-20                                 # 两日账本差异
+"""
+import os
+import sys
+import argparse
+
+import pandas as pd
+
+from config import config, logger
+from core.state_codec import read_state, dump_state
+from core.snapshots import StateSnapshotStore
+
+
+def _write(dst, state, fmt):
+    temp_path = dst + '.tmp'
+    with open(temp_path, 'wb') as f:
+        dump_state(f, state, fmt)
+    os.replace(temp_path, dst)
+
+
+def _convert(src, dst, fmt):
+    state, src_fmt = read_state(src)
+    _write(dst, state, fmt)
+    logger.info(f"💾 {src} ({src_fmt}, {os.path.getsize(src)} B) -> {dst} ({fmt}, {os.path.getsize(dst)} B)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect and convert rolling state files (JSON <-> binary)')
+    sub = parser.add_subparsers(dest='command', required=True)
+    info = sub.add_parser('info', help='Show format, schema and tranche summary')
+    info.add_argument('src')
+    for name, help_text in (('export', 'Convert to JSON'), ('import', 'Convert to binary')):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument('src')
+        p.add_argument('dst', nargs='?', default=None)
+        p.add_argument('--in-place', action='store_true', help='Write next to src with .json / .bin suffix')
+    sub.add_parser('snapshots', help='List daily snapshot dates')
+    restore = sub.add_parser('restore', help='Write the state as of DATE from snapshots')
+    restore.add_argument('date')
+    restore.add_argument('dst')
+    restore.add_argument('--format', choices=['json', 'binary'], default='json')
+    diff = sub.add_parser('diff', help='Diff tranche books between two snapshot dates')
+    diff.add_argument('date_a')
+    diff.add_argument('date_b')
+    for p in (sub.choices['snapshots'], restore, diff):
+        p.add_argument('--store', default=config.SNAPSHOT_DIR, help='Snapshot directory')
+    args = parser.parse_args()
+
+    if args.command == 'snapshots':
+        days = StateSnapshotStore(args.store).days()
+        print('\n'.join(days) if days else 'no snapshots')
+        return 0
+    if args.command == 'restore':
+        state = StateSnapshotStore(args.store).state_as_of(args.date)
+        if state is None:
+            logger.error(f"❌ No snapshot on or before {args.date}")
+            return 1
+        snap_day = state.pop('date')
+        _write(args.dst, state, args.format)
+        logger.info(f"⏪ Restored snapshot {snap_day} -> {args.dst} ({args.format})")
+        return 0
+    if args.command == 'diff':
+        store = StateSnapshotStore(args.store)
+        day_a, day_b = store.resolve(args.date_a), store.resolve(args.date_b)
+        changes = store.diff(args.date_a, args.date_b)
+        print(f"snapshots {day_a} -> {day_b}: {len(changes)} changes")
+        if len(changes):
+            with pd.option_context('display.max_rows', None, 'display.width', 200):
+                print(changes.to_string(index=False))
+        return 0
+
+    if args.command == 'info':
+        state, fmt = read_state(args.src)
+        tranches = state.get('tranches', [])
+        print(f"format={fmt} schema={state.get('schema')} days_count={state.get('days_count')} "
+              f"tranches={len(tranches)} positions={sum(len(t.get('holdings', {})) for t in tranches)}")
+        return 0
+
+    fmt = 'json' if args.command == 'export' else 'binary'
+    dst = args.dst
+    if dst is None:
+        if not args.in_place:
+            parser.error('dst is required unless --in-place is given')
+        dst = os.path.splitext(args.src)[0] + ('.json' if fmt == 'json' else '.bin')
+    if os.path.abspath(dst) == os.path.abspath(args.src):
+        parser.error('dst must differ from src')
+    _convert(args.src, dst, fmt)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
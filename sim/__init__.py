@@ -0,0 +1,3 @@
+# Simulation module (离线合成行情 / 本地仿真)
+from .synthetic import SyntheticMarket, make_synthetic_market
+from .engine import GMSimulator, SimMarket, SimBroker, SimClock, SimNotifier
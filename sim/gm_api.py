@@ -0,0 +1,209 @@
+"""
+离线 gm.api 替身
+模块级函数与常量与掘金 gm.api 同名，全部委托给当前激活的 GMSimulator。
+
+用法:
+    from sim import gm_api
+    from sim.engine import GMSimulator, SimMarket
+    sim = GMSimulator(SimMarket.from_cache(path))
+    gm_api.install(sim)
+    import main
+    sim.run(main, start='2025-06-02', end='2025-06-30')
+    gm_api.uninstall()
+"""
+import os
+import sys
+import types
+
+import pandas as pd
+
+from config import config
+
+from .engine import (
+    Record, MODE_LIVE, MODE_BACKTEST,
+    OrderSide_Buy, OrderSide_Sell, OrderType_Limit, OrderType_Market,
+    PositionEffect_Open, PositionEffect_Close, PositionSide_Long, PositionSide_Short,
+    OrderStatus_New, OrderStatus_PartFilled, OrderStatus_Filled,
+    OrderStatus_Canceled, OrderStatus_Rejected, ExecType_Trade, State_CONNECTED,
+)
+
+ADJUST_NONE, ADJUST_PREV, ADJUST_POST = 0, 1, 2
+
+_SIM = None
+_SAVED_MODULES = None
+_REBOUND = []   # [(module, name, original)]
+
+
+def install(simulator):
+    """
+    激活模拟器并将本模块注册为 sys.modules['gm.api']
+
+    已经导入的项目模块 (如 core.strategy) 中通过 `from gm.api import xxx` 绑定的名字
+    会被一并替换为本模块的同名对象，uninstall() 时恢复。
+    """
+    global _SIM, _SAVED_MODULES
+    _SIM = simulator
+    this = sys.modules[__name__]
+    if _SAVED_MODULES is None:
+        _SAVED_MODULES = {name: sys.modules.get(name) for name in ('gm', 'gm.api')}
+        old_api = _SAVED_MODULES['gm.api']
+        if old_api is not None and old_api is not this:
+            _rebind(old_api, this)
+    package = types.ModuleType('gm')
+    package.__path__ = []
+    package.api = this
+    sys.modules['gm'] = package
+    sys.modules['gm.api'] = this
+    return simulator
+
+
+def _rebind(old_api, new_api):
+    """替换项目模块中已绑定的旧 gm.api 对象"""
+    base = os.path.abspath(config.BASE_DIR)
+    names = [n for n in dir(new_api) if not n.startswith('_') and hasattr(old_api, n)]
+    for module in list(sys.modules.values()):
+        path = getattr(module, '__file__', None)
+        if not path or module is new_api or not os.path.abspath(path).startswith(base):
+            continue
+        namespace = vars(module)
+        for name in names:
+            if name in namespace and namespace[name] is getattr(old_api, name):
+                _REBOUND.append((module, name, namespace[name]))
+                setattr(module, name, getattr(new_api, name))
+
+
+def uninstall():
+    """恢复安装前的 gm / gm.api 模块及被替换的名字"""
+    global _SIM, _SAVED_MODULES
+    for module, name, original in reversed(_REBOUND):
+        setattr(module, name, original)
+    _REBOUND.clear()
+    if _SAVED_MODULES is not None:
+        for name, module in _SAVED_MODULES.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+    _SIM, _SAVED_MODULES = None, None
+
+
+def _active():
+    if _SIM is None:
+        raise RuntimeError("No GMSimulator installed (call sim.gm_api.install first)")
+    return _SIM
+
+
+def _symbols(symbol):
+    if isinstance(symbol, str):
+        return [s.strip() for s in symbol.split(',') if s.strip()]
+    return list(symbol or [])
+
+
+# === 连接与注册 ===
+def set_token(token):
+    _active().token = token
+
+
+def set_account_id(account_id):
+    _active().broker.account_id = account_id
+
+
+def subscribe(symbols, frequency='1d', count=1, unsubscribe_previous=False, **kwargs):
+    _active().subscribe(symbols, frequency)
+
+
+def schedule(schedule_func, date_rule='1d', time_rule='09:31:00'):
+    _active().schedule(schedule_func, date_rule, time_rule)
+
+
+def run(strategy_id='', filename='main.py', mode=MODE_LIVE, token='',
+        backtest_start_time=None, backtest_end_time=None, **kwargs):
+    """对齐掘金 run：加载策略文件并回放 (区间缺省为行情最后一个交易日)"""
+    sim = _active()
+    sim.token = token
+    sim.run(filename, backtest_start_time, backtest_end_time, mode=mode)
+
+
+# === 行情 ===
+def history(symbol, frequency, start_time, end_time, fields=None, skip_suspended=True,
+            fill_missing=None, adjust=ADJUST_PREV, adjust_end_time='', df=False):
+    """日线 ('1d') 或当日分钟线 ('60s')，仅返回模拟时钟之前已完成的 bar"""
+    sim = _active()
+    syms = _symbols(symbol)
+    if frequency == '1d':
+        data = sim.market.daily_history(syms, start_time, end_time, sim.clock.now)
+    else:
+        data = sim.market.minute_history(syms, start_time, end_time, sim.clock.now)
+    if fields:
+        data = data[[f.strip() for f in fields.split(',') if f.strip() in data.columns]]
+    if df:
+        return data
+    return [Record(r) for r in data.to_dict('records')]
+
+
+def current(symbols, fields=''):
+    """最新价快照 (开盘前为前收)"""
+    sim = _active()
+    prices = sim.market.prices_at(sim.clock.now)
+    now = pd.Timestamp(sim.clock.now)
+    ticks = []
+    for s in _symbols(symbols):
+        price = prices.get(s)
+        if price is None or pd.isna(price):
+            continue
+        ticks.append(Record(symbol=s, price=float(price), open=float(price), high=float(price),
+                            low=float(price), cum_volume=0, created_at=now))
+    return ticks
+
+
+# === 交易 ===
+def _latest_price(symbol):
+    sim = _active()
+    price = sim.market.prices_at(sim.clock.now).get(symbol)
+    return float(price) if price is not None and pd.notna(price) else 0.0
+
+
+def order_volume(symbol, volume, side, order_type, position_effect=PositionEffect_Open,
+                 price=0, account='', **kwargs):
+    sim = _active()
+    return sim.broker.submit(sim.clock.now, symbol, volume, side, _latest_price(symbol),
+                             order_type, position_effect)
+
+
+def order_target_volume(symbol, volume, position_side=PositionSide_Long, order_type=OrderType_Market,
+                        price=0, account='', **kwargs):
+    sim = _active()
+    pos = sim.broker.positions.get(symbol)
+    current_amount = pos.amount if pos else 0
+    diff = int(volume) - current_amount
+    if diff == 0:
+        return []
+    side = OrderSide_Buy if diff > 0 else OrderSide_Sell
+    effect = PositionEffect_Open if diff > 0 else PositionEffect_Close
+    if diff < 0 and pos is not None:
+        diff = -min(-diff, pos.available)
+    return [sim.broker.submit(sim.clock.now, symbol, abs(diff), side, _latest_price(symbol), order_type, effect)]
+
+
+def order_target_percent(symbol, percent, position_side=PositionSide_Long, order_type=OrderType_Market,
+                         price=0, account='', **kwargs):
+    sim = _active()
+    price_now = _latest_price(symbol)
+    if price_now <= 0:
+        return []
+    nav = sim.account().cash.nav
+    target = int(nav * percent / price_now / 100) * 100 if percent > 0 else 0
+    return order_target_volume(symbol, target, position_side, order_type)
+
+
+def get_orders():
+    return list(_active().broker.today_orders)
+
+
+def get_unfinished_orders():
+    # 市价单即时成交，没有挂单
+    return []
+
+
+def order_cancel_all():
+    return None
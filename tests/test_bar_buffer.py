@@ -0,0 +1,92 @@
+"""
+盘中分钟 bar 环形缓冲测试
+- 最新价 / VWAP / 日内高低点 / 分钟收益率
+- 超出容量后按时间顺序展开，跨日自动清空
+- algo 的"今日"价格行优先取缓冲，缺失标的才调用 current()
+"""
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+from core.bar_buffer import IntradayBarBuffer
+from core.strategy import _today_prices
+from sim.engine import Record
+
+T0 = datetime(2025, 6, 30, 9, 31)
+
+
+def _bar(symbol, k, close, volume=100.0, amount=None, day=T0):
+    return Record(symbol=symbol, eob=day + timedelta(minutes=k), close=close, high=close + 0.1,
+                  low=close - 0.1, volume=volume, amount=amount if amount is not None else close * volume)
+
+
+class TestIntradayBarBuffer(unittest.TestCase):
+    def test_price_features(self):
+        buf = IntradayBarBuffer(['B', 'A', 'C'])
+        buf.update([_bar('A', 0, 10.0, volume=100), _bar('B', 0, 20.0), _bar('X', 0, 1.0)])
+        buf.update([_bar('A', 1, 11.0, volume=300)])
+
+        np.testing.assert_allclose(buf.last(), [11.0, 20.0, np.nan])
+        self.assertAlmostEqual(buf.vwap()[0], (10.0 * 100 + 11.0 * 300) / 400)
+        self.assertAlmostEqual(buf.day_high()[0], 11.1)
+        self.assertAlmostEqual(buf.day_low()[0], 9.9)
+        np.testing.assert_allclose(buf.minute_returns()[0], [0.1])
+        self.assertTrue(buf.closes().flags['C_CONTIGUOUS'])
+        self.assertEqual(buf.snapshot('last'), {'A': 11.0, 'B': 20.0})
+        self.assertAlmostEqual(buf.coverage(), 2 / 3)
+        self.assertEqual(buf.features().loc['A', 'bars'], 2)
+
+    def test_ring_wraps_in_time_order(self):
+        buf = IntradayBarBuffer(['A'], capacity=4)
+        for k in range(6):
+            buf.update([_bar('A', k, 1.0 + k)])
+        np.testing.assert_allclose(buf.closes()[0], [3.0, 4.0, 5.0, 6.0])
+        self.assertAlmostEqual(buf.day_low()[0], 0.9)   # 全日极值不受容量限制
+
+    def test_new_day_resets(self):
+        buf = IntradayBarBuffer(['A'])
+        buf.update([_bar('A', 0, 1.0)])
+        buf.update([_bar('A', 0, 2.0, day=T0 + timedelta(days=1))])
+        self.assertEqual(buf.counts[0], 1)
+        self.assertAlmostEqual(buf.vwap()[0], 2.0)
+
+
+class TestTodayPrices(unittest.TestCase):
+    def setUp(self):
+        self.buf = IntradayBarBuffer(['A', 'B', 'C'])
+        self.buf.update([_bar('A', 0, 10.0), _bar('B', 0, 20.0)])
+        self.buf.update([_bar('A', 200, 12.0, volume=300)])   # 12:51 -> 14:51 (跨午休)
+        self.now = T0 + timedelta(minutes=203)
+        self.ctx = SimpleNamespace(whitelist={'A', 'B', 'C'}, bar_buffer=self.buf, now=self.now)
+
+    def _run(self, source):
+        ticks = [{'symbol': s, 'price': 99.0} for s in ('A', 'B', 'C')]
+        with patch.object(config, 'INTRADAY_PRICE_SOURCE', source), \
+                patch('core.strategy.current', side_effect=lambda symbols: [t for t in ticks if t['symbol'] in symbols]) as cur:
+            td = _today_prices(self.ctx, self.now)
+        return td, cur
+
+    def test_current_source_unchanged(self):
+        td, cur = self._run('current')
+        self.assertEqual(td, {'A': 99.0, 'B': 99.0, 'C': 99.0})
+        self.assertEqual(sorted(cur.call_args.kwargs['symbols']), ['A', 'B', 'C'])
+
+    def test_buffer_sources_fall_back_for_stale_or_missing(self):
+        td, cur = self._run('last')
+        # B 的最后一根 bar 已超过 DATA_TIMEOUT_SEC，C 没有 bar
+        self.assertEqual(td, {'A': 12.0, 'B': 99.0, 'C': 99.0})
+        self.assertEqual(sorted(cur.call_args.kwargs['symbols']), ['B', 'C'])
+        td, _ = self._run('vwap')
+        self.assertAlmostEqual(td['A'], (10.0 * 100 + 12.0 * 300) / 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+盘中 60s Bar 录制测试
+- 分块列式写入 (固定 dtype，可 mmap)，收盘归档为压缩 npz
+- 跨日自动归档前一交易日，启动时归档遗留交易日
+- 队列写满时丢弃计数，record 不阻塞
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.bar_recorder import (
+    BarRecorder, BAR_COLUMNS, write_chunk, archive_pending, list_days, load_day, load_day_frame
+)
+from sim.engine import Record
+
+SH = timezone(timedelta(hours=8))
+
+
+def _bars(day, minute, symbols, price=1.0):
+    eob = datetime(day.year, day.month, day.day, 9, 31, tzinfo=SH) + timedelta(minutes=minute)
+    return [Record(symbol=s, eob=eob, open=price, high=price + 0.01, low=price - 0.01,
+                   close=price + i * 0.001, volume=1000.0 * (i + 1), amount=1e4) for i, s in enumerate(symbols)]
+
+
+class TestBarRecorder(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.symbols = ['SHSE.510300', 'SZSE.159915', 'SHSE.512880']
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_chunks_then_archive(self):
+        rec = BarRecorder(self.root, flush_rows=6)
+        day = datetime(2025, 6, 30)
+        for m in range(4):
+            rec.record(_bars(day, m, self.symbols, price=1.0 + m))
+        rec.close()
+        self.assertEqual(rec.written, 12)
+        self.assertEqual(rec.dropped, 0)
+        self.assertTrue(os.path.exists(os.path.join(self.root, '20250630.npz')))
+        self.assertFalse(os.path.isdir(os.path.join(self.root, '20250630')))
+
+        cols = load_day('2025-06-30', self.root)
+        for name, dtype in BAR_COLUMNS.items():
+            self.assertEqual(cols[name].dtype, np.dtype(dtype))
+        df = load_day_frame('2025-06-30', self.root)
+        self.assertEqual(len(df), 12)
+        self.assertEqual(df['eob'].iloc[0], np.datetime64('2025-06-30T09:31:00'))
+        self.assertEqual(df['symbol'].iloc[1], 'SZSE.159915')
+        self.assertAlmostEqual(df['close'].iloc[-1], 4.002)
+
+    def test_open_day_chunks_are_mmapped(self):
+        arrays = {name: np.zeros(3, dtype=dt) for name, dt in BAR_COLUMNS.items()}
+        write_chunk(self.root, '20250630', arrays)
+        cols = load_day('20250630', self.root)
+        self.assertIsInstance(cols['close'], np.memmap)
+        self.assertEqual(list_days(self.root), ['20250630'])
+
+        # 追加分块后归档 (与已有归档合并)
+        archive_pending(self.root)
+        write_chunk(self.root, '20250630', arrays)
+        archive_pending(self.root)
+        self.assertEqual(len(load_day('20250630', self.root)['close']), 6)
+
+    def test_day_rollover_archives_previous_day(self):
+        rec = BarRecorder(self.root)
+        rec.record(_bars(datetime(2025, 6, 27), 0, self.symbols))
+        rec.record(_bars(datetime(2025, 6, 30), 0, self.symbols))
+        rec.close()
+        self.assertEqual(list_days(self.root), ['20250627', '20250630'])
+        self.assertEqual(len(load_day('20250627', self.root)['close']), 3)
+
+    def test_full_queue_drops_without_blocking(self):
+        rec = BarRecorder(self.root, queue_size=2, start=False)
+        for m in range(5):
+            rec.record(_bars(datetime(2025, 6, 30), m, self.symbols))
+        self.assertEqual(rec.dropped, 9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+性能基准测试：合成行情可复现性、基线对比判定、小规模冒烟运行
+"""
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sim.synthetic import make_synthetic_market
+from benchmarks.hot_paths import CASES, run_benchmarks, compare_results
+
+
+class TestSyntheticMarket(unittest.TestCase):
+    def test_shape_gaps_and_themes(self):
+        market = make_synthetic_market(120, n_days=300, nan_frac=0.02, seed=3)
+        self.assertEqual(market.prices_df.shape, (300, 120))
+        self.assertEqual(len(market.benchmark_df), 300)
+        self.assertGreater(market.prices_df.isna().values.sum(), 0)
+        self.assertEqual(set(market.theme_map), market.whitelist)
+        self.assertGreater(len(set(market.theme_map.values())), 1)
+
+    def test_reproducible(self):
+        a = make_synthetic_market(30, n_days=50, seed=11)
+        b = make_synthetic_market(30, n_days=50, seed=11)
+        np.testing.assert_array_equal(a.prices_df.values, b.prices_df.values)
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_smoke_run_all_cases(self):
+        result = run_benchmarks(sizes=[40], n_days=280, repeats=1)
+        self.assertEqual(set(result['results']), set(CASES))
+        for timings in result['results'].values():
+            self.assertGreater(timings['40']['median_ms'], 0)
+
+    def test_compare_flags_regressions(self):
+        baseline = {'results': {'get_ranking': {'500': {'median_ms': 10.0}},
+                                'on_bar': {'500': {'median_ms': 0.1}}}}
+        current = {'results': {'get_ranking': {'500': {'median_ms': 14.0}},
+                               'on_bar': {'500': {'median_ms': 0.3}}}}
+        rows = {r['case']: r for r in compare_results(baseline, current)}
+        self.assertTrue(rows['get_ranking']['regressed'])
+        self.assertFalse(rows['on_bar']['regressed'])  # 绝对差值低于噪声阈值
+        self.assertFalse(compare_results(baseline, current, threshold=1.5)[0]['regressed'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+相关性去重测试
+- RollingCovariance.corr 与 DataFrame.corr(min_periods) 一致
+- 贪心去重与基于整表相关矩阵的逐一比较结果一致，近似同指数 ETF 只保留排名最高的一只
+- 启用 CORR_DEDUPE 时 select_target_weights 跳过高相关候选；数百候选的去重为亚毫秒级
+"""
+import os
+import sys
+import time
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+from core.logic import dedupe_correlated, select_target_weights
+from core.weights import RollingCovariance
+
+
+def _clone_market(n_base=40, n_days=200, seed=4):
+    """每只基础标的附带一只跟踪同一指数的"克隆" (相关系数 ~0.99)"""
+    rng = np.random.default_rng(seed)
+    base = rng.normal(0, 0.015, (n_days, n_base))
+    clones = base + rng.normal(0, 0.0015, base.shape)
+    rets = np.hstack([base, clones])
+    syms = [f'B{i:03d}' for i in range(n_base)] + [f'C{i:03d}' for i in range(n_base)]
+    dates = pd.date_range(end=datetime(2025, 6, 30), periods=n_days, freq='B')
+    prices = pd.DataFrame(np.exp(np.cumsum(rets, axis=0)), index=dates, columns=syms)
+    prices.iloc[50:60, 2] = np.nan
+    return prices
+
+
+def _reference(candidates, corr, threshold):
+    keep = []
+    for s in candidates:
+        if all(not (corr.loc[s, k] > threshold) for k in keep):
+            keep.append(s)
+    return keep
+
+
+class TestCorrDedupe(unittest.TestCase):
+    def setUp(self):
+        self.prices = _clone_market()
+        self.dt = self.prices.index[-1] + pd.Timedelta('14:55:00')
+        self.model = RollingCovariance(window=60, min_periods=20)
+        for d in self.prices.index[-5:]:
+            self.model.sync(self.prices, d + pd.Timedelta('14:55:00'))
+        stable = self.prices[self.prices.index < self.prices.index[-1]]
+        self.corr = stable.pct_change().tail(60).corr(min_periods=20)
+
+    def test_corr_matches_pandas(self):
+        syms = list(self.prices.columns[[0, 2, 40, 42, 7]])
+        np.testing.assert_allclose(self.model.corr(syms), self.corr.loc[syms, syms].to_numpy(), rtol=1e-8)
+
+    def test_greedy_matches_reference(self):
+        rng = np.random.default_rng(1)
+        candidates = list(rng.permutation(self.prices.columns))
+        for threshold in (0.9, 0.5, 0.1):
+            self.assertEqual(dedupe_correlated(candidates, self.model, threshold),
+                             _reference(candidates, self.corr, threshold))
+        kept = dedupe_correlated(candidates, self.model, 0.9)
+        self.assertEqual(len(kept), 40)                       # 每对克隆只保留一只
+        self.assertEqual(dedupe_correlated(candidates, self.model, 0.9, limit=5), kept[:5])
+
+    def test_select_target_weights_skips_clones(self):
+        rank_df = pd.DataFrame({'score': [100.0, 90.0, 80.0, 70.0, 60.0, 50.0],
+                                'theme': ['T1', 'T2', 'T3', 'T4', 'T5', 'T6']},
+                               index=['B000', 'C000', 'B001', 'C001', 'B002', 'B003'])
+        active_t = SimpleNamespace(holdings={})
+        with patch.object(config, 'TOP_N', 4), patch.object(config, 'CORR_THRESHOLD', 0.9):
+            with patch.object(config, 'CORR_DEDUPE', False):
+                self.assertEqual(list(select_target_weights(rank_df, active_t, self.model)),
+                                 ['B000', 'C000', 'B001', 'C001'])
+            with patch.object(config, 'CORR_DEDUPE', True):
+                self.assertEqual(list(select_target_weights(rank_df, active_t, self.model)),
+                                 ['B000', 'B001', 'B002', 'B003'])
+
+    def test_wide_selection_is_fast(self):
+        prices = _clone_market(n_base=300, n_days=120, seed=9)
+        model = RollingCovariance(window=60, min_periods=20).sync(prices, prices.index[-1])
+        candidates = list(prices.columns)
+        dedupe_correlated(candidates, model, limit=config.TOP_N + config.TURNOVER_BUFFER)
+        t0 = time.perf_counter()
+        for _ in range(50):
+            dedupe_correlated(candidates, model, limit=config.TOP_N + config.TURNOVER_BUFFER)
+        self.assertLess((time.perf_counter() - t0) / 50, 5e-3)
+
+
+if __name__ == '__main__':
+    unittest.main()
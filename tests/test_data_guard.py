@@ -0,0 +1,73 @@
+"""
+DataGuard 数据新鲜度测试
+- 按报价时间计算每个 tick 的时延与过期占比 (naive 时间视为北京时间)
+- 无报价时间的 tick 计为 unknown，按新鲜处理
+- algo 注入今日行时剔除过期标的并写入时延指标
+"""
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+from core.latency import StageTimer
+from core.risk import DataGuard
+from core.strategy import _today_prices
+
+SH = timezone(timedelta(hours=8))
+NOW = datetime(2025, 6, 30, 14, 55, tzinfo=SH)
+
+
+def _ticks():
+    return [
+        {'symbol': 'A', 'price': 1.0, 'created_at': NOW - timedelta(seconds=3)},
+        {'symbol': 'B', 'price': 2.0, 'created_at': NOW - timedelta(seconds=600)},
+        {'symbol': 'C', 'price': 3.0, 'created_at': (NOW - timedelta(seconds=30)).replace(tzinfo=None)},
+        {'symbol': 'D', 'price': 4.0},
+    ]
+
+
+class TestCheckFreshness(unittest.TestCase):
+    def test_ages_and_stale_fraction(self):
+        report = DataGuard.check_freshness(_ticks(), NOW)
+        self.assertEqual(report['stale'], ['B'])
+        self.assertEqual(report['fresh'], ['A', 'C', 'D'])
+        self.assertAlmostEqual(report['ages']['A'], 3.0)
+        self.assertAlmostEqual(report['ages']['C'], 30.0)
+        self.assertNotIn('D', report['ages'])
+        self.assertEqual(report['unknown'], 1)
+        self.assertAlmostEqual(report['stale_frac'], 0.25)
+        self.assertAlmostEqual(report['max_age'], 600.0)
+
+    def test_custom_timeout_and_empty(self):
+        self.assertEqual(DataGuard.check_freshness(_ticks(), NOW, timeout_sec=10)['stale'], ['B', 'C'])
+        self.assertEqual(DataGuard.check_freshness([], NOW)['stale_frac'], 0.0)
+
+
+class TestStaleTicksInAlgo(unittest.TestCase):
+    def _run(self, action):
+        ctx = SimpleNamespace(whitelist={'A', 'B', 'C', 'D'}, now=NOW, wechat=MagicMock(), bar_buffer=None)
+        timer = StageTimer('algo', 240)
+        with patch.object(config, 'DATA_STALE_ACTION', action), \
+                patch('core.strategy.current', return_value=_ticks()):
+            td = _today_prices(ctx, NOW.replace(tzinfo=None), timer)
+        return td, ctx, timer.finish()
+
+    def test_stale_symbols_dropped_and_reported(self):
+        td, ctx, record = self._run('drop')
+        self.assertEqual(sorted(td), ['A', 'C', 'D'])
+        self.assertEqual(record['notes']['ticks']['stale'], 1)
+        self.assertAlmostEqual(record['notes']['ticks']['max_age_sec'], 600.0)
+        ctx.wechat.send_text.assert_called_once()   # 25% > DATA_STALE_ALERT_FRAC
+
+    def test_warn_keeps_prices(self):
+        td, _, _ = self._run('warn')
+        self.assertEqual(sorted(td), ['A', 'B', 'C', 'D'])
+
+
+if __name__ == '__main__':
+    unittest.main()
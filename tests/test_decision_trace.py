@@ -0,0 +1,100 @@
+"""
+决策轨迹测试：编码往返 (比例权重逐位还原)、流式比对、黄金轨迹快速失败、旧版本文件拒绝读取
+"""
+import unittest
+import sys
+import os
+import shutil
+import struct
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.portfolio import Tranche
+from core.trace import (DecisionTraceWriter, TraceDivergence, compare_traces, iter_trace,
+                        TRACE_MAGIC, SYM_WIDTH)
+
+
+def _write_trace(path, n_days, diverge_day=None, golden_path=None):
+    """写入 n_days 天的轨迹，diverge_day 当天改变权重"""
+    writer = DecisionTraceWriter(path, golden_path)
+    t0, t1 = Tranche(0, 10000), Tranche(1, 10000)
+    t0.holdings = {'SHSE.510300': 1000}
+    t1.holdings = {'SZSE.159915': 500, 'SHSE.510500': 300}
+    start = datetime(2025, 1, 2, 14, 55)
+    try:
+        for i in range(n_days):
+            weights = {'SHSE.510300': 3, 'SZSE.159915': 1}
+            if i == diverge_day:
+                weights['SZSE.159915'] = 2
+            writer.record(
+                start + timedelta(days=i), i + 1, 'SAFE', 0.9,
+                ['SHSE.510300', 'SZSE.159915', 'SHSE.510500'], weights, [t0, t1]
+            )
+    finally:
+        writer.close()
+
+
+class TestDecisionTrace(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.golden = os.path.join(self.tmpdir, 'golden.bin')
+        self.actual = os.path.join(self.tmpdir, 'actual.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_roundtrip(self):
+        _write_trace(self.golden, 3)
+        days = list(iter_trace(self.golden))
+        self.assertEqual(len(days), 3)
+        self.assertEqual(days[0].date, 20250102)
+        self.assertEqual(days[0].market_state, 'SAFE')
+        self.assertAlmostEqual(days[0].scale, 0.9)
+        self.assertEqual(days[0].ranking, ['SHSE.510300', 'SZSE.159915', 'SHSE.510500'])
+        self.assertEqual(days[0].weights, {'SHSE.510300': 3.0, 'SZSE.159915': 1.0})
+        self.assertEqual(days[0].holdings[(1, 'SZSE.159915')], 500)
+
+    def test_fractional_weights_roundtrip_exactly(self):
+        weights = {'SHSE.510300': 0.1, 'SZSE.159915': 1 / 3, 'SHSE.510500': 1 - 0.1 - 1 / 3}
+        writer = DecisionTraceWriter(self.golden)
+        try:
+            writer.record(datetime(2025, 1, 2, 14, 55), 1, 'SAFE', 0.9, list(weights), weights, [])
+        finally:
+            writer.close()
+        self.assertEqual(next(iter_trace(self.golden)).weights, weights)
+
+    def test_old_version_rejected(self):
+        with open(self.golden, 'wb') as f:
+            f.write(struct.pack('<8sHB', TRACE_MAGIC, 1, SYM_WIDTH))
+        with self.assertRaises(ValueError):
+            list(iter_trace(self.golden))
+
+    def test_compare_identical(self):
+        _write_trace(self.golden, 5)
+        _write_trace(self.actual, 5)
+        result = compare_traces(self.golden, self.actual)
+        self.assertTrue(result['identical'])
+        self.assertEqual(result['days'], 5)
+
+    def test_compare_stops_at_first_divergence(self):
+        _write_trace(self.golden, 10)
+        _write_trace(self.actual, 10, diverge_day=3)
+        result = compare_traces(self.golden, self.actual)
+        self.assertFalse(result['identical'])
+        self.assertEqual(result['days'], 4)
+        self.assertEqual(result['first_divergence']['date'], 20250105)
+        self.assertEqual(result['first_divergence']['field'], 'weights')
+
+    def test_golden_writer_fails_fast(self):
+        _write_trace(self.golden, 10)
+        with self.assertRaises(TraceDivergence) as cm:
+            _write_trace(self.actual, 10, diverge_day=2, golden_path=self.golden)
+        self.assertEqual(cm.exception.date, 20250104)
+        # 分歧日之后不再写入
+        self.assertEqual(len(list(iter_trace(self.actual))), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+分钟级止损回放测试
+- apply_bar_stops 向量化结果与 on_bar 逐 bar 逻辑一致 (触发价、high_price 更新、保护期)
+- RecordedBars 将录制归档转换为 (时间 × 标的) 矩阵
+- run_local_backtest 接入分钟数据源后产生盘中止损成交
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+from core.backtest import SignalCache, run_local_backtest, override_params
+from core.bar_recorder import BarRecorder
+from core.intraday import RecordedBars, apply_bar_stops, stop_outcomes, summarize_stops
+from core.portfolio import Tranche
+from core.strategy import _check_bar_stops
+from sim.engine import MINUTE_TIMES, Record, SimMarket
+from sim.synthetic import make_synthetic_market
+
+
+def _make_rpm(symbols, entry_dt, rng):
+    rpm = SimpleNamespace(tranches=[], save_state=lambda: None)
+    for i in range(4):
+        t = Tranche(i, 100000)
+        for s in symbols[i::2]:
+            entry = float(rng.uniform(0.9, 1.1))
+            t.holdings[s] = 1000
+            t.pos_records[s] = {'entry_price': entry, 'high_price': entry * float(rng.uniform(1.0, 1.2)),
+                                'entry_dt': entry_dt - timedelta(days=int(rng.integers(0, 4))),
+                                'volatility': 0.02}
+        rpm.tranches.append(t)
+    return rpm
+
+
+def _snapshot(rpm):
+    return [(t.cash, dict(t.holdings), {s: r['high_price'] for s, r in t.pos_records.items()})
+            for t in rpm.tranches]
+
+
+class TestApplyBarStops(unittest.TestCase):
+    def _compare(self, protection_days):
+        rng = np.random.default_rng(3)
+        symbols = [f'SHSE.51{i:04d}' for i in range(8)]
+        day = datetime(2025, 6, 30)
+        times = np.array([np.datetime64(datetime.combine(day, m), 's') for m in MINUTE_TIMES])
+        close = np.exp(np.cumsum(rng.normal(0, 0.004, (len(times), len(symbols))), axis=0))
+        high = close * (1 + rng.uniform(0, 0.003, close.shape))
+        close[50:60, 2] = np.nan
+
+        params = {'OPT_STOP_LOSS': 0.05, 'OPT_TRAILING_TRIGGER': 0.05,
+                  'OPT_TRAILING_DROP': 0.02, 'OPT_PROTECTION_DAYS': protection_days}
+        with override_params(params):
+            scalar = _make_rpm(symbols, day, np.random.default_rng(1))
+            ctx = SimpleNamespace(rpm=scalar)
+            with patch('core.strategy.order_target_percent'):
+                for k, ts in enumerate(times):
+                    ctx.now = ts.astype(datetime)
+                    bars = [Record(symbol=s, high=high[k, j], close=close[k, j])
+                            for j, s in enumerate(symbols) if not np.isnan(close[k, j])]
+                    _check_bar_stops(ctx, bars)
+
+            vector = _make_rpm(symbols, day, np.random.default_rng(1))
+            trades = apply_bar_stops(vector, (times, symbols, high, close))
+
+        self.assertEqual(_snapshot(scalar), _snapshot(vector))
+        return trades
+
+    def test_matches_on_bar_logic(self):
+        trades = self._compare(protection_days=0)
+        self.assertTrue(trades)
+        self.assertTrue(all(t['reason'] == 'bar_stop' for t in trades))
+
+    def test_matches_on_bar_with_protection(self):
+        self._compare(protection_days=2)
+
+    def test_time_window(self):
+        day = datetime(2025, 6, 30)
+        times = np.array([np.datetime64(datetime.combine(day, m), 's') for m in MINUTE_TIMES])
+        close = np.ones((len(times), 1))
+        close[-1] = 0.5   # 15:00 暴跌
+        rpm = SimpleNamespace(tranches=[Tranche(0, 0)])
+        rpm.tranches[0].holdings = {'X': 100}
+        rpm.tranches[0].pos_records = {'X': {'entry_price': 1.0, 'high_price': 1.0, 'entry_dt': None}}
+        self.assertEqual(apply_bar_stops(rpm, (times, ['X'], close, close), until=day.replace(hour=14, minute=55)), [])
+        fired = apply_bar_stops(rpm, (times, ['X'], close, close), after=day.replace(hour=14, minute=55))
+        self.assertEqual(fired[0]['dt'], day.replace(hour=15))
+        self.assertAlmostEqual(rpm.tranches[0].cash, 50.0)
+
+
+class TestRecordedBars(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_pivot_recorded_day(self):
+        rec = BarRecorder(self.root)
+        eob = datetime(2025, 6, 30, 9, 31)
+        rec.record([Record(symbol='B', eob=eob, high=2.1, close=2.0), Record(symbol='A', eob=eob, high=1.1, close=1.0)])
+        rec.record([Record(symbol='A', eob=eob + timedelta(minutes=1), high=1.2, close=1.15)])
+        rec.close()
+
+        times, symbols, high, close = RecordedBars(self.root).day_bars('2025-06-30')
+        self.assertEqual(symbols, ['A', 'B'])
+        self.assertEqual(len(times), 2)
+        np.testing.assert_array_equal(close, [[1.0, 2.0], [1.15, np.nan]])
+        self.assertIsNone(RecordedBars(self.root).day_bars('2025-07-01'))
+
+
+class TestIntradayBacktest(unittest.TestCase):
+    def test_minute_replay_adds_bar_stops(self):
+        synthetic = make_synthetic_market(30, n_days=330, seed=4)
+        cache = SignalCache(synthetic.prices_df, synthetic.benchmark_df, synthetic.whitelist, synthetic.theme_map)
+        market = SimMarket.from_synthetic(synthetic)
+        params = {'OPT_TRAILING_TRIGGER': 0.03, 'OPT_TRAILING_DROP': 0.01}
+
+        daily = run_local_backtest(cache, start=cache.first_signal_dt, params=params)
+        intraday = run_local_backtest(cache, start=cache.first_signal_dt, params=params, minute_bars=market)
+
+        self.assertEqual(daily['minute_days'], 0)
+        self.assertEqual(intraday['minute_days'], len(intraday['nav']))
+        self.assertFalse(any(t['reason'] == 'bar_stop' for t in daily['trades']))
+        outcomes = stop_outcomes(intraday['trades'])
+        self.assertIn('bar_stop', set(outcomes['reason']))
+        self.assertEqual(summarize_stops(outcomes)['count'], len(outcomes))
+        self.assertEqual(config.TRAILING_DROP, float(os.environ.get('OPT_TRAILING_DROP', 0.03)))
+
+
+if __name__ == '__main__':
+    unittest.main()
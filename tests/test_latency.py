@@ -0,0 +1,74 @@
+"""
+时延监控测试：分段计时、超预算告警 (每轮一次)、滚动指标文件
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.latency import StageTimer, append_metrics, read_metrics
+
+
+class TestStageTimer(unittest.TestCase):
+    def test_laps_accumulate(self):
+        timer = StageTimer('algo', budget_sec=60)
+        timer.lap('guard')
+        timer.lap('ranking')
+        timer.lap('guard')
+        record = timer.finish()
+        self.assertEqual(list(record['stages']), ['guard', 'ranking'])
+        self.assertFalse(record['over_budget'])
+        self.assertGreaterEqual(record['total_ms'], sum(record['stages'].values()) - 1e-6)
+
+    def test_alert_once_when_over_budget(self):
+        alert = Mock()
+        timer = StageTimer('algo', budget_sec=0.0, alert=alert)
+        timer.lap('guard')
+        timer.lap('ranking')
+        record = timer.finish()
+        self.assertTrue(record['over_budget'])
+        alert.assert_called_once()
+        self.assertIn('超预算', alert.call_args[0][0])
+
+    def test_would_exceed_projects_wait(self):
+        alert = Mock()
+        timer = StageTimer('algo', budget_sec=20, alert=alert)
+        self.assertFalse(timer.would_exceed(5))
+        self.assertTrue(timer.would_exceed(30, 'verify_orders'))
+        self.assertIn('verify_orders', alert.call_args[0][0])
+
+    def test_alert_failure_is_swallowed(self):
+        timer = StageTimer('on_bar', budget_sec=0.0, alert=Mock(side_effect=RuntimeError('net')))
+        timer.lap('scan')
+        self.assertTrue(timer.alerted)
+
+
+class TestMetricsFile(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'latency.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_append_and_read(self):
+        append_metrics({'run': 'algo', 'total_ms': 1.0}, path=self.path)
+        append_metrics({'run': 'on_bar', 'total_ms': 2.0}, path=self.path)
+        self.assertEqual(len(read_metrics(self.path)), 2)
+        self.assertEqual(read_metrics(self.path, run='on_bar')[0]['total_ms'], 2.0)
+
+    def test_rolling_trim(self):
+        for i in range(200):
+            append_metrics({'run': 'algo', 'i': i}, path=self.path, max_bytes=2000)
+        records = read_metrics(self.path)
+        self.assertLessEqual(os.path.getsize(self.path), 2000)
+        self.assertEqual(records[-1]['i'], 199)
+        self.assertLess(len(records), 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
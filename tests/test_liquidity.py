@@ -0,0 +1,99 @@
+"""
+流动性阶段测试
+- ADV / 日均成交额与逐列 rolling 一致，只使用决策日之前的已完成交易日
+- 数据追加时只重算新行
+- 启用 LIQUIDITY_FILTER 时 get_ranking / SignalCache 剔除低成交额标的，调仓买入按参与率截断
+"""
+import os
+import sys
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+from core.backtest import SignalCache, new_gate_state
+from core.liquidity import LiquidityCache, cap_buy_value, context_liquidity
+from core.signal import get_ranking
+from tests.test_local_backtest import _make_market
+
+
+def _volumes(prices, seed=3):
+    rng = np.random.default_rng(seed)
+    volumes = pd.DataFrame(rng.uniform(1e6, 5e6, prices.shape), index=prices.index, columns=prices.columns)
+    volumes.iloc[:, :5] /= 1000          # 前 5 只为低成交额标的
+    return volumes
+
+
+class TestLiquidityCache(unittest.TestCase):
+    def setUp(self):
+        self.prices, *_ = _make_market()
+        self.volumes = _volumes(self.prices)
+        self.cache = LiquidityCache(window=20).sync(self.prices, self.volumes)
+
+    def test_uses_completed_days_only(self):
+        dt = datetime.combine(self.prices.index[-1].date(), datetime.min.time()).replace(hour=14, minute=55)
+        expected_adv = self.volumes.iloc[-21:-1].mean()
+        expected_amt = (self.volumes * self.prices).iloc[-21:-1].mean()
+        pd.testing.assert_series_equal(self.cache.adv_at(dt), expected_adv, check_names=False)
+        pd.testing.assert_series_equal(self.cache.turnover_at(dt), expected_amt, check_names=False)
+        self.assertFalse(self.cache.liquid_mask(dt, 1e5).iloc[:5].any())
+        self.assertTrue(self.cache.liquid_mask(dt, 1e5).iloc[5:].all())
+        sym = self.prices.columns[7]
+        self.assertAlmostEqual(self.cache.order_cap(sym, dt, 2.0, participation=0.1), 0.1 * expected_adv[sym] * 2.0)
+        self.assertIsNone(self.cache.order_cap('NOT_LISTED', dt, 2.0))
+        self.assertTrue(self.cache.adv_at(self.prices.index[0]).isna().all())
+
+    def test_incremental_sync(self):
+        cache = LiquidityCache(window=20).sync(self.prices.iloc[:-3], self.volumes.iloc[:-3])
+        cache.sync(self.prices, self.volumes)
+        cache.sync(self.prices, self.volumes)
+        self.assertEqual(cache.recomputed, len(self.prices))
+        np.testing.assert_allclose(cache.turnover, self.cache.turnover, rtol=1e-12)
+        np.testing.assert_allclose(cache.adv, self.cache.adv, rtol=1e-12)
+
+    def test_cap_buy_value(self):
+        dt = self.prices.index[-1]
+        sym = self.prices.columns[0]
+        with patch.object(config, 'MAX_PARTICIPATION', 0.05):
+            cap = self.cache.order_cap(sym, dt, 1.0)
+            self.assertEqual(cap_buy_value(self.cache, sym, dt, 1.0, cap * 10), cap)
+            self.assertEqual(cap_buy_value(self.cache, sym, dt, 1.0, cap / 2), cap / 2)
+        self.assertEqual(cap_buy_value(None, sym, dt, 1.0, 123.0), 123.0)
+
+
+class TestLiquidityGate(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.prices, cls.benchmark, cls.whitelist, cls.theme_map = _make_market()
+        cls.volumes = _volumes(cls.prices)
+        cls.thin = set(cls.prices.columns[:5])
+
+    def test_disabled_by_default(self):
+        ctx = SimpleNamespace(prices_df=self.prices, volumes_df=self.volumes, liquidity=LiquidityCache())
+        with patch.object(config, 'LIQUIDITY_FILTER', False):
+            self.assertIsNone(context_liquidity(ctx))
+
+    def test_ranking_excludes_thin_symbols(self):
+        with patch.object(config, 'LIQUIDITY_FILTER', True), patch.object(config, 'MIN_ADV_AMOUNT', 1e5):
+            ctx = new_gate_state(self.whitelist, self.theme_map)
+            ctx.prices_df, ctx.volumes_df, ctx.liquidity = self.prices, self.volumes, LiquidityCache()
+            cache = SignalCache(self.prices, self.benchmark, self.whitelist, self.theme_map,
+                                volumes_df=self.volumes)
+            for day in cache.days[-5:]:
+                rank_df, _ = get_ranking(ctx, day['dt'])
+                pd.testing.assert_frame_equal(rank_df, day['rank_df'])
+                self.assertFalse(self.thin & set(rank_df.index))
+
+        unfiltered = SignalCache(self.prices, self.benchmark, self.whitelist, self.theme_map)
+        self.assertTrue(any(self.thin & set(d['rank_df'].index) for d in unfiltered.days[-20:]
+                            if d['rank_df'] is not None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+"""
+本地回测引擎与滚动前推优化测试
+- SignalCache 预计算的排名表与 get_ranking 完全一致
+- run_local_backtest 产出逐日净值与成交记录
+- 参数覆盖在退出后恢复
+- 滚动窗口切分
+"""
+import os
+import sys
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+from core.backtest import SignalCache, run_local_backtest, override_params, new_gate_state
+from core.signal import get_ranking
+
+
+def _make_market(n_days=330, n_syms=25, seed=7):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end=datetime(2025, 6, 30), periods=n_days, freq='B')
+    syms = [f'SHSE.51{i:04d}' for i in range(n_syms)]
+    rets = rng.normal(0.0005, 0.015, (n_days, n_syms))
+    prices = pd.DataFrame(np.exp(np.cumsum(rets, axis=0)), index=dates, columns=syms)
+    prices.iloc[100:110, 3] = np.nan  # 缺失数据
+    benchmark = prices.mean(axis=1)
+    theme_map = {s: f'T{i % 6}' for i, s in enumerate(syms)}
+    return prices, benchmark, set(syms), theme_map
+
+
+class TestLocalBacktest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.prices, cls.benchmark, cls.whitelist, cls.theme_map = _make_market()
+        cls.cache = SignalCache(cls.prices, cls.benchmark, cls.whitelist, cls.theme_map)
+
+    def test_cached_ranking_matches_get_ranking(self):
+        ctx = new_gate_state(self.whitelist, self.theme_map)
+        ctx.prices_df = self.prices
+        for day in self.cache.days[-5:]:
+            rank_df, _ = get_ranking(ctx, day['dt'])
+            pd.testing.assert_frame_equal(rank_df, day['rank_df'])
+
+    def test_run_produces_nav_and_trades(self):
+        result = run_local_backtest(self.cache, start=self.cache.first_signal_dt)
+        n_days = len(self.cache.slice_days(self.cache.first_signal_dt))
+        self.assertEqual(len(result['nav']), n_days)
+        self.assertTrue(any(t['side'] == 'BUY' for t in result['trades']))
+        self.assertIn('sharpe', result['summary'])
+
+    def test_params_are_restored(self):
+        before = config.STOP_LOSS
+        with override_params({'OPT_STOP_LOSS': 0.05, 'OPT_PROTECTION_DAYS': 3}):
+            self.assertEqual(config.STOP_LOSS, 0.05)
+            self.assertEqual(config.PROTECTION_DAYS, 3)
+        self.assertEqual(config.STOP_LOSS, before)
+
+    def test_same_params_are_deterministic(self):
+        params = {'OPT_STOP_LOSS': 0.1, 'OPT_K_CRASH': 2.0}
+        a = run_local_backtest(self.cache, params=params)
+        b = run_local_backtest(self.cache, params=params)
+        pd.testing.assert_series_equal(a['nav'], b['nav'])
+
+    def test_walk_forward_windows(self):
+        from walk_forward import build_windows
+        dates = list(range(100))
+        windows = build_windows(dates, train_days=40, test_days=20)
+        self.assertEqual(len(windows), 3)
+        self.assertEqual(windows[1]['train_start'], 20)
+        self.assertEqual(windows[1]['test_start'], 60)
+        self.assertEqual(windows[-1]['test_end'], 99)
+
+
+if __name__ == '__main__':
+    unittest.main()
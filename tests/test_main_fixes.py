@@ -237,14 +237,16 @@ class TestRiskControllerLogic(unittest.TestCase):
         rc.on_day_start(context)
         self.assertEqual(rc.initial_nav_today, 1000000)
 
-        # 测试正常情况（未触发熔断）
+        # 测试正常情况（未触发熔断）；NAV 读缓存，账户推送后重新同步
         acc.cash.nav = 970000  # 亏损 3%
+        rc.on_account_status(context, Mock())
         result = rc.check_daily_loss(context)
         self.assertTrue(result, "3% 亏损不应该触发熔断")
         self.assertTrue(rc.active, "系统应该保持活跃")
 
         # 测试熔断情况
         acc.cash.nav = 950000  # 亏损 5% > 4%
+        rc.on_account_status(context, Mock())
         result = rc.check_daily_loss(context)
         self.assertFalse(result, "5% 亏损应该触发熔断")
         self.assertFalse(rc.active, "系统应该进入熔断状态")
@@ -0,0 +1,123 @@
+"""
+盘中实时盯市测试
+- 各 Tranche 市值与组合总值随 bar 增量更新，与全量重估一致
+- 峰谷回撤告警 / 熔断事件每日只触发一次；账本变化 (止损卖出) 后总值连续
+- on_bar 熔断后 RiskController 停止放行订单
+"""
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gm.api import MODE_LIVE
+from core.portfolio import Tranche
+from core.mtm import IntradayMarkToMarket
+from core.risk import RiskController
+from core import strategy
+
+OPEN = datetime(2025, 1, 2, 9, 31)
+REF = {'A': 10.0, 'B': 5.0, 'C': 2.0}
+ORDER = [{'symbol': 'A', 'side': 'BUY', 'volume': 100}]
+
+
+def _bar(symbol, close):
+    return SimpleNamespace(symbol=symbol, close=close, high=close)
+
+
+def _tranches():
+    book = [{'A': 1000}, {'A': 500, 'B': 2000}, {}]
+    tranches = []
+    for i, holdings in enumerate(book):
+        t = Tranche(i, 10000.0)
+        for sym, qty in holdings.items():
+            t.holdings[sym] = qty
+            t.pos_records[sym] = {'entry_price': 1.0, 'high_price': 1.0, 'entry_dt': OPEN, 'volatility': 0.02}
+        tranches.append(t)
+    return tranches
+
+
+def _revalue(tranches, prices):
+    return [t.cash + sum(q * prices[s] for s, q in t.holdings.items()) for t in tranches]
+
+
+class TestIntradayMarkToMarket(unittest.TestCase):
+    def test_incremental_matches_full_revaluation(self):
+        tranches = _tranches()
+        mtm = IntradayMarkToMarket(alert_pct=0.5, halt_pct=0.9)
+        self.assertEqual(mtm.update(tranches, [], OPEN, ref_prices=lambda: REF), [])
+        self.assertAlmostEqual(mtm.open_value, sum(_revalue(tranches, REF)))
+
+        rng = np.random.default_rng(0)
+        prices = dict(REF)
+        for k in range(1, 60):
+            bars = []
+            for sym in rng.choice(['A', 'B', 'C'], size=2, replace=False):
+                prices[sym] = float(np.round(prices[sym] * rng.uniform(0.99, 1.01), 3))
+                bars.append(_bar(sym, prices[sym]))
+            mtm.update(tranches, bars, OPEN + timedelta(minutes=k))
+        np.testing.assert_allclose(mtm.values, _revalue(tranches, prices))
+        self.assertAlmostEqual(mtm.total, sum(_revalue(tranches, prices)))
+        self.assertGreaterEqual(mtm.peak, mtm.total)
+        self.assertEqual(len(mtm.summary()['tranche_drawdowns']), 3)
+
+    def test_drawdown_events_and_book_changes(self):
+        tranches = _tranches()
+        mtm = IntradayMarkToMarket(alert_pct=0.02, halt_pct=0.04)
+        mtm.update(tranches, [_bar('A', 11.0)], OPEN, ref_prices=lambda: REF)   # 峰值 56500
+        peak = mtm.peak
+        self.assertAlmostEqual(peak, 30000 + 1500 * 11.0 + 2000 * 5.0)
+
+        events = mtm.update(tranches, [_bar('A', 10.0)], OPEN + timedelta(minutes=1))
+        self.assertEqual([e['level'] for e in events], ['alert'])
+        self.assertEqual(mtm.update(tranches, [_bar('A', 9.9)], OPEN + timedelta(minutes=2)), [])
+
+        # 止损卖出 T1 的 B: 现金增加，总值不变，峰值保留
+        tranches[1].sell('B', 5.0)
+        self.assertEqual(mtm.update(tranches, [], OPEN + timedelta(minutes=3)), [])
+        self.assertAlmostEqual(mtm.peak, peak)
+        self.assertEqual(mtm.symbols, ['A'])
+
+        events = mtm.update(tranches, [_bar('A', 9.4)], OPEN + timedelta(minutes=4))
+        self.assertEqual([e['level'] for e in events], ['halt'])
+        self.assertAlmostEqual(events[0]['drawdown'], 1 - (40000 + 1500 * 9.4) / peak)
+        self.assertEqual(mtm.update(tranches, [_bar('A', 9.0)], OPEN + timedelta(minutes=5)), [])
+
+        # 次日重新以参考价开盘
+        mtm.update(tranches, [], OPEN + timedelta(days=1), ref_prices=lambda: {'A': 9.0})
+        self.assertEqual((mtm.drawdown, mtm.max_drawdown, mtm.day_return), (0.0, 0.0, 0.0))
+        self.assertAlmostEqual(mtm.open_value, 40000 + 1500 * 9.0)
+
+
+class TestOnBarCircuitBreaker(unittest.TestCase):
+    def test_halt_blocks_orders(self):
+        context = Mock()
+        context.mode = MODE_LIVE
+        context.now = OPEN
+        context.rpm.tranches = _tranches()
+        context.prices_df = pd.DataFrame([REF], index=[pd.Timestamp('2024-12-31')])
+        context.risk_controller = RiskController()
+        context.risk_controller.last_day = OPEN.date()
+        context.intraday_mtm = IntradayMarkToMarket(alert_pct=0.02, halt_pct=0.04)
+        context.bar_recorder = context.bar_buffer = None
+
+        with patch.object(strategy, 'order_target_percent'):
+            strategy.on_bar(context, [_bar('A', 10.0)])
+            self.assertEqual(len(context.risk_controller.check_orders(ORDER, REF, REF, 1e6, 1e6)[0]), 1)
+            context.now = OPEN + timedelta(minutes=1)
+            strategy.on_bar(context, [_bar('A', 9.0), _bar('B', 4.5)])
+
+        self.assertFalse(context.risk_controller.active)
+        self.assertEqual(context.risk_controller.check_orders(ORDER, REF, REF, 1e6, 1e6)[0], [])
+        self.assertFalse(context.risk_controller.check_daily_loss(context))
+        self.assertIn('盘中熔断', context.wechat.send_text.call_args[0][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
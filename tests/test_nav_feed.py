@@ -0,0 +1,93 @@
+"""
+风控 NAV 缓存测试
+- 开盘同步一次账户后，bar 盯市与成交回报只做本地更新，check_daily_loss 不再查询账户
+- 缓存过期或账户状态推送后回退查询账户
+"""
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gm.api import MODE_LIVE, OrderSide_Buy, OrderSide_Sell
+from config import config
+from core.risk import RiskController
+
+OPEN = datetime(2025, 1, 2, 9, 31)
+
+
+def _bar(symbol, close):
+    return SimpleNamespace(symbol=symbol, close=close, high=close)
+
+
+class TestNavFeed(unittest.TestCase):
+    def setUp(self):
+        self.acc = SimpleNamespace(
+            cash=SimpleNamespace(nav=1000000.0),
+            positions=lambda: [SimpleNamespace(symbol='A', amount=10000, price=10.0, vwap=9.0),
+                               SimpleNamespace(symbol='B', amount=20000, price=5.0, vwap=5.0)])
+        self.context = Mock()
+        self.context.mode = MODE_LIVE
+        self.context.account_id = 'acc'
+        self.context.now = OPEN
+        self.context.account = Mock(return_value=self.acc)
+        self.rc = RiskController()
+
+    def test_local_reads_after_open(self):
+        self.rc.on_bar(self.context, [_bar('A', 10.0)])
+        self.assertEqual(self.rc.initial_nav_today, 1000000.0)
+        self.assertEqual(self.context.account.call_count, 1)
+
+        # A 跌 10%，B 跌 20%: -10000 - 20000
+        for minute in range(1, 120):
+            self.context.now = OPEN + timedelta(minutes=minute)
+            self.assertTrue(self.rc.on_bar(self.context, [_bar('A', 9.0), _bar('B', 4.0), _bar('C', 1.0)]))
+        self.assertAlmostEqual(self.rc.nav_feed.nav, 970000.0)
+        self.assertEqual(self.context.account.call_count, 1)
+
+        self.context.now += timedelta(minutes=1)
+        self.assertFalse(self.rc.on_bar(self.context, [_bar('B', 1.0)]))
+        self.assertFalse(self.rc.active)
+        self.assertEqual(self.context.account.call_count, 1)
+
+    def test_fills_update_cash_and_positions(self):
+        self.rc.on_day_start(self.context)
+        feed = self.rc.nav_feed
+        self.rc.on_execution_report(self.context, SimpleNamespace(
+            account_id='acc', symbol='A', side=OrderSide_Sell, volume=10000, price=11.0, commission=5.0))
+        self.rc.on_execution_report(self.context, SimpleNamespace(
+            account_id='acc', symbol='C', side=OrderSide_Buy, volume=1000, price=2.0, commission=1.0))
+        self.rc.on_execution_report(self.context, SimpleNamespace(
+            account_id='other', symbol='C', side=OrderSide_Buy, volume=1000, price=2.0, commission=1.0))
+        self.assertEqual(feed.qty, {'B': 20000, 'C': 1000})
+        self.assertAlmostEqual(feed.nav, 1000000.0 + 10000 - 6.0)
+        self.assertAlmostEqual(feed.cash + sum(q * feed.price[s] for s, q in feed.qty.items()), feed.nav)
+        self.rc.on_bar(self.context, [_bar('C', 3.0)])
+        self.assertAlmostEqual(feed.nav, 1000000.0 + 10000 - 6.0 + 1000)
+        self.assertEqual(self.context.account.call_count, 1)
+
+    def test_fallback_to_account(self):
+        self.rc.on_day_start(self.context)
+        self.acc.cash.nav = 950000.0
+        self.assertTrue(self.rc.check_daily_loss(self.context))   # 缓存仍为开盘值
+
+        self.context.now = OPEN + timedelta(seconds=config.NAV_CACHE_MAX_AGE_SEC + 1)
+        self.assertFalse(self.rc.check_daily_loss(self.context))   # 过期 -> 重新同步
+        self.assertEqual(self.context.account.call_count, 2)
+
+        self.rc.on_account_status(self.context, Mock())
+        self.assertEqual(self.rc.current_nav(self.context), 950000.0)
+        self.assertEqual(self.context.account.call_count, 3)
+
+        # 次日首个 bar 重新锁定开盘 NAV
+        self.context.now = OPEN + timedelta(days=1)
+        self.assertTrue(self.rc.on_bar(self.context, []))
+        self.assertEqual(self.rc.initial_nav_today, 950000.0)
+        self.assertTrue(self.rc.active)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+在线绩效统计测试
+- NavHistory 的收益/回撤/夏普与原 DataFrame 整表计算一致 (含容量扩展、零收益首日)
+- 同日重复记录覆盖当日值
+- 累加器随状态文件保存与恢复，兼容原 list-of-dict 接口
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.portfolio import NavHistory, RollingPortfolioManager, Tranche
+
+
+def _reference_summary(records):
+    """原 get_performance_summary 的 DataFrame 实现 (参照)"""
+    df = pd.DataFrame(records).set_index('dt')
+    df['ret'] = df['nav'].pct_change().fillna(0)
+    total_ret = (df['nav'].iloc[-1] / df['nav'].iloc[0]) - 1 if df['nav'].iloc[0] > 0 else 0
+    cum_max = df['nav'].cummax()
+    max_dd = ((df['nav'] - cum_max) / cum_max).min()
+    mean_ret, std_ret = df['ret'].mean(), df['ret'].std()
+    sharpe = (mean_ret / std_ret * (252 ** 0.5)) if std_ret > 0 else 0
+    return {'return': total_ret, 'max_dd': abs(max_dd), 'sharpe': sharpe}
+
+
+def _records(n, seed=0):
+    rng = np.random.default_rng(seed)
+    navs = 1e6 * np.cumprod(1 + rng.normal(0.0004, 0.012, n))
+    t0 = datetime(2024, 1, 2, 14, 55)
+    return [{'dt': t0 + timedelta(days=i), 'nav': float(v)} for i, v in enumerate(navs)]
+
+
+class TestNavHistory(unittest.TestCase):
+    def test_matches_dataframe_summary(self):
+        for n in (1, 2, 30, 1000):
+            records = _records(n, seed=n)
+            hist = NavHistory(capacity=8)
+            for r in records:
+                hist.append(r)
+                self.assertEqual(len(hist), len(records[:len(hist)]))
+            got, expected = hist.summary(), _reference_summary(records)
+            for key in expected:
+                self.assertAlmostEqual(got[key], expected[key], places=10, msg=(n, key))
+            self.assertEqual(list(hist)[-1], records[-1])
+            pd.testing.assert_series_equal(hist.to_series(), pd.DataFrame(records).set_index('dt')['nav'])
+        self.assertEqual(NavHistory().summary(), {})
+
+    def test_same_day_overwrites(self):
+        records = _records(10)
+        hist = NavHistory()
+        for r in records:
+            hist.add(r['dt'] - timedelta(hours=2), r['nav'] * 0.9)   # 盘中先记一次
+            hist.add(r['dt'], r['nav'])
+        self.assertEqual(len(hist), 10)
+        expected = _reference_summary(records)
+        for key in expected:
+            self.assertAlmostEqual(hist.summary()[key], expected[key], places=10)
+
+
+class TestRpmPerformanceState(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'state.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_accumulators_survive_restart(self):
+        records = _records(40, seed=3)
+        rpm = RollingPortfolioManager(state_path=self.path)
+        rpm.tranches = [Tranche(0, 0)]
+        for r in records[:30]:
+            rpm.tranches[0].total_value = r['nav']
+            rpm.record_nav(r['dt'])
+        rpm.tranches[0].total_value = records[29]['nav'] * 1.01   # 当日盘中记录，重启后将被覆盖
+        rpm.record_nav(records[29]['dt'])
+        rpm.save_state()
+
+        restored = RollingPortfolioManager(state_path=self.path)
+        self.assertTrue(restored.load_state())
+        self.assertEqual(len(restored.nav_history), 0)
+        for r in records[29:]:
+            restored.tranches[0].total_value = r['nav']
+            restored.record_nav(r['dt'])
+        expected = _reference_summary(records)
+        for key in expected:
+            self.assertAlmostEqual(restored.get_performance_summary()[key], expected[key], places=10)
+
+
+if __name__ == '__main__':
+    unittest.main()
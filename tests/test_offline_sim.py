@@ -0,0 +1,198 @@
+"""
+离线 gm.api 替身测试
+- 日线 history 不泄露未来数据，分钟路径收于日线收盘价
+- 模拟券商 T+1 可用与资金检查
+- install 替换已导入模块中的 gm.api 绑定，uninstall 恢复
+- 真实 main.init -> on_bar -> algo 多日完整回放 (远快于实时)
+- 券商事件推送：成交回报与账户状态驱动风控 NAV 缓存，回放后与模拟账户一致
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+from sim import gm_api
+from sim.engine import (
+    GMSimulator, SimMarket, SimBroker, SimNotifier, MINUTE_TIMES,
+    OrderSide_Buy, OrderSide_Sell, OrderStatus_Filled, OrderStatus_Rejected, ExecType_Trade
+)
+from sim.synthetic import make_synthetic_market
+
+
+def _make_init(market):
+    """与 main.init 相同的上下文组装 (不含 Windows 进程锁与网络通知)"""
+    from core.portfolio import RollingPortfolioManager
+    from core.risk import RiskController
+
+    def init(context):
+        from gm.api import MODE_LIVE, history, subscribe, schedule, set_account_id
+        from core.strategy import algo
+        context.whitelist, context.theme_map = market.whitelist, market.theme_map
+        context.rpm = RollingPortfolioManager()
+        context.rpm.load_state()
+        context.risk_controller = RiskController()
+        context.wechat, context.mailer = SimNotifier(), SimNotifier()
+        context.mode, context.account_id = MODE_LIVE, 'sim-acc'
+        set_account_id('sim-acc')
+        context.risk_scaler, context.market_state, context.br_history = 1.0, 'SAFE', []
+        context.BR_CAUTION_IN, context.BR_CAUTION_OUT = 0.40, 0.30
+        context.BR_DANGER_IN, context.BR_DANGER_OUT, context.BR_PRE_DANGER = 0.60, 0.50, 0.55
+
+        hd = history(symbol=",".join(context.whitelist), frequency='1d', start_time='2000-01-01',
+                     end_time='2100-01-01', fields='symbol,close,eob', df=True)
+        hd['eob'] = pd.to_datetime(hd['eob']).dt.tz_localize(None)
+        context.prices_df = hd.pivot(index='eob', columns='symbol', values='close').ffill()
+        bm = history(symbol=config.MACRO_BENCHMARK, frequency='1d', start_time='2000-01-01',
+                     end_time='2100-01-01', fields='close,eob', df=True)
+        bm['eob'] = pd.to_datetime(bm['eob']).dt.tz_localize(None)
+        context.benchmark_df = bm.set_index('eob')['close']
+
+        subscribe(symbols=list(context.whitelist), frequency='60s')
+        schedule(schedule_func=algo, date_rule='1d', time_rule=config.EXEC_TIME)
+    return init
+
+
+class TestSimMarket(unittest.TestCase):
+    def setUp(self):
+        self.synthetic = make_synthetic_market(20, n_days=60, seed=2)
+        self.market = SimMarket.from_synthetic(self.synthetic)
+
+    def test_minute_path_closes_on_daily_close(self):
+        day = self.market.trading_days[-1]
+        path = self.market.minute_closes(day)
+        self.assertEqual(path.shape, (len(MINUTE_TIMES), 20))
+        close = self.synthetic.prices_df.loc[day].values
+        ok = ~np.isnan(close)
+        np.testing.assert_allclose(path[-1][ok], close[ok])
+        self.market._day_cache = (None, None)
+        np.testing.assert_array_equal(self.market.minute_closes(day), path)
+
+    def test_history_has_no_lookahead(self):
+        sim = GMSimulator(self.market)
+        gm_api.install(sim)
+        try:
+            day = self.market.trading_days[-1]
+            sim.clock.set(datetime.combine(day.date(), datetime.min.time()).replace(hour=14, minute=55))
+            hd = gm_api.history(symbol=self.synthetic.prices_df.columns[0], frequency='1d',
+                                start_time='2000-01-01', end_time='2100-01-01', df=True)
+            self.assertLess(hd['eob'].max().tz_localize(None), day)
+            sim.clock.set(sim.clock.now.replace(hour=15, minute=0))
+            hd = gm_api.history(symbol=self.synthetic.prices_df.columns[0], frequency='1d',
+                                start_time='2000-01-01', end_time='2100-01-01', df=True)
+            self.assertEqual(hd['eob'].max().tz_localize(None), day)
+        finally:
+            gm_api.uninstall()
+
+
+class TestSimBroker(unittest.TestCase):
+    def test_t_plus_one_and_cash_check(self):
+        broker = SimBroker(10000, account_id='a')
+        now = datetime(2025, 1, 2, 14, 55)
+        self.assertEqual(broker.submit(now, 'X', 1000, OrderSide_Buy, 5.0).status, OrderStatus_Filled)
+        self.assertEqual(broker.submit(now, 'X', 1000, OrderSide_Sell, 5.0).status, OrderStatus_Rejected)
+        self.assertEqual(broker.submit(now, 'Y', 2000, OrderSide_Buy, 5.0).status, OrderStatus_Rejected)
+        broker.start_day()
+        self.assertEqual(broker.submit(now, 'X', 1000, OrderSide_Sell, 5.5).status, OrderStatus_Filled)
+        self.assertAlmostEqual(broker.cash, 10500)
+        self.assertEqual(broker.positions, {})
+        # 开盘账户状态 + 每笔委托状态 + 成交回报
+        self.assertEqual([name for name, _ in broker.events].count('on_order_status'), 4)
+        fills = [e for name, e in broker.events if name == 'on_execution_report']
+        self.assertEqual([(e.side, e.volume, e.exec_type) for e in fills],
+                         [(OrderSide_Buy, 1000, ExecType_Trade), (OrderSide_Sell, 1000, ExecType_Trade)])
+        self.assertEqual(broker.events[4][0], 'on_account_status')
+
+
+class TestOfflineReplay(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def test_install_rebinds_imported_names(self):
+        from core import strategy
+        original = strategy.order_volume
+        sim = GMSimulator(SimMarket.from_synthetic(make_synthetic_market(5, n_days=10)))
+        gm_api.install(sim)
+        try:
+            self.assertIs(strategy.order_volume, gm_api.order_volume)
+            self.assertIs(sys.modules['gm.api'], gm_api)
+        finally:
+            gm_api.uninstall()
+        self.assertIs(strategy.order_volume, original)
+
+    def test_multi_day_live_replay(self):
+        """真实 main.init -> on_bar -> algo (仅替换 Windows 进程锁模块；通知由模拟器替换)"""
+        from unittest.mock import patch
+        from run_offline import _write_whitelist
+
+        synthetic = make_synthetic_market(30, n_days=300, seed=5)
+        whitelist = os.path.join(self.workdir, 'whitelist.xlsx')
+        _write_whitelist(synthetic, whitelist)
+        sim = GMSimulator(SimMarket.from_synthetic(synthetic), account_id=config.ACCOUNT_ID)
+        gm_api.install(sim)
+        try:
+            with patch.dict(sys.modules, {'msvcrt': SimpleNamespace()}), \
+                    patch.object(config, 'WHITELIST_FILE', whitelist):
+                sys.modules.pop('main', None)
+                import main
+                days = sim.market.trading_days[-5:]
+                t0 = time.perf_counter()
+                context = sim.run(main, days[0], days[-1], workdir=self.workdir)
+                elapsed = time.perf_counter() - t0
+        finally:
+            gm_api.uninstall()
+
+        self.assertEqual(len(sim.nav_history), 5)
+        self.assertEqual(context.rpm.days_count, 5)
+        # 历史窗口按模拟时钟加载，足以排名并实际成交
+        self.assertGreaterEqual(len(context.prices_df[context.prices_df.index < days[0]]), 251)
+        self.assertTrue(any(o.status == OrderStatus_Filled for o in sim.broker.orders))
+        self.assertTrue(any(t.holdings for t in context.rpm.tranches))
+        # 状态文件写入沙箱目录
+        self.assertTrue(os.path.exists(os.path.join(self.workdir, os.path.basename(config.STATE_FILE))))
+        # 5 个交易日 (各 4 小时) 远快于实时
+        self.assertGreater(5 * 4 * 3600 / elapsed, 1000)
+
+    def test_callbacks_feed_nav_cache(self):
+        synthetic = make_synthetic_market(30, n_days=300, seed=5)
+        sim = GMSimulator(SimMarket.from_synthetic(synthetic), commission_ratio=0.0003)
+        gm_api.install(sim)
+        try:
+            from core import strategy
+            received = []
+
+            def on_execution_report(context, execrpt):
+                received.append(execrpt)
+                strategy.on_execution_report(context, execrpt)
+
+            module = SimpleNamespace(init=_make_init(synthetic), on_bar=strategy.on_bar,
+                                     on_account_status=strategy.on_account_status,
+                                     on_execution_report=on_execution_report)
+            days = sim.market.trading_days[-3:]
+            context = sim.run(module, days[0], days[-1], workdir=self.workdir)
+            account = sim.account()
+        finally:
+            gm_api.uninstall()
+
+        self.assertTrue(received)
+        self.assertEqual(len(received), sum(o.status == OrderStatus_Filled for o in sim.broker.orders))
+        feed = context.risk_controller.nav_feed
+        self.assertEqual(feed.qty, {p.symbol: p.amount for p in account.positions()})
+        self.assertAlmostEqual(feed.nav, account.cash.nav, places=4)
+        self.assertAlmostEqual(feed.cash, account.cash.available, places=4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+"""
+收盘前预计算测试
+- prepare_signal_components 增量重算与完整计算一致，历史变化时自动失效
+- preclose 不改变 Meta-Gate 状态与 prices_df
+- 加入 14:45 预计算后，多日实盘回放的持仓、订单与状态机与不加时完全一致
+- 预案未变化时 EXEC_TIME 沿用预案权重，不再调用 select_target_weights
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.preclose import plan_delta, snapshot_gate
+from core.signal import compute_signal_components, prepare_signal_components
+from sim import gm_api
+from sim.engine import GMSimulator, SimMarket
+from sim.synthetic import make_synthetic_market
+from tests.test_offline_sim import _make_init
+
+
+class TestPreparedComponents(unittest.TestCase):
+    def setUp(self):
+        self.prices = make_synthetic_market(40, n_days=300, seed=1).prices_df
+
+    def test_delta_matches_full_recompute(self):
+        provisional = self.prices.copy()
+        provisional.iloc[-1] *= 0.97
+        prepared = prepare_signal_components(provisional)
+
+        full = compute_signal_components(self.prices)
+        delta = compute_signal_components(self.prices, prepared)
+        pd.testing.assert_series_equal(full[0], delta[0])
+        pd.testing.assert_series_equal(full[1], delta[1])
+        for key in full[2]:
+            pd.testing.assert_series_equal(full[2][key], delta[2][key])
+
+    def test_prepared_ignored_when_history_changes(self):
+        prepared = prepare_signal_components(self.prices)
+        changed = self.prices.copy()
+        changed.iloc[-10, 0] *= 1.5
+        pd.testing.assert_series_equal(
+            compute_signal_components(changed, prepared)[1], compute_signal_components(changed)[1])
+
+    def test_plan_delta(self):
+        plan = {'signature': (('A', 'B'), ('A', 'B', 'C')), 'scale': 1.0}
+        self.assertFalse(plan_delta(plan, (('A', 'B'), ('A', 'B', 'C')), 1.0)['changed'])
+        delta = plan_delta(plan, (('A', 'D'), ('A', 'D', 'B')), 0.9)
+        self.assertTrue(delta['changed'])
+        self.assertEqual((delta['entered'], delta['exited']), (['D'], ['C']))
+
+    def test_buffer_reorder_is_a_change(self):
+        plan = {'signature': (('A', 'B'), ('A', 'B', 'C', 'D')), 'scale': 1.0}
+        delta = plan_delta(plan, (('A', 'B'), ('A', 'B', 'D', 'C')), 1.0)
+        self.assertTrue(delta['changed'] and delta['reordered'])
+        self.assertEqual((delta['entered'], delta['exited']), ([], []))
+
+
+def _make_preclose_init(market, with_preclose):
+    base = _make_init(market)
+
+    def init(context):
+        base(context)
+        if with_preclose:
+            from gm.api import schedule
+            from core.strategy import preclose
+            schedule(schedule_func=preclose, date_rule='1d', time_rule='14:45:00')
+    return init
+
+
+class TestPrecloseReplay(unittest.TestCase):
+    def setUp(self):
+        self.synthetic = make_synthetic_market(30, n_days=300, seed=11)
+        self.dirs = []
+
+    def tearDown(self):
+        for d in self.dirs:
+            shutil.rmtree(d, ignore_errors=True)
+
+    def _replay(self, with_preclose):
+        workdir = tempfile.mkdtemp()
+        self.dirs.append(workdir)
+        sim = GMSimulator(SimMarket.from_synthetic(self.synthetic))
+        gm_api.install(sim)
+        try:
+            from core.strategy import on_bar
+            module = SimpleNamespace(init=_make_preclose_init(self.synthetic, with_preclose), on_bar=on_bar)
+            days = sim.market.trading_days[-6:]
+            context = sim.run(module, days[0], days[-1], workdir=workdir)
+        finally:
+            gm_api.uninstall()
+        orders = [(o.symbol, o.side, o.volume, str(o.created_at)) for o in sim.broker.orders]
+        tranches = [(t.cash, t.holdings) for t in context.rpm.tranches]
+        return context, orders, tranches
+
+    def test_preclose_does_not_change_decisions(self):
+        base_ctx, base_orders, base_tranches = self._replay(False)
+
+        checks = []
+        from core import strategy
+        original = strategy._run_preclose
+
+        def spy(context, timer):
+            gate, prices = snapshot_gate(context), context.prices_df
+            original(context, timer)
+            checks.append((snapshot_gate(context) == gate, context.prices_df is prices,
+                           context.rpm.initialized, isinstance(context.preclose_plan, dict)))
+
+        with patch.object(strategy, '_run_preclose', spy):
+            ctx, orders, tranches = self._replay(True)
+
+        self.assertEqual(len(checks), 6)
+        for gate_kept, prices_kept, initialized, has_plan in checks:
+            self.assertTrue(gate_kept and prices_kept)
+            self.assertEqual(has_plan, initialized)
+        self.assertTrue(any(has_plan for *_, has_plan in checks))
+        self.assertEqual(orders, base_orders)
+        self.assertEqual(tranches, base_tranches)
+        self.assertEqual(snapshot_gate(ctx), snapshot_gate(base_ctx))
+        self.assertIsNone(ctx.signal_prep)
+
+    def test_unchanged_plan_reuses_weights(self):
+        _, base_orders, base_tranches = self._replay(False)
+
+        from core import logic, strategy
+        original, select = strategy._targets_from_plan, logic.select_target_weights
+        records = []
+
+        def spy(context, current_dt, active_t, plan):
+            calls = []
+
+            def counting(*args, **kwargs):
+                calls.append(1)
+                return select(*args, **kwargs)
+
+            with patch.object(logic, 'select_target_weights', counting):
+                targets = original(context, current_dt, active_t, plan)
+            records.append((len(calls), targets, dict(plan['weights'])))
+            return targets
+
+        with patch.object(strategy, '_targets_from_plan', spy):
+            _, orders, tranches = self._replay(True)
+
+        reused = [(targets, weights) for calls, targets, weights in records if calls == 0]
+        self.assertTrue(reused)
+        for targets, weights in reused:
+            self.assertEqual(targets[0], weights)
+        self.assertEqual(orders, base_orders)
+        self.assertEqual(tranches, base_tranches)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+事前风控测试
+- 整批订单一次检查：价格带、单笔占比、现金 (含卖出回款)、总敞口、废单预算
+- 卖出只受价格带约束；通过的订单保持原顺序
+"""
+import os
+import sys
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+from core.portfolio import Tranche
+from core.risk import RiskController, pre_trade_check
+from core import strategy
+
+DAY = datetime(2025, 1, 2, 14, 55)
+
+PRICES = {'A': 10.0, 'B': 5.0, 'C': 2.0, 'D': 1.0, 'E': 3.0}
+CLOSE = {'A': 10.2, 'B': 5.0, 'C': 1.5, 'D': 1.0}
+
+
+def _orders(*items):
+    return [{'symbol': s, 'side': side, 'volume': v} for s, side, v in items]
+
+
+class TestPreTradeCheck(unittest.TestCase):
+    def _reasons(self, rejected):
+        return {o['symbol']: o['reason'] for o in rejected}
+
+    def test_price_band_and_order_value(self):
+        orders = _orders(('C', 'BUY', 1000), ('A', 'BUY', 1000), ('X', 'BUY', 100), ('B', 'BUY', 70000),
+                         ('E', 'BUY', 100))
+        approved, rejected = pre_trade_check(orders, PRICES, CLOSE, nav=1e6, cash=1e6)
+        # C 偏离昨收 33% (脏报价)，X 无价格，B 35 万 > 30%；E 无昨收时跳过价格带
+        self.assertEqual(self._reasons(rejected), {'C': 'price', 'X': 'price', 'B': 'order_value'})
+        self.assertEqual([o['symbol'] for o in approved], ['A', 'E'])
+
+    def test_sell_without_price_passes(self):
+        # 已移出白名单的持仓没有价格：照常卖出，不计回款；卖出不受价格带约束
+        orders = _orders(('SH.OLD', 'SELL', 1000), ('C', 'SELL', 1000), ('A', 'BUY', 100))
+        approved, rejected = pre_trade_check(orders, PRICES, CLOSE, nav=1e6, cash=2000, gross=1e4)
+        self.assertEqual([o['symbol'] for o in approved], ['SH.OLD', 'C', 'A'])
+        self.assertEqual(rejected, [])
+        approved, _ = pre_trade_check(orders[:1], {}, {}, nav=1e6, cash=0, gross=1e4)
+        self.assertEqual(approved, orders[:1])
+
+    def test_limit_down_sell_of_chinext_etf_passes(self):
+        # 创业板 ETF 涨跌幅 20%：真实 -15% 日的卖出照常放行，同价买入仍按脏报价拦截
+        orders = _orders(('SZSE.159915', 'SELL', 1000), ('SZSE.159915', 'BUY', 1000))
+        approved, rejected = pre_trade_check(orders, {'SZSE.159915': 1.70}, {'SZSE.159915': 2.0},
+                                             nav=1e6, cash=1e6)
+        self.assertEqual(approved, orders[:1])
+        self.assertEqual(self._reasons(rejected), {'SZSE.159915': 'price'})
+
+    def test_cash_counts_sell_proceeds(self):
+        orders = _orders(('B', 'SELL', 10000), ('A', 'BUY', 10000), ('D', 'BUY', 20000), ('A', 'BUY', 1000))
+        # 可用 80000 + 卖出回款 50000 = 130000: A 100000 (含预留 100200) 通过，D 再 20040 通过，最后一笔超出
+        approved, rejected = pre_trade_check(orders, PRICES, CLOSE, nav=1e6, cash=80000)
+        self.assertEqual([(o['symbol'], o['volume']) for o in approved], [('B', 10000), ('A', 10000), ('D', 20000)])
+        self.assertEqual([o['reason'] for o in rejected], ['cash'])
+
+    def test_gross_exposure(self):
+        orders = _orders(('A', 'BUY', 5000), ('D', 'BUY', 60000))
+        approved, rejected = pre_trade_check(orders, PRICES, CLOSE, nav=1e6, cash=1e6, gross=900000)
+        self.assertEqual([o['symbol'] for o in approved], ['A'])
+        self.assertEqual(self._reasons(rejected), {'D': 'gross_exposure'})
+
+    def test_reject_budget_and_halt(self):
+        rc = RiskController()
+        orders = _orders(('B', 'SELL', 100), ('A', 'BUY', 100))
+        rc.record_rejects(config.MAX_REJECT_COUNT)
+        approved, rejected = rc.check_orders(orders, PRICES, CLOSE, nav=1e6, cash=1e6)
+        self.assertEqual([o['side'] for o in approved], ['SELL'])
+        self.assertEqual(rejected[0]['reason'], 'reject_budget')
+
+        rc.halt('test')
+        approved, rejected = rc.check_orders(orders, PRICES, CLOSE, nav=1e6, cash=1e6)
+        self.assertEqual((approved, [o['reason'] for o in rejected]), ([], ['halted', 'halted']))
+        self.assertEqual(pre_trade_check([], PRICES, CLOSE, 1e6, 1e6), ([], []))
+
+
+class TestUndoRejected(unittest.TestCase):
+    def test_rejected_orders_revert_tranche(self):
+        t = Tranche(0, 100000.0)
+        t.buy('A', 20000, 10.0, DAY, 0.02)
+        t.buy('B', 20000, 5.0, DAY, 0.02)
+        before = strategy._tranche_book(t)
+
+        # 当日调仓: 加仓 A、新买 C、减仓 B
+        t.buy('A', 10000, 10.2, DAY, 0.03)
+        t.buy('C', 6000, 3.0, DAY, 0.02)
+        t.sell_qty('B', 2000, 5.0)
+        orders = [{'symbol': 'A', 'side': 'BUY', 'volume': 1000}, {'symbol': 'C', 'side': 'BUY', 'volume': 2000},
+                  {'symbol': 'B', 'side': 'SELL', 'volume': 2000}]
+        _, rejected = pre_trade_check(orders, {'A': 10.2, 'B': 5.0, 'C': 3.0}, {'A': 10.0, 'B': 5.0, 'C': 2.0},
+                                      nav=1e5, cash=1e5)
+        self.assertEqual([o['symbol'] for o in rejected], ['C'])
+        rejected.append(dict(orders[0], reason='cash'))
+
+        strategy._undo_rejected(t, before, rejected, {'A': 10.2, 'B': 5.0, 'C': 3.0})
+        self.assertEqual(t.holdings, {'A': 2000, 'B': 2000})
+        self.assertNotIn('C', t.pos_records)
+        self.assertEqual(t.pos_records['A']['volatility'], 0.02)
+        # 现金只保留 B 的减仓回款
+        self.assertAlmostEqual(t.cash, 100000 - 20000 - 20000 + 10000)
+        self.assertAlmostEqual(t.total_value, t.cash + 2000 * 10.2 + 2000 * 5.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+向量化价格解析测试
+- resolve_prices 与原 algo 逐标的循环结果一致 (今日 / 昨日回退 / 缺失)
+- build_price_map 复用同一解析器
+"""
+import os
+import sys
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.backtest import build_price_map
+from core.logic import resolve_prices, price_map_from, PRICE_TODAY, PRICE_PREV, PRICE_MISSING
+
+
+def _loop_price_map(prices_slice, whitelist):
+    """原 algo 中的逐标的实现 (参照)"""
+    latest_prices = prices_slice.iloc[-1]
+    price_map, missing = {}, []
+    for sym in whitelist:
+        if sym in latest_prices.index:
+            price = latest_prices[sym]
+            if pd.notna(price) and price > 0:
+                price_map[sym] = price
+            elif len(prices_slice) > 1:
+                prev_price = prices_slice[sym].iloc[-2]
+                if pd.notna(prev_price) and prev_price > 0:
+                    price_map[sym] = prev_price
+                else:
+                    missing.append(sym)
+            else:
+                missing.append(sym)
+        else:
+            missing.append(sym)
+    return price_map, missing
+
+
+class TestResolvePrices(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        syms = [f'S{i:04d}' for i in range(1000)]
+        values = rng.uniform(0.5, 2.0, (5, len(syms)))
+        values[-1, ::7] = np.nan      # 今日缺失 -> 昨日
+        values[-2, ::14] = np.nan     # 今日、昨日均缺失
+        values[-1, 3] = 0.0           # 非正价格
+        self.prices = pd.DataFrame(values, index=pd.date_range(end=datetime(2025, 6, 30), periods=5),
+                                   columns=syms)
+        self.whitelist = set(syms[:900]) | {'NOT_LISTED'}
+
+    def test_matches_loop(self):
+        expected, expected_missing = _loop_price_map(self.prices, self.whitelist)
+        symbols, prices, source = resolve_prices(self.prices, self.whitelist)
+        self.assertEqual(price_map_from(symbols, prices, source), expected)
+        self.assertEqual(sorted(symbols[source == PRICE_MISSING]), sorted(expected_missing))
+        self.assertEqual(source[list(symbols).index('S0007')], PRICE_PREV)
+        self.assertEqual(source[list(symbols).index('S0001')], PRICE_TODAY)
+
+    def test_single_row_and_empty(self):
+        one = self.prices.iloc[:1].copy()
+        one.iloc[0, 0] = np.nan
+        expected, missing = _loop_price_map(one, self.whitelist)
+        symbols, prices, source = resolve_prices(one, self.whitelist)
+        self.assertEqual(price_map_from(symbols, prices, source), expected)
+        self.assertEqual(sorted(symbols[source == PRICE_MISSING]), sorted(missing))
+        self.assertTrue((resolve_prices(self.prices.iloc[:0], ['S0001'])[2] == PRICE_MISSING).all())
+
+    def test_build_price_map_uses_resolver(self):
+        expected, _ = _loop_price_map(self.prices, [s for s in self.prices.columns if s in self.whitelist])
+        self.assertEqual(build_price_map(self.prices, self.whitelist), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
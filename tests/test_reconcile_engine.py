@@ -0,0 +1,104 @@
+"""
+对账引擎测试
+- 全部差异一次算出并分类 (一致 / 碎股 / 虚多 / 实多)
+- age / pro_rata 分摊规则确定、整手优先，合计与券商一致
+- price_map 提供时现金同步调整；apply=False 不修改账本
+"""
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.portfolio import RollingPortfolioManager, Tranche
+from core.reconcile import reconcile, holdings_matrix, format_reconciliation
+
+DAY0 = datetime(2025, 1, 2, 14, 55)
+
+
+def _tranches(book):
+    """book: [{symbol: (shares, 买入日偏移)}]"""
+    tranches = []
+    for i, holdings in enumerate(book):
+        t = Tranche(i, 10000.0)
+        for sym, (qty, day) in holdings.items():
+            t.holdings[sym] = qty
+            t.pos_records[sym] = {'entry_price': 1.0, 'high_price': 1.0,
+                                  'entry_dt': DAY0 + timedelta(days=day), 'volatility': 0.02}
+        tranches.append(t)
+    return tranches
+
+
+class TestReconcileEngine(unittest.TestCase):
+    def setUp(self):
+        self.book = [
+            {'A': (1000, 0), 'B': (300, 0)},
+            {'A': (500, 3), 'C': (200, 3)},
+            {'A': (700, 1), 'B': (300, 5)},
+        ]
+
+    def test_classification(self):
+        tranches = _tranches(self.book)
+        real = {'A': 2200, 'B': 650, 'C': 150, 'D': 400}
+        report = reconcile(tranches, real, apply=False)
+        by_sym = {d['symbol']: d for d in report['diffs']}
+        self.assertEqual({s: d['status'] for s, d in by_sym.items()},
+                         {'B': 'odd_lot', 'C': 'odd_lot', 'D': 'surplus'})
+        self.assertEqual(report['matched'], 1)
+        self.assertEqual(report['unassigned'], {'D': 400})
+        self.assertFalse(report['balanced'])
+        self.assertEqual(sorted(report['odd_lot']), ['B', 'C'])
+        # apply=False 不修改账本
+        self.assertEqual(holdings_matrix(tranches, ['A', 'B', 'C']).sum(axis=0).tolist(), [2200, 600, 200])
+
+    def test_age_policy(self):
+        tranches = _tranches(self.book)
+        report = reconcile(tranches, {'A': 1450, 'B': 600, 'C': 200}, policy='age')
+        # 虚多 750: 先扣最近买入的 T1 (500)，再扣 T2 (250)
+        self.assertEqual(report['diffs'][0]['allocations'], {1: -500, 2: -250})
+        self.assertNotIn('A', tranches[1].holdings)
+        self.assertNotIn('A', tranches[1].pos_records)
+        self.assertEqual((tranches[0].holdings['A'], tranches[2].holdings['A']), (1000, 450))
+        self.assertFalse(report['balanced'])   # 描述对账前的账本
+        self.assertTrue(reconcile(tranches, {'A': 1450, 'B': 600, 'C': 200}, apply=False)['balanced'])
+
+        # 实多补给最近买入的持有者
+        report = reconcile(tranches, {'A': 1450, 'B': 800, 'C': 200}, policy='age')
+        self.assertEqual(report['diffs'][0]['allocations'], {2: 200})
+
+    def test_pro_rata_policy(self):
+        tranches = _tranches(self.book)
+        report = reconcile(tranches, {'A': 1330, 'B': 600, 'C': 200}, policy='pro_rata')
+        alloc = report['diffs'][0]['allocations']
+        self.assertEqual(sum(alloc.values()), -870)
+        # 8 手按比例 (3.95 / 1.98 / 2.77 -> 4 / 2 / 2)，零股 70 给剩余最多的 T0
+        self.assertEqual(alloc, {0: -470, 1: -200, 2: -200})
+        self.assertEqual(sum(t.holdings.get('A', 0) for t in tranches), 1330)
+
+        # 再次对账结果确定
+        again = _tranches(self.book)
+        self.assertEqual(reconcile(again, {'A': 1330, 'B': 600, 'C': 200}, policy='pro_rata')['diffs'],
+                         report['diffs'])
+
+    def test_cash_follows_price(self):
+        tranches = _tranches(self.book)
+        before = sum(t.cash for t in tranches)
+        report = reconcile(tranches, {'A': 2000, 'B': 600, 'C': 200, 'D': 300}, price_map={'A': 2.0, 'D': 1.5},
+                           policy='age', active_idx=2, current_dt=DAY0)
+        self.assertAlmostEqual(report['cash_adjust'], 200 * 2.0 - 300 * 1.5)
+        self.assertAlmostEqual(sum(t.cash for t in tranches) - before, report['cash_adjust'])
+        self.assertEqual(tranches[2].holdings['D'], 300)
+        self.assertEqual(tranches[2].pos_records['D']['entry_price'], 1.5)
+        self.assertEqual(len(format_reconciliation(report)), 2)
+
+    def test_manager_delegates(self):
+        rpm = RollingPortfolioManager(state_path=os.devnull)
+        rpm.tranches = _tranches(self.book)
+        report = rpm.reconcile_with_broker({'A': 2200, 'B': 600, 'C': 200})
+        self.assertTrue(report['balanced'])
+        self.assertEqual(report['diffs'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+稳健性分析测试：向量化指标口径、自助法可复现性、逐笔收益计算
+"""
+import os
+import sys
+import time
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.portfolio import RollingPortfolioManager
+from core.robustness import (
+    block_bootstrap_indices, path_metrics, bootstrap_returns,
+    round_trip_returns, summarize_distribution
+)
+
+
+class TestRobustness(unittest.TestCase):
+    def setUp(self):
+        self.rets = np.random.default_rng(1).normal(0.0005, 0.01, 500)
+
+    def test_path_metrics_match_rpm_summary(self):
+        """单条路径的向量化指标与 get_performance_summary 一致"""
+        rpm = RollingPortfolioManager(state_path=os.devnull)
+        nav = 1000000.0
+        dt = datetime(2024, 1, 1)
+        rpm.nav_history.append({'dt': dt, 'nav': nav})
+        for i, r in enumerate(self.rets[1:]):
+            nav *= 1 + r
+            rpm.nav_history.append({'dt': dt + timedelta(days=i + 1), 'nav': nav})
+        expected = rpm.get_performance_summary()
+
+        paths = np.concatenate([[0.0], self.rets[1:]])[None, :]
+        got = path_metrics(paths)
+        self.assertAlmostEqual(got['return'][0], expected['return'], places=10)
+        self.assertAlmostEqual(got['max_dd'][0], expected['max_dd'], places=10)
+        self.assertAlmostEqual(got['sharpe'][0], expected['sharpe'], places=10)
+
+    def test_block_indices_are_contiguous(self):
+        idx = block_bootstrap_indices(100, 3, 10, np.random.default_rng(0))
+        self.assertEqual(idx.shape, (3, 100))
+        steps = np.diff(idx[:, :10], axis=1) % 100
+        self.assertTrue((steps == 1).all())
+
+    def test_bootstrap_reproducible_and_fast(self):
+        t0 = time.perf_counter()
+        a = bootstrap_returns(self.rets, n_paths=10000, block_size=20, seed=7, workers=1)
+        elapsed = time.perf_counter() - t0
+        b = bootstrap_returns(self.rets, n_paths=10000, block_size=20, seed=7, workers=1)
+        self.assertEqual(len(a['return']), 10000)
+        np.testing.assert_array_equal(a['sharpe'], b['sharpe'])
+        self.assertLess(elapsed, 10.0)
+
+    def test_round_trip_returns(self):
+        trades = [
+            {'tranche': 0, 'symbol': 'A', 'side': 'BUY', 'qty': 100, 'price': 10.0},
+            {'tranche': 0, 'symbol': 'A', 'side': 'BUY', 'qty': 100, 'price': 12.0},
+            {'tranche': 0, 'symbol': 'A', 'side': 'SELL', 'qty': 200, 'price': 13.2},
+            {'tranche': 1, 'symbol': 'A', 'side': 'SELL', 'qty': 100, 'price': 9.0},  # 无持仓，忽略
+        ]
+        rets = round_trip_returns(trades)
+        self.assertEqual(len(rets), 1)
+        self.assertAlmostEqual(rets[0], 0.2)
+
+    def test_summary_has_percentiles(self):
+        report = summarize_distribution({'x': np.arange(101)})
+        self.assertEqual(report.loc['x', 'p50'], 50)
+        self.assertEqual(report.loc['x', 'p95'], 95)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+每日状态快照测试
+- 未变化的 Tranche 账本复用同一持仓块，存储只随变化增长
+- restore / state_as_of 回溯到指定日 (含) 之前最近一份快照，与当日状态一致
+- diff_books 列出两日之间的调仓与标量变化
+"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.portfolio import RollingPortfolioManager, Tranche
+from core.snapshots import StateSnapshotStore, diff_books
+
+DAY0 = datetime(2025, 1, 2, 14, 55)
+
+
+def _count_blocks(store):
+    return sum(len(files) for _, _, files in os.walk(store.block_dir))
+
+
+class TestSnapshotStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.store = StateSnapshotStore(os.path.join(self.tmpdir, 'snaps'))
+        self.rpm = RollingPortfolioManager(state_path=os.path.join(self.tmpdir, 'state.json'))
+        self.rpm.tranches = [Tranche(i, 100000.0) for i in range(10)]
+        self.states = {}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _trade_day(self, k):
+        """第 k 日只操作第 k 份 Tranche (滚动调仓)"""
+        dt = DAY0 + timedelta(days=k)
+        t = self.rpm.tranches[k % 10]
+        for sym in list(t.holdings):
+            t.sell(sym, 1.1)
+        t.buy(f'SHSE.51{k:04d}', 50000, 1.0 + k / 100, dt, 0.02)
+        self.rpm.days_count = k + 1
+        self.rpm.record_nav(dt)
+        self.states[dt.strftime('%Y-%m-%d')] = [dict(t.__dict__, holdings=dict(t.holdings),
+                                                     pos_records={s: dict(r) for s, r in t.pos_records.items()})
+                                                for t in self.rpm.tranches]
+        return self.store.save(self.rpm, dt)
+
+    def test_unchanged_blocks_shared(self):
+        first = self._trade_day(0)
+        self.assertEqual((first['tranches'], first['new_blocks']), (10, 2))   # 已建仓 1 份 + 空仓 9 份共用一块
+        for k in range(1, 15):
+            self.assertEqual(self._trade_day(k)['new_blocks'], 1)
+        self.assertEqual(_count_blocks(self.store), 16)
+        self.assertEqual(len(self.store.days()), 15)
+
+        # 同日重复保存只覆盖清单
+        self.assertEqual(self.store.save(self.rpm, DAY0 + timedelta(days=14, hours=1))['new_blocks'], 0)
+        self.assertEqual(len(StateSnapshotStore(self.store.root).days()), 15)
+
+    def test_restore_as_of(self):
+        for k in range(12):
+            self._trade_day(k)
+        fresh = StateSnapshotStore(self.store.root)   # 新实例，只读磁盘
+        restored = RollingPortfolioManager(state_path=os.path.join(self.tmpdir, 'other.json'))
+        self.assertEqual(fresh.restore(restored, '2025-01-06'), '2025-01-06')
+        self.assertEqual(restored.days_count, 5)
+        self.assertEqual([t.__dict__ for t in restored.tranches],
+                         [dict(d, guard_triggered_today=False) for d in self.states['2025-01-06']])
+        self.assertIsInstance(restored.tranches[0].pos_records['SHSE.510000']['entry_dt'], datetime)
+
+        # 非快照日 -> 此前最近一份；首份之前 -> None 且不修改 rpm
+        self.assertEqual(fresh.state_as_of(datetime(2025, 2, 1))['date'], '2025-01-13')
+        self.assertIsNone(fresh.restore(restored, '2024-12-31'))
+        self.assertEqual(restored.days_count, 5)
+
+        # 恢复出的字典互不共享 (空仓 Tranche 共用同一块)
+        restored.tranches[-1].holdings['X'] = 1
+        self.assertNotIn('X', restored.tranches[-2].holdings)
+
+    def test_diff(self):
+        for k in range(12):
+            self._trade_day(k)
+        changes = self.store.diff('2025-01-02', '2025-01-13')
+        shares = changes[changes['field'] == 'shares']
+        self.assertEqual(set(shares['symbol']), {'SHSE.510000', 'SHSE.510010', 'SHSE.510011'}
+                         | {f'SHSE.51{k:04d}' for k in range(2, 10)})
+        row = shares[shares['symbol'] == 'SHSE.510000'].iloc[0]
+        self.assertEqual((row['tranche'], row['after']), (0, None))
+        self.assertTrue(diff_books(self.store.state_as_of('2025-01-05'), self.store.state_as_of('2025-01-05')).empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+"""
+二进制状态文件测试
+- JSON <-> 二进制无损互转 (仓库中的真实状态文件、非常规字段)
+- RollingPortfolioManager 以二进制格式保存/载入与 JSON 一致，旧 JSON 自动迁移
+- 校验失败 (截断/损坏) 与模式迁移链
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import state_codec
+from core.portfolio import RollingPortfolioManager, Tranche
+from core.state_codec import (decode_state, encode_state, migrate, read_state, register_migration,
+                              to_json_state, detect_format)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _book(n_tranches=10, n_pos=4):
+    tranches = [Tranche(i, 100000.0) for i in range(n_tranches)]
+    for t in tranches:
+        for k in range(n_pos):
+            t.buy(f'SHSE.5{t.id:02d}{k:03d}', 20000, 1.0 + k / 10, datetime(2025, 1, 2, 14, 55) + timedelta(days=k),
+                  0.02 + k / 100)
+    return tranches
+
+
+class TestCodecRoundTrip(unittest.TestCase):
+    def test_repo_state_files_lossless(self):
+        for name in ('rolling_state_main.json', 'rolling_state_main_equal.json'):
+            path = os.path.join(BASE_DIR, name)
+            if not os.path.exists(path):
+                continue
+            with open(path, encoding='utf-8') as f:
+                original = json.load(f)
+            decoded = decode_state(encode_state(original))
+            self.assertEqual(decoded.pop('schema'), state_codec.STATE_SCHEMA)
+            self.assertEqual(to_json_state(decoded), original)
+
+    def test_irregular_fields_lossless(self):
+        aware = datetime(2025, 3, 3, 14, 55, tzinfo=timezone(timedelta(hours=8)))
+        state = {
+            'days_count': 7,
+            'perf': {'current': {'n': 3}, 'prev': None},
+            'tranches': [{
+                'id': 0, 'cash': 0, 'total_value': 1.5,
+                'holdings': {'A': 100, 'B': 250.5},
+                'pos_records': {
+                    'A': {'entry_price': 1.0, 'high_price': 1.2, 'entry_dt': 'not-a-date'},
+                    'B': {'entry_price': 2.0, 'high_price': 2.0, 'entry_dt': aware, 'volatility': 0.03,
+                          'note': 'manual'},
+                },
+                'guard_triggered_today': True,
+                'tag': 'extra',
+            }],
+        }
+        decoded = decode_state(encode_state(state))
+        self.assertEqual(to_json_state(decoded), {**to_json_state(state), 'schema': state_codec.STATE_SCHEMA})
+        self.assertNotIn('volatility', decoded['tranches'][0]['pos_records']['A'])
+
+    def test_corruption_detected(self):
+        buf = bytearray(encode_state({'days_count': 1, 'tranches': [t.__dict__ for t in _book(2)]}))
+        with self.assertRaises(ValueError):
+            decode_state(bytes(buf[:-3]))
+        buf[-1] ^= 0xFF
+        with self.assertRaises(ValueError):
+            decode_state(bytes(buf))
+
+    def test_migration_chain(self):
+        with patch.dict(state_codec._MIGRATIONS):
+            @register_migration(1)
+            def _rename(state):
+                state['day'] = state.pop('days_count')
+                return state
+            migrated = migrate({'days_count': 5, 'tranches': []}, target=2)
+            self.assertEqual((migrated['day'], migrated['schema']), (5, 2))
+            with self.assertRaises(ValueError):
+                migrate({'schema': 3})
+        with self.assertRaises(ValueError):
+            migrate({'schema': 1}, target=3)
+
+
+class TestBinaryStateManager(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _manager(self, fmt, name):
+        rpm = RollingPortfolioManager(state_path=os.path.join(self.tmpdir, name), state_format=fmt)
+        rpm.days_count = 42
+        rpm.tranches = _book()
+        rpm.record_nav(datetime(2025, 1, 10, 14, 55))
+        return rpm
+
+    def test_binary_matches_json(self):
+        loaded = {}
+        for fmt, name in (('json', 'state.json'), ('binary', 'state.bin')):
+            self._manager(fmt, name).save_state()
+            self.assertEqual(detect_format(os.path.join(self.tmpdir, name)), fmt)
+            rpm = RollingPortfolioManager(state_path=os.path.join(self.tmpdir, name), state_format=fmt)
+            self.assertTrue(rpm.load_state())
+            loaded[fmt] = rpm
+        self.assertEqual([t.__dict__ for t in loaded['binary'].tranches],
+                         [t.__dict__ for t in loaded['json'].tranches])
+        self.assertEqual(loaded['binary'].days_count, 42)
+        self.assertEqual(loaded['binary'].nav_history.snapshot(), loaded['json'].nav_history.snapshot())
+        self.assertIsInstance(loaded['binary'].tranches[0].pos_records['SHSE.500000']['entry_dt'], datetime)
+
+    def test_legacy_json_migrated(self):
+        self._manager('json', 'state.json').save_state()
+        rpm = RollingPortfolioManager(state_path=os.path.join(self.tmpdir, 'state.bin'), state_format='binary')
+        self.assertTrue(rpm.load_state())
+        self.assertEqual(rpm.days_count, 42)
+        rpm.save_state()
+        state, fmt = read_state(os.path.join(self.tmpdir, 'state.bin'))
+        self.assertEqual((fmt, state['days_count']), ('binary', 42))
+
+    def test_corrupted_file_not_loaded(self):
+        self._manager('binary', 'state.bin').save_state()
+        path = os.path.join(self.tmpdir, 'state.bin')
+        with open(path, 'r+b') as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b'\x00')
+        self.assertFalse(RollingPortfolioManager(state_path=path, state_format='binary').load_state())
+
+
+if __name__ == '__main__':
+    unittest.main()
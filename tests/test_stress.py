@@ -0,0 +1,99 @@
+"""
+持仓压力测试
+- 历史模拟 VaR/ES 与逐情景重估一致，各 Tranche 分别给出
+- 危机回放取基准最差交易日；基准冲击按 beta 传导
+- 数千情景毫秒级完成；结果进入日报文本
+"""
+import os
+import sys
+import time
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.portfolio import Tranche
+from core.stress import stress_test, format_stress
+
+DAY0 = datetime(2025, 1, 2, 14, 55)
+
+
+def _market(days, n_sym, seed=0):
+    rng = np.random.default_rng(seed)
+    bm_ret = rng.normal(0, 0.015, days)
+    beta = np.linspace(0.5, 1.5, n_sym)
+    ret = bm_ret[:, None] * beta + rng.normal(0, 0.005, (days, n_sym))
+    index = pd.bdate_range('2012-01-02', periods=days + 1)
+    symbols = [f'SZSE.15{i:04d}' for i in range(n_sym)]
+    prices = pd.DataFrame(10 * np.vstack([np.ones(n_sym), np.cumprod(1 + ret, axis=0)]), index=index, columns=symbols)
+    benchmark = pd.Series(np.concatenate([[2.0], 2.0 * np.cumprod(1 + bm_ret)]), index=index)
+    return prices, benchmark
+
+
+def _rpm(symbols, n_tranches=10):
+    tranches = []
+    for i in range(n_tranches):
+        t = Tranche(i, 10000.0)
+        for sym in symbols[i % 3::3][:5]:
+            t.holdings[sym] = 1000 * (i + 1)
+            t.pos_records[sym] = {'entry_price': 10.0, 'high_price': 10.0, 'entry_dt': DAY0, 'volatility': 0.02}
+        tranches.append(t)
+    return SimpleNamespace(tranches=tranches)
+
+
+class TestStress(unittest.TestCase):
+    def test_var_es_match_revaluation(self):
+        prices, benchmark = _market(500, 12)
+        rpm = _rpm(list(prices.columns))
+        result = stress_test(rpm, prices, benchmark, confidence=0.95, window=250, worst_days=5, shocks=(-0.08,))
+
+        last = prices.iloc[-1]
+        qty = pd.Series(0.0, index=prices.columns)
+        for t in rpm.tranches:
+            for s, q in t.holdings.items():
+                qty[s] += q
+        rets = prices.iloc[-251:].pct_change().dropna()
+        pnl = (rets * (qty * last)).sum(axis=1).to_numpy()
+        cutoff = np.quantile(pnl, 0.05)
+        self.assertEqual(result['scenarios'], 250)
+        self.assertAlmostEqual(result['var'], -cutoff)
+        self.assertAlmostEqual(result['es'], -pnl[pnl <= cutoff].mean())
+        self.assertGreaterEqual(result['es'], result['var'])
+        self.assertEqual(len(result['tranche_var']), 10)
+        self.assertAlmostEqual(result['value'], 100000.0 + float((qty * last).sum()))
+
+        # 危机回放：基准最差 5 日，按跌幅排序
+        crashes = result['crashes']
+        bm_ret = benchmark.pct_change().dropna()
+        self.assertEqual(list(crashes.index), list(bm_ret.nsmallest(5).index))
+        self.assertAlmostEqual(crashes['pnl'].iloc[0], float((prices.pct_change().loc[crashes.index[0]] * qty * last).sum()))
+
+        # beta 0.5~1.5 的多头组合在基准 -8% 时亏损
+        self.assertLess(result['shocks']['pnl'].iloc[0], 0)
+        lines = format_stress(result)
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith('VaR95%'))
+
+    def test_thousands_of_scenarios_fast(self):
+        prices, benchmark = _market(3000, 200, seed=1)
+        rpm = _rpm(list(prices.columns))
+        stress_test(rpm, prices, benchmark, window=3000)
+        start = time.perf_counter()
+        result = stress_test(rpm, prices, benchmark, window=3000)
+        self.assertEqual(result['scenarios'], 3000)
+        self.assertLess(time.perf_counter() - start, 0.1)
+
+    def test_empty_book(self):
+        prices, benchmark = _market(50, 3)
+        self.assertIsNone(stress_test(SimpleNamespace(tranches=[Tranche(0, 1.0)]), prices, benchmark))
+        result = stress_test(_rpm(list(prices.columns), 3), prices)
+        self.assertTrue(result['crashes'].empty and result['shocks'].empty)
+        self.assertEqual(format_stress(None), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+主题约束选股测试
+- theme_rank 组内序号与逐行计数一致
+- candidate_lists / select_target_weights 与原 iterrows + 列表实现结果完全一致
+  (随机排名表、主题数、老持仓、TOP_N / MAX_PER_THEME / 权重方案)
+"""
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+from core.logic import candidate_lists, select_target_weights, theme_rank
+
+
+def _loop_select(rank_df, holdings):
+    """原 select_target_weights 的逐行实现 (参照)"""
+    candidates, themes = [], {}
+    for code, row in rank_df.iterrows():
+        if themes.get(row['theme'], 0) < config.MAX_PER_THEME:
+            candidates.append(code)
+            themes[row['theme']] = themes.get(row['theme'], 0) + 1
+    core_targets = candidates[:config.TOP_N]
+    buffer_targets = candidates[:config.TOP_N + config.TURNOVER_BUFFER]
+
+    kept, used = [], 0
+    for s in holdings:
+        if s in buffer_targets and used < config.TOP_N:
+            kept.append(s)
+            used += 1
+    to_buy = []
+    for s in core_targets:
+        if used >= config.TOP_N:
+            break
+        if s not in kept:
+            to_buy.append(s)
+            used += 1
+    final_list = kept + to_buy
+    weights = {}
+    for i, s in enumerate(candidates):
+        if s in final_list:
+            weights[s] = 1 if config.WEIGHT_SCHEME == 'EQUAL' else (3 if i == 0 else 1)
+    return candidates, weights
+
+
+def _rank_df(rng, n, n_themes):
+    codes = [f'S{i:05d}' for i in rng.permutation(n)]
+    themes = [f'T{k}' for k in rng.integers(0, n_themes, n)]
+    return pd.DataFrame({'score': np.sort(rng.random(n))[::-1], 'theme': themes}, index=codes)
+
+
+class TestThemeRank(unittest.TestCase):
+    def test_group_cumcount(self):
+        np.testing.assert_array_equal(theme_rank(['a', 'b', 'a', 'c', 'a', 'b']), [0, 0, 1, 0, 2, 1])
+        np.testing.assert_array_equal(theme_rank([np.nan, 'a', np.nan]), [0, 0, 1])
+        self.assertEqual(len(theme_rank([])), 0)
+
+
+class TestSelectionParity(unittest.TestCase):
+    def test_matches_loop_implementation(self):
+        rng = np.random.default_rng(7)
+        for trial in range(60):
+            n = int(rng.integers(0, 300))
+            rank_df = _rank_df(rng, n, int(rng.integers(1, 40)))
+            pool = list(rank_df.index[:30]) + ['GONE1', 'GONE2']
+            held = list(rng.permutation(pool)[:int(rng.integers(0, 12))])
+            active_t = SimpleNamespace(holdings={s: 100 for s in held})
+            params = dict(TOP_N=int(rng.integers(1, 12)), MAX_PER_THEME=int(rng.integers(1, 4)),
+                          TURNOVER_BUFFER=int(rng.integers(0, 5)),
+                          WEIGHT_SCHEME=str(rng.choice(['EQUAL', 'CHAMPION'])))
+            with patch.multiple(config, **params):
+                expected_candidates, expected = _loop_select(rank_df, held)
+                self.assertEqual(candidate_lists(rank_df)[0], expected_candidates, (trial, params))
+                weights = select_target_weights(rank_df, active_t)
+            self.assertEqual(weights, expected, (trial, params))
+            self.assertEqual(list(weights), list(expected))   # 下单顺序同样一致
+
+    def test_wide_universe(self):
+        rng = np.random.default_rng(3)
+        rank_df = _rank_df(rng, 5000, 200)
+        held = list(rank_df.index[40:60])
+        with patch.multiple(config, TOP_N=50, TURNOVER_BUFFER=20, MAX_PER_THEME=3):
+            _, expected = _loop_select(rank_df, held)
+            self.assertEqual(select_target_weights(rank_df, SimpleNamespace(holdings=dict.fromkeys(held, 1))),
+                             expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+滚动波动率缓存测试
+- 缓存的波动率尺 / 动态止损波动率与原切片计算一致 (含缺失数据、新上市标的)
+- 实盘追加/替换今日行时只重算末尾行，结果与整表重算一致
+- get_ranking 读取 context.vol_cache 时排名不变
+"""
+import os
+import sys
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.backtest import new_gate_state
+from core.signal import _vol_ruler, get_ranking
+from core.volatility import VolatilityCache, stop_volatility, true_range_atr
+
+
+def _prices(n_days=320, n_syms=20, seed=5):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end=datetime(2025, 6, 30), periods=n_days, freq='B')
+    syms = [f'SHSE.51{i:04d}' for i in range(n_syms)]
+    values = np.exp(np.cumsum(rng.normal(0.0005, 0.015, (n_days, n_syms)), axis=0))
+    prices = pd.DataFrame(values, index=dates, columns=syms)
+    prices.iloc[100:110, 3] = np.nan      # 停牌缺失
+    prices.iloc[:290, 5] = np.nan         # 新上市
+    prices.iloc[200:, 7] = prices.iloc[200, 7]   # 长期不变价 -> 波动率为 0
+    return prices
+
+
+class TestVolatilityCache(unittest.TestCase):
+    def setUp(self):
+        self.prices = _prices()
+        self.cache = VolatilityCache().sync(self.prices)
+
+    def test_matches_slice_computation(self):
+        for dt in self.prices.index[[10, 70, 150, 295, -1]]:
+            hist = self.prices[self.prices.index <= dt]
+            pd.testing.assert_series_equal(self.cache.ruler(dt), _vol_ruler(hist), check_names=False,
+                                           rtol=1e-10)
+            for s in self.prices.columns[[0, 3, 5, 7]]:
+                expected = stop_volatility(self.prices, dt, s)
+                actual = self.cache.stop_vol(s, dt)
+                if expected is None:
+                    self.assertIsNone(actual)
+                else:
+                    self.assertAlmostEqual(actual, expected, places=12)
+        self.assertIsNone(self.cache.stop_vol('NOT_LISTED', self.prices.index[-1]))
+
+    def test_incremental_sync_matches_full(self):
+        cache = VolatilityCache().sync(self.prices.iloc[:-1])
+        cache.sync(self.prices)
+        self.assertEqual(cache.recomputed, len(self.prices))      # 追加一行只重算一行
+        provisional = self.prices.copy()
+        provisional.iloc[-1] *= 1.02                               # 替换今日行
+        cache.sync(provisional)
+        cache.sync(provisional)                                    # 未变化不重算
+        self.assertEqual(cache.recomputed, len(self.prices) + 1)
+        full = VolatilityCache().sync(provisional)
+        for name in full.vol:
+            np.testing.assert_allclose(cache.vol[name], full.vol[name], rtol=1e-10, equal_nan=True)
+
+    def test_get_ranking_with_cache(self):
+        ctx = new_gate_state(self.prices.columns, {s: f'T{i % 4}' for i, s in enumerate(self.prices.columns)})
+        ctx.prices_df = self.prices
+        expected, _ = get_ranking(ctx, self.prices.index[-1])
+        ctx = new_gate_state(ctx.whitelist, ctx.theme_map)
+        ctx.prices_df, ctx.vol_cache = self.prices, VolatilityCache()
+        actual, _ = get_ranking(ctx, self.prices.index[-1])
+        pd.testing.assert_frame_equal(actual, expected)
+
+
+class TestTrueRangeAtr(unittest.TestCase):
+    def test_true_range(self):
+        close = pd.DataFrame({'A': [10.0, 10.0, 11.0]})
+        high = pd.DataFrame({'A': [10.5, 10.2, 12.0]})
+        low = pd.DataFrame({'A': [9.5, 9.0, 10.5]})
+        atr = true_range_atr(high, low, close, window=2)
+        # TR: [1.0, 1.2, 2.0] (第 3 日 |高-昨收| = 2.0)
+        self.assertAlmostEqual(atr['A'].iloc[-1], (1.2 + 2.0) / 2 / 11.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+权重方案测试
+- RollingCovariance 增量更新与 DataFrame.cov(min_periods) 整表计算一致 (含缺失、窗口滚动、重建)
+- ERC 风险贡献相等且小名单求解为微秒级；反波动率 / 评分上限
+- select_target_weights 按方案换算，名单与键顺序不变；协方差缺失时回退等权
+"""
+import os
+import sys
+import time
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+from core.backtest import SignalCache, run_local_backtest
+from core.logic import select_target_weights
+from core.weights import (RollingCovariance, capped_score_weights, erc_weights, inverse_vol_weights,
+                          scheme_weights)
+from tests.test_local_backtest import _make_market
+
+
+def _expected_cov(prices, dt, symbols, window=60, min_periods=20):
+    stable = prices[prices.index < pd.Timestamp(dt).normalize()]
+    return stable.pct_change().tail(window)[symbols].cov(min_periods=min_periods).to_numpy()
+
+
+class TestRollingCovariance(unittest.TestCase):
+    def setUp(self):
+        self.prices, *_ = _make_market(n_days=330)
+        self.prices.iloc[280:300, 4] = np.nan
+        self.symbols = list(self.prices.columns[[0, 4, 9, 2]])
+
+    def test_incremental_matches_full(self):
+        model = RollingCovariance(window=60, min_periods=20)
+        for dt in self.prices.index[150:]:            # 逐日增量 (跨越多次窗口重建)
+            model.sync(self.prices, dt + pd.Timedelta('14:55:00'))
+        dt = self.prices.index[-1]
+        np.testing.assert_allclose(model.cov(self.symbols), _expected_cov(self.prices, dt, self.symbols),
+                                   rtol=1e-8, atol=1e-14)
+        self.assertEqual(model.added, 150 + len(self.prices) - 151)
+
+    def test_today_row_ignored_and_rewind(self):
+        model = RollingCovariance(window=60, min_periods=20)
+        dt = self.prices.index[-1] + pd.Timedelta('14:55:00')
+        model.sync(self.prices, dt)
+        before = model.cov(self.symbols)
+        provisional = self.prices.copy()
+        provisional.iloc[-1] *= 1.05                  # 今日行变化不影响
+        np.testing.assert_array_equal(model.sync(provisional, dt).cov(self.symbols), before)
+        earlier = self.prices.index[200]              # 回到更早日期时整表重建
+        np.testing.assert_allclose(model.sync(self.prices, earlier).cov(self.symbols),
+                                   _expected_cov(self.prices, earlier, self.symbols), rtol=1e-10)
+        self.assertTrue(np.isnan(model.cov(['NOT_LISTED'])).all())
+
+
+class TestSolvers(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        a = rng.normal(0, 0.02, (120, 5))
+        a[:, 1] += a[:, 0]
+        self.cov = np.cov(a, rowvar=False)
+
+    def test_erc_equal_risk_contributions(self):
+        w = erc_weights(self.cov)
+        rc = w * (self.cov @ w)
+        self.assertAlmostEqual(w.sum(), 1.0)
+        np.testing.assert_allclose(rc, rc.mean(), rtol=1e-7)
+
+    def test_erc_is_fast(self):
+        erc_weights(self.cov)
+        t0 = time.perf_counter()
+        for _ in range(200):
+            erc_weights(self.cov)
+        self.assertLess((time.perf_counter() - t0) / 200, 1e-3)
+
+    def test_inverse_vol_and_capped_score(self):
+        w = inverse_vol_weights(np.diag([0.01, 0.04]))
+        np.testing.assert_allclose(w, [2 / 3, 1 / 3])
+        w = capped_score_weights([90, 5, 5], cap=0.5)
+        np.testing.assert_allclose(w, [0.5, 0.25, 0.25])
+        np.testing.assert_allclose(capped_score_weights([-1, 0], cap=0.5), [0.5, 0.5])
+        np.testing.assert_allclose(capped_score_weights([3, 1], cap=0.4), [0.5, 0.5])   # 上限不可行
+
+
+class TestSchemeSelection(unittest.TestCase):
+    def setUp(self):
+        self.rank_df = pd.DataFrame({'score': [150.0, 120.0, 90.0, 60.0, 30.0],
+                                     'theme': ['A', 'B', 'C', 'D', 'E']},
+                                    index=['S1', 'S2', 'S3', 'S4', 'S5'])
+        self.active_t = SimpleNamespace(holdings={})
+
+    def test_schemes_keep_membership_and_order(self):
+        cov = SimpleNamespace(cov=lambda syms: np.diag(np.arange(1, len(syms) + 1) * 1e-4))
+        with patch.object(config, 'TOP_N', 4):
+            base = select_target_weights(self.rank_df, self.active_t)
+            for scheme in ('INV_VOL', 'ERC', 'SCORE'):
+                with patch.object(config, 'WEIGHT_SCHEME', scheme):
+                    w = select_target_weights(self.rank_df, self.active_t, cov)
+                self.assertEqual(list(w), list(base))
+                self.assertAlmostEqual(sum(w.values()), 1.0)
+        self.assertGreater(w['S1'], w['S4'])
+
+    def test_missing_covariance_falls_back(self):
+        missing = SimpleNamespace(cov=lambda syms: np.full((len(syms), len(syms)), np.nan))
+        w = scheme_weights({'S1': 3, 'S2': 1}, self.rank_df, missing, scheme='ERC')
+        self.assertEqual(w, {'S1': 1, 'S2': 1})
+        self.assertEqual(scheme_weights({'S1': 3, 'S2': 1}, self.rank_df, None, scheme='CHAMPION'),
+                         {'S1': 3, 'S2': 1})
+
+    def test_local_backtest_with_erc(self):
+        prices, benchmark, whitelist, theme_map = _make_market()
+        cache = SignalCache(prices, benchmark, whitelist, theme_map)
+        with patch.object(config, 'WEIGHT_SCHEME', 'ERC'):
+            result = run_local_backtest(cache, start=cache.first_signal_dt)
+        self.assertGreater(len(result['trades']), 0)
+        self.assertGreater(cache.cov_model.added, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,32 +1,76 @@
 """
 黄金基准一致性验证脚本
 用于确保重构后的代码产生与预期完全一致的结果。
+
+用法:
+    python verify_reproducibility.py                  # 回测 + 逐日黄金轨迹比对 (首个分歧日即失败)
+    python verify_reproducibility.py --record-golden  # 以当前代码重新录制黄金轨迹
+    python verify_reproducibility.py --diff A B       # 仅比对两份轨迹文件
 """
+import argparse
+import os
 import subprocess
 import re
 import sys
-from config import logger
+from config import config, logger
+from core.trace import compare_traces
 
 # 预期的黄金结果
 EXPECTED_RETURN = 51.33  # 基于当前代码版本的基准
 EXPECTED_SHARPE = 0.71
 
-def run_verify():
+# 黄金轨迹路径
+GOLDEN_TRACE = os.path.join(config.OUTPUT_DIR, "golden", "decision_trace.bin")
+LATEST_TRACE = os.path.join(config.OUTPUT_DIR, "golden", "latest_trace.bin")
+
+
+def report_trace_diff(golden_path, actual_path):
+    """流式比对两份轨迹并输出首个分歧日"""
+    result = compare_traces(golden_path, actual_path)
+    if result['identical']:
+        logger.info(f"✅ Decision trace identical ({result['days']} days)")
+        return True
+    d = result['first_divergence']
+    logger.error(f"🚨 TRACE DIVERGENCE on day {d['date']} (after {result['days']} days) field='{d['field']}'")
+    logger.error(f"   expected: {d['expected']}")
+    logger.error(f"   actual:   {d['actual']}")
+    return False
+
+
+def run_verify(record_golden=False):
     logger.info("🧪 Starting Consistency Verification...")
-    
+
+    # 轨迹录制/比对通过环境变量传给回测进程
+    env = os.environ.copy()
+    use_golden = not record_golden and os.path.exists(GOLDEN_TRACE)
+    env['OPT_TRACE_FILE'] = GOLDEN_TRACE if record_golden else LATEST_TRACE
+    env['OPT_TRACE_GOLDEN'] = GOLDEN_TRACE if use_golden else ''
+    if use_golden:
+        logger.info(f"🧬 Fail-fast golden trace comparison enabled: {GOLDEN_TRACE}")
+    elif not record_golden:
+        logger.warning(f"⚠️ Golden trace not found ({GOLDEN_TRACE}), run with --record-golden first")
+
     # 运行回测
     try:
         result = subprocess.run(
             ['python', 'run_backtest.py'],
             capture_output=True,
             text=True,
-            check=True
+            check=True,
+            env=env
         )
         output = result.stdout + result.stderr
         # logger.debug(f"Combined Output: {output}") 
     except subprocess.CalledProcessError as e:
         logger.error(f"❌ Backtest failed to run: {e}")
         logger.error(f"Error output: {e.stderr}")
+        if use_golden and os.path.exists(LATEST_TRACE):
+            report_trace_diff(GOLDEN_TRACE, LATEST_TRACE)
+        return False
+
+    if record_golden:
+        logger.info(f"🧬 Golden trace recorded: {GOLDEN_TRACE}")
+    elif use_golden and not report_trace_diff(GOLDEN_TRACE, LATEST_TRACE):
         return False
 
     # 解析结果 (适配 logger 格式)
@@ -63,7 +107,13 @@ def run_verify():
     return success
 
 if __name__ == '__main__':
-    if run_verify():
-        sys.exit(0)
+    parser = argparse.ArgumentParser(description='Golden consistency verification')
+    parser.add_argument('--record-golden', action='store_true', help='Record a new golden decision trace')
+    parser.add_argument('--diff', nargs=2, metavar=('GOLDEN', 'ACTUAL'), help='Compare two trace files only')
+    args = parser.parse_args()
+
+    if args.diff:
+        ok = report_trace_diff(*args.diff)
     else:
-        sys.exit(1)
+        ok = run_verify(record_golden=args.record_golden)
+    sys.exit(0 if ok else 1)
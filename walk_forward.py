@@ -0,0 +1,195 @@
+"""
+滚动前推优化 (Walk-Forward Optimization)
+在本地回测引擎上，将历史切分为滚动的训练/测试窗口：
+1. 每个训练窗口内并行网格搜索 OPT_STOP_LOSS / OPT_TRAILING_TRIGGER / OPT_TRAILING_DROP /
+   OPT_PROTECTION_DAYS / OPT_K_CRASH
+2. 以最优参数在紧随其后的测试窗口做样本外评估
+3. 输出拼接后的样本外净值曲线与每个窗口选中的参数
+
+信号 (排名表、Z-Score、趋势仓位) 与参数无关，只在 SignalCache 中计算一次，所有窗口与参数组合共用。
+
+用法:
+    python walk_forward.py --train-days 504 --test-days 63 --workers 8 --objective sharpe
+"""
+import os
+import sys
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from config import config, logger
+from core.backtest import SignalCache, run_local_backtest, load_universe, load_market_data
+
+# 默认参数网格
+PARAM_GRID = {
+    'OPT_STOP_LOSS': [0.15, 0.20, 0.25],
+    'OPT_TRAILING_TRIGGER': [0.10, 0.15, 0.20],
+    'OPT_TRAILING_DROP': [0.03, 0.05],
+    'OPT_PROTECTION_DAYS': [0, 3],
+    'OPT_K_CRASH': [2.0, 2.5, 3.0],
+}
+
+OUTPUT_DIR = os.path.join(config.OUTPUT_DIR, "walk_forward")
+
+# 子进程内共享的信号缓存 (由 initializer 注入一次，避免每个任务重复序列化)
+_WORKER_CACHE = None
+
+
+def _init_worker(cache):
+    global _WORKER_CACHE
+    _WORKER_CACHE = cache
+
+
+def expand_grid(grid):
+    """参数网格 -> 参数组合列表"""
+    keys = list(grid.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def build_windows(dates, train_days, test_days, step_days=None):
+    """
+    按交易日切分滚动窗口
+
+    Returns:
+        list of dict: {'id', 'train_start', 'train_end', 'test_start', 'test_end'}
+    """
+    step_days = step_days or test_days
+    windows = []
+    i = 0
+    while i + train_days + test_days <= len(dates):
+        windows.append({
+            'id': len(windows),
+            'train_start': dates[i],
+            'train_end': dates[i + train_days - 1],
+            'test_start': dates[i + train_days],
+            'test_end': dates[i + train_days + test_days - 1],
+        })
+        i += step_days
+    return windows
+
+
+def score_summary(summary, objective):
+    """目标函数：sharpe / return / calmar"""
+    if not summary:
+        return float('-inf')
+    if objective == 'return':
+        return summary['return']
+    if objective == 'calmar':
+        return summary['return'] / summary['max_dd'] if summary['max_dd'] > 0 else summary['return']
+    return summary['sharpe']
+
+
+def _evaluate(task):
+    """子进程任务：在指定区间运行一次本地回测"""
+    window_id, phase, start, end, params, initial_cash = task
+    result = run_local_backtest(_WORKER_CACHE, start, end, params, initial_cash=initial_cash)
+    nav = result['nav'] if phase == 'test' else None
+    return window_id, phase, params, result['summary'], nav
+
+
+def run_walk_forward(cache, train_days=504, test_days=63, step_days=None, grid=None,
+                     objective='sharpe', workers=None, initial_cash=1000000):
+    """
+    执行滚动前推优化
+
+    Returns:
+        (windows_df, equity): 每窗口选中参数与样本内/外指标、拼接后的样本外净值曲线
+    """
+    grid = grid or PARAM_GRID
+    combos = expand_grid(grid)
+    first_dt = cache.first_signal_dt
+    dates = [d for d in cache.dates if first_dt is not None and d >= first_dt]
+    windows = build_windows(dates, train_days, test_days, step_days)
+    if not windows:
+        raise ValueError(f"Not enough history: {len(dates)} signal days < train {train_days} + test {test_days}")
+
+    logger.info(f"🧭 Walk-forward: {len(windows)} windows x {len(combos)} param sets "
+                f"(train={train_days}d, test={test_days}d, objective={objective})")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache,)) as pool:
+        # 1. 所有窗口的训练网格互相独立，一次性并行提交
+        train_tasks = [
+            (w['id'], 'train', w['train_start'], w['train_end'], p, initial_cash)
+            for w in windows for p in combos
+        ]
+        best = {}
+        for window_id, _, params, summary, _ in pool.map(_evaluate, train_tasks, chunksize=4):
+            score = score_summary(summary, objective)
+            if window_id not in best or score > best[window_id][0]:
+                best[window_id] = (score, params, summary)
+
+        # 2. 样本外评估
+        test_tasks = [
+            (w['id'], 'test', w['test_start'], w['test_end'], best[w['id']][1], initial_cash)
+            for w in windows
+        ]
+        test_results = {wid: (summary, nav) for wid, _, _, summary, nav in pool.map(_evaluate, test_tasks)}
+
+    # 3. 拼接样本外净值 (每个窗口以上一窗口期末净值为起点)
+    rows, segments = [], []
+    equity_base = 1.0
+    for w in windows:
+        score, params, train_summary = best[w['id']]
+        test_summary, nav = test_results[w['id']]
+        if len(nav):
+            segment = equity_base * nav / initial_cash
+            segments.append(segment)
+            equity_base = segment.iloc[-1]
+        rows.append({
+            'window': w['id'],
+            'train_start': w['train_start'].date(), 'train_end': w['train_end'].date(),
+            'test_start': w['test_start'].date(), 'test_end': w['test_end'].date(),
+            **params,
+            f'train_{objective}': score,
+            'test_return': test_summary.get('return', 0.0),
+            'test_max_dd': test_summary.get('max_dd', 0.0),
+            'test_sharpe': test_summary.get('sharpe', 0.0),
+        })
+
+    windows_df = pd.DataFrame(rows).set_index('window')
+    equity = pd.concat(segments) if segments else pd.Series(dtype=float)
+    equity.name = 'equity'
+    return windows_df, equity
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Walk-forward optimization on the local backtest engine')
+    parser.add_argument('--start', type=str, default=config.START_DATE, help='Start Date')
+    parser.add_argument('--end', type=str, default=config.END_DATE, help='End Date')
+    parser.add_argument('--train-days', type=int, default=504, help='Train window (trading days)')
+    parser.add_argument('--test-days', type=int, default=63, help='Test window (trading days)')
+    parser.add_argument('--step-days', type=int, default=None, help='Window step (default = test days)')
+    parser.add_argument('--objective', choices=['sharpe', 'return', 'calmar'], default='sharpe')
+    parser.add_argument('--workers', type=int, default=None, help='Process pool size')
+    parser.add_argument('--cash', type=float, default=1000000, help='Initial Cash')
+    args = parser.parse_args()
+
+    whitelist, theme_map, _ = load_universe()
+    data_start = pd.Timestamp(args.start) - pd.Timedelta(days=400)
+    prices_df, benchmark_df = load_market_data(whitelist, data_start, args.end)
+    cache = SignalCache(prices_df, benchmark_df, whitelist, theme_map)
+
+    windows_df, equity = run_walk_forward(
+        cache, args.train_days, args.test_days, args.step_days,
+        objective=args.objective, workers=args.workers, initial_cash=args.cash
+    )
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    windows_df.to_csv(os.path.join(OUTPUT_DIR, "windows.csv"))
+    equity.to_csv(os.path.join(OUTPUT_DIR, "oos_equity.csv"))
+
+    print("\n" + "=" * 80)
+    print("🧭 Walk-Forward 结果")
+    print("=" * 80)
+    print(windows_df.to_string())
+    if len(equity):
+        oos_ret = equity.iloc[-1] - 1
+        oos_dd = ((equity - equity.cummax()) / equity.cummax()).min()
+        print(f"\n样本外累计收益: {oos_ret:.2%} | 最大回撤: {abs(oos_dd):.2%}")
+    print(f"结果已保存: {OUTPUT_DIR}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())